@@ -0,0 +1,152 @@
+"""
+Read-only REST API (v1) for posts and comments.
+
+* Keyset pagination on (date, id) through an opaque ``cursor`` parameter,
+  so every page is one range query regardless of depth or page size.
+* ``?fields=`` returns (and selects) only the listed fields; list calls
+  can leave out the heavy ``body`` column.
+* Every response carries an ETag built from a per-row fingerprint that
+  the database computes alongside the page. A matching If-None-Match is
+  answered with 304 before anything is serialized.
+"""
+import hashlib
+
+from django.db.models import CharField, Value
+from django.db.models.functions import MD5, Cast, Coalesce, Concat
+from django.utils.http import parse_etags, quote_etag
+from rest_framework import status, viewsets
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Comments, Post
+from .pagination import InvalidCursor, KeysetPaginator
+from .serializers import CommentSerializer, PostSerializer
+
+# KeysetPaginator's default (date, id) key
+KEYSET_COLUMNS = ('date', 'id')
+
+
+class KeysetCursorPagination(BasePagination):
+    """DRF adapter for blog.pagination.KeysetPaginator."""
+    page_size = 20
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request) -> int:
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        paginator = KeysetPaginator(queryset, self.get_page_size(request))
+        try:
+            self.page = paginator.page(
+                request.query_params.get(self.cursor_query_param))
+        except InvalidCursor:
+            self.page = paginator.page()
+        return list(self.page)
+
+    def _link(self, token):
+        if not token:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, token)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._link(self.page.next_token),
+            'previous': self._link(self.page.previous_token),
+            'results': data,
+        })
+
+
+def _etag(request, rows) -> str:
+    """Strong ETag over the rows' fingerprints and the request shape."""
+    digest = hashlib.md5(request.get_full_path().encode())
+    for row in rows:
+        digest.update(f'{row.pk}:{row.fingerprint};'.encode())
+    return quote_etag(digest.hexdigest())
+
+
+def _not_modified(request, etag: str) -> bool:
+    return etag in parse_etags(request.headers.get('If-None-Match', ''))
+
+
+class _ConditionalViewSet(viewsets.ReadOnlyModelViewSet):
+    """Sparse-field querysets plus ETag / If-None-Match handling."""
+    pagination_class = KeysetCursorPagination
+    related = ()
+    fingerprint_fields = ()
+
+    def get_base_queryset(self):
+        raise NotImplementedError
+
+    def get_queryset(self):
+        serializer_class = self.get_serializer_class()
+        columns = serializer_class.model_columns(
+            serializer_class.requested_fields(self.request))
+        # the fingerprint is computed by the database, so leaving a column
+        # (e.g. body) out of the SELECT still lets its changes reach the ETag
+        parts = []
+        for name in self.fingerprint_fields:
+            parts += [Coalesce(Cast(name, CharField()), Value('')),
+                      Value('|')]
+        related = [name for name in self.related
+                   if any(c.startswith(f'{name}__') for c in columns)]
+        queryset = self.get_base_queryset()
+        if related:
+            # a bare select_related() would follow (and load) every FK
+            queryset = queryset.select_related(*related)
+        # the paginator reads the key of the first and last rows
+        return queryset.only(*columns, *KEYSET_COLUMNS).annotate(
+            fingerprint=MD5(Concat(*parts, output_field=CharField())))
+
+    def _respond(self, rows, build):
+        etag = _etag(self.request, rows)
+        if _not_modified(self.request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED,
+                            headers={'ETag': etag})
+        response = build()
+        response['ETag'] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        rows = self.paginate_queryset(self.get_queryset())
+        return self._respond(rows, lambda: self.get_paginated_response(
+            self.get_serializer(rows, many=True).data))
+
+    def retrieve(self, request, *args, **kwargs):
+        row = self.get_object()
+        return self._respond([row], lambda: Response(
+            self.get_serializer(row).data))
+
+
+class PostViewSet(_ConditionalViewSet):
+    """Posts, newest first."""
+    serializer_class = PostSerializer
+    related = ('author',)
+    # updated_at is bumped by Post.save() and by comment activity; body_html
+    # is what the API serves as body, so a changed rendering changes the ETag
+    fingerprint_fields = ('updated_at', 'body_html')
+
+    def get_base_queryset(self):
+        return Post.objects.all()
+
+
+class CommentViewSet(_ConditionalViewSet):
+    """Comments, newest first; posts/<post_pk>/comments/ scopes to a post."""
+    serializer_class = CommentSerializer
+    related = ('the_user',)
+    fingerprint_fields = ('comment', 'date', 'the_user__username')
+
+    def get_base_queryset(self):
+        queryset = Comments.objects.all()
+        if 'post_pk' in self.kwargs:
+            queryset = queryset.filter(post_id=self.kwargs['post_pk'])
+        return queryset
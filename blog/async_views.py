@@ -0,0 +1,151 @@
+"""
+Async versions of the read-heavy views, used when ASYNC_VIEWS is enabled
+(the default under the uvicorn worker, see config/gunicorn.py).
+
+They render the same templates through the same cache, conditional GET
+and query budget decorators as blog.views, but wait on the database and
+the cache without holding a worker thread, so slow clients and slow
+queries no longer pin one thread each. Querysets are evaluated with the
+async ORM before rendering: templates must never trigger a query here.
+"""
+from os import environ
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.shortcuts import aget_object_or_404, redirect, render
+from django.utils import timezone
+from dotenv import load_dotenv
+
+from .conditional import (alisting_last_modified, apost_last_modified,
+                          conditional_page)
+from .forms import UsersComments
+from .models import Comments, Post
+from .pagecache import aadd_cache_tags, cached_page
+from .pagination import (BLOGS_PER_PAGE, POST_COUNT_CACHE_KEY,
+                         CachedCountPaginator, InvalidCursor, KeysetPaginator)
+from .querybudget import query_budget
+from .views import COMMENTS_PER_PAGE
+
+load_dotenv()
+
+
+@query_budget(4)
+@conditional_page(alisting_last_modified)
+@cached_page
+async def home(request):
+    """Render the home page with latest blog posts."""
+    await aadd_cache_tags(request, 'listing')
+    blog_data = [post async for post in Post.objects.for_listing()[:3]]
+    await aadd_cache_tags(
+        request, *(f'listed:{post.id}' for post in blog_data))
+    return render(request, 'index.html', {
+        'slice_blog_data': blog_data,
+        'year': timezone.now().year,
+        'whatsapp': environ.get('WHATSAPP'),
+        'github': environ.get('GITHUB'),
+        'linkedin': environ.get('LINKEDIN'),
+    })
+
+
+def _numbered_page(posts, number):
+    paginator = CachedCountPaginator(
+        posts, BLOGS_PER_PAGE, cache_key=POST_COUNT_CACHE_KEY)
+    page = paginator.get_page(number)
+    page.object_list = list(page.object_list)
+    return page
+
+
+@query_budget(5)
+@conditional_page(alisting_last_modified)
+@cached_page
+async def all_blogs(request):
+    """Render the list of all blog posts (see blog.views.all_blogs)."""
+    posts = Post.objects.for_listing()
+    await aadd_cache_tags(request, 'listing')
+
+    if 'page' in request.GET:
+        await aadd_cache_tags(request, 'listing:numbered')
+        blogs = await sync_to_async(_numbered_page)(
+            posts, request.GET.get('page'))
+        current_page = blogs.number
+    else:
+        keyset = KeysetPaginator(posts, BLOGS_PER_PAGE)
+        try:
+            blogs = await keyset.apage(request.GET.get('cursor'))
+        except InvalidCursor:
+            blogs = await keyset.apage()
+        current_page = None
+    await aadd_cache_tags(request, *(f'listed:{post.id}' for post in blogs))
+
+    return render(request, 'allBlogs.html', {
+        'blogs': blogs,
+        'current_page': current_page,
+        'year': timezone.now().year,
+        'whatsapp': environ.get('WHATSAPP'),
+        'github': environ.get('GITHUB'),
+        'linkedin': environ.get('LINKEDIN'),
+    })
+
+
+async def _comments_page(post_id, cursor=None):
+    paginator = KeysetPaginator(
+        Comments.objects.filter(post_id=post_id).select_related('the_user'),
+        COMMENTS_PER_PAGE, ordering=('-date', '-id'))
+    try:
+        return await paginator.apage(cursor)
+    except InvalidCursor:
+        return await paginator.apage()
+
+
+@query_budget(6)
+@conditional_page(apost_last_modified)
+@cached_page
+async def show_post(request, post_id):
+    """Display a single blog post and handle comments."""
+    await aadd_cache_tags(request, f'post:{post_id}', f'comments:{post_id}')
+    post_to_disp = await aget_object_or_404(
+        Post.objects.select_related('author').defer('body', 'body_text'),
+        id=post_id)
+    comments_form = UsersComments()
+
+    if request.method == 'POST':
+        user = await request.auser()
+        if not user.is_authenticated:
+            messages.error(request, 'Login to add comment!')
+            return redirect('login')
+
+        comments_form = UsersComments(request.POST)
+        if comments_form.is_valid():
+            await Comments.objects.acreate(
+                comment=comments_form.cleaned_data['comment'],
+                the_user=user,
+                post=post_to_disp
+            )
+            messages.success(request, 'Comment added!')
+            return redirect(f'{post_to_disp.get_absolute_url()}#comments')
+        request.fragment_context = {'form': comments_form}
+
+    comments = await _comments_page(post_id)
+
+    return render(request, 'post.html', {
+        'post': post_to_disp,
+        'year': timezone.now().year,
+        'form': comments_form,
+        'comments': comments,
+        'date_composed': post_to_disp.date.strftime('%Y-%m-%d'),
+        'whatsapp': environ.get('WHATSAPP'),
+        'github': environ.get('GITHUB'),
+        'linkedin': environ.get('LINKEDIN'),
+    })
+
+
+async def about_page(request):
+    """Render the about page."""
+    return render(request, 'about.html', {
+        'year': timezone.now().year,
+        'year_of_exp': (timezone.now().year) - 2022,
+        'whatsapp': environ.get('WHATSAPP'),
+        'github': environ.get('GITHUB'),
+        'linkedin': environ.get('LINKEDIN'),
+        'portfolio_site': environ.get('PORTFOLIO'),
+    })
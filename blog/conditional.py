@@ -0,0 +1,159 @@
+"""
+Conditional GET (ETag / Last-Modified / 304) for the HTML pages.
+
+Every page is validated against Post.updated_at, which Post.save() and
+the comment signals bump, so a revalidation costs one indexed lookup
+(a primary key read for a post, MAX(updated_at) for the listings) instead
+of running the view. Deletions leave no row behind to carry a timestamp,
+so they are recorded in the shared cache by mark_posts_deleted().
+
+Pages carry per-user fragments, so the ETag also covers the logged-in
+user and responses vary on Cookie. Requests with flash messages waiting
+always get a full response, otherwise the message would never be shown.
+"""
+import hashlib
+from datetime import datetime
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Callable
+
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import cache
+from django.db.models import Max
+from django.http import HttpRequest, HttpResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition
+
+from .models import Post
+
+POSTS_DELETED_CACHE_KEY: str = 'blog:posts_deleted_at'
+
+
+def mark_posts_deleted() -> None:
+    """Record that a post disappeared from the listings just now."""
+    cache.set(POSTS_DELETED_CACHE_KEY, timezone.now(), None)
+
+
+def _posts_deleted_at() -> datetime:
+    deleted_at = cache.get(POSTS_DELETED_CACHE_KEY)
+    if deleted_at is None:
+        # the marker was evicted: assume a deletion now rather than risk
+        # confirming a listing that still shows a deleted post
+        cache.add(POSTS_DELETED_CACHE_KEY, timezone.now(), None)
+        deleted_at = cache.get(POSTS_DELETED_CACHE_KEY, timezone.now())
+    return deleted_at
+
+
+async def _aposts_deleted_at() -> datetime:
+    deleted_at = await cache.aget(POSTS_DELETED_CACHE_KEY)
+    if deleted_at is None:
+        await cache.aadd(POSTS_DELETED_CACHE_KEY, timezone.now(), None)
+        deleted_at = await cache.aget(
+            POSTS_DELETED_CACHE_KEY, timezone.now())
+    return deleted_at
+
+
+def post_last_modified(request: HttpRequest, post_id: int,
+                       *args, **kwargs) -> datetime | None:
+    """When the post page last changed, or None if the post is gone."""
+    return Post.objects.filter(pk=post_id).values_list(
+        'updated_at', flat=True).first()
+
+
+def listing_last_modified(request: HttpRequest,
+                          *args, **kwargs) -> datetime:
+    """When any post shown on the home page or the listings last changed."""
+    latest = Post.objects.aggregate(latest=Max('updated_at'))['latest']
+    deleted_at = _posts_deleted_at()
+    return max(latest, deleted_at) if latest else deleted_at
+
+
+async def apost_last_modified(request: HttpRequest, post_id: int,
+                              *args, **kwargs) -> datetime | None:
+    """Async post_last_modified() for the async views."""
+    return await Post.objects.filter(pk=post_id).values_list(
+        'updated_at', flat=True).afirst()
+
+
+async def alisting_last_modified(request: HttpRequest,
+                                 *args, **kwargs) -> datetime:
+    """Async listing_last_modified() for the async views."""
+    latest = (await Post.objects.aaggregate(
+        latest=Max('updated_at')))['latest']
+    deleted_at = await _aposts_deleted_at()
+    return max(latest, deleted_at) if latest else deleted_at
+
+
+def _has_pending_messages(request: HttpRequest) -> bool:
+    cookie_name = getattr(settings, 'MESSAGE_COOKIE_NAME', 'messages')
+    return (cookie_name in request.COOKIES
+            or '_messages' in getattr(request, 'session', {}))
+
+
+async def _ahas_pending_messages(request: HttpRequest) -> bool:
+    cookie_name = getattr(settings, 'MESSAGE_COOKIE_NAME', 'messages')
+    session = getattr(request, 'session', None)
+    return (cookie_name in request.COOKIES
+            or (session is not None and await session.ahas_key('_messages')))
+
+
+def _etag(last_modified: datetime, user_id: str) -> str:
+    return hashlib.md5(
+        f'{last_modified.isoformat()}:{user_id}'.encode()).hexdigest()
+
+
+def _conditional(view_func, etag: str, last_modified: datetime):
+    return condition(
+        etag_func=lambda *a, **kw: etag,
+        last_modified_func=lambda *a, **kw: last_modified,
+    )(view_func)
+
+
+def _finish(response: HttpResponse) -> HttpResponse:
+    patch_cache_control(response, no_cache=True)
+    patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+def conditional_page(last_modified_func: Callable[..., datetime | None]):
+    """
+    Answer If-None-Match / If-Modified-Since with 304 when the content
+    last_modified_func reports has not changed for this user. Async views
+    take a coroutine function such as alisting_last_modified().
+    """
+    def decorator(view_func: Callable[..., HttpResponse]
+                  ) -> Callable[..., HttpResponse]:
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_view(request: HttpRequest, *args,
+                                    **kwargs) -> HttpResponse:
+                if (request.method not in ('GET', 'HEAD')
+                        or await _ahas_pending_messages(request)):
+                    return _finish(await view_func(request, *args, **kwargs))
+                last_modified = await last_modified_func(
+                    request, *args, **kwargs)
+                if last_modified is None:
+                    return _finish(await view_func(request, *args, **kwargs))
+                user_id = await request.session.aget(SESSION_KEY, '')
+                view = _conditional(
+                    view_func, _etag(last_modified, user_id), last_modified)
+                return _finish(await view(request, *args, **kwargs))
+        else:
+            @wraps(view_func)
+            def _wrapped_view(request: HttpRequest, *args,
+                              **kwargs) -> HttpResponse:
+                if (request.method not in ('GET', 'HEAD')
+                        or _has_pending_messages(request)):
+                    return _finish(view_func(request, *args, **kwargs))
+                last_modified = last_modified_func(request, *args, **kwargs)
+                if last_modified is None:
+                    return _finish(view_func(request, *args, **kwargs))
+                user_id = request.session.get(SESSION_KEY, '')
+                view = _conditional(
+                    view_func, _etag(last_modified, user_id), last_modified)
+                return _finish(view(request, *args, **kwargs))
+
+        return _wrapped_view
+    return decorator
@@ -0,0 +1,313 @@
+"""
+Build-time CSS pruning, minification and critical CSS extraction.
+
+The stylesheet is parsed into rules and at-rules, and a rule survives
+only if every class, id and element name in one of its selectors occurs
+in the markup (templates, JavaScript and the Python that renders
+widgets). Matching is by word, so it errs towards keeping rules: a class
+assembled in a template expression still counts as used as long as the
+name appears somewhere.
+
+Critical CSS is the same pruning restricted to what is visible before
+any scrolling: base.html's navigation and the page's masthead header.
+"""
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from .rendering import ALLOWED_TAGS
+
+# nested at-rules whose children are rules; anything else is kept verbatim
+NESTING_AT_RULES = ('@media', '@supports', '@layer', '@container')
+
+# classes toggled by Bootstrap's JavaScript at run time
+SAFELIST = {
+    'active', 'collapse', 'collapsing', 'disabled', 'fade', 'hiding',
+    'is-invalid', 'is-valid', 'modal-backdrop', 'modal-open', 'show',
+    'showing', 'was-validated',
+}
+# elements every page has or Django renders from form widgets and post
+# bodies without them appearing in the templates
+SAFE_TAGS = {
+    'html', 'body', 'button', 'form', 'input', 'label', 'option', 'select',
+    'textarea',
+} | ALLOWED_TAGS
+
+_COMMENT_OR_STRING = re.compile(
+    r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')|/\*.*?\*/', re.S)
+_STRING = re.compile(r'("(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\')')
+_ATTRIBUTE = re.compile(r'\[[^\]]*\]')
+_PSEUDO_FUNCTION = re.compile(r':{1,2}[-\w]+\((?:[^()]|\([^()]*\))*\)')
+_PSEUDO = re.compile(r':{1,2}[-\w]+')
+_CLASS = re.compile(r'\.(-?[_a-zA-Z][-\w]*)')
+_ID = re.compile(r'#(-?[_a-zA-Z][-\w]*)')
+_TAG = re.compile(r'(?<![-\w.#])([a-zA-Z][-\w]*)')
+_WORD = re.compile(r'-?[_a-zA-Z][-\w]*')
+_MARKUP_TAG = re.compile(r'<([a-zA-Z][-\w]*)')
+_EXTENDS = re.compile(r'{%\s*extends\s+["\']([^"\']+)["\']\s*%}')
+_INCLUDE = re.compile(r'{%\s*include\s+["\']([^"\']+)["\']')
+_FRAGMENT = re.compile(r'{%\s*fragment\s+["\']([\w-]+)["\']')
+_KEYFRAMES = re.compile(r'@(?:-\w+-)?keyframes\b', re.I)
+_HEADER = re.compile(r'<header\b.*?</header>', re.S)
+_HEADER_BLOCK = re.compile(
+    r'{%\s*block\s+header\s*%}(.*?){%\s*endblock', re.S)
+
+
+@dataclass
+class Rule:
+    selectors: list[str]
+    declarations: str
+
+
+@dataclass
+class AtRule:
+    prelude: str
+    # verbatim block (@font-face, @keyframes, ...), None for statements
+    body: str | None = None
+    # parsed block of a NESTING_AT_RULES rule
+    children: list | None = None
+
+
+@dataclass
+class Usage:
+    """Words and element names that occur in some markup."""
+    words: set[str] = field(default_factory=set)
+    tags: set[str] = field(default_factory=set)
+
+    def add(self, text: str) -> None:
+        self.words.update(_WORD.findall(text))
+        self.tags.update(t.lower() for t in _MARKUP_TAG.findall(text))
+
+
+def _scan(css: str, pos: int, stops: str) -> int:
+    """Index of the next stop character outside strings and parentheses."""
+    depth = 0
+    while pos < len(css):
+        char = css[pos]
+        if char in '"\'':
+            match = _STRING.match(css, pos)
+            pos = match.end() if match else pos + 1
+            continue
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            depth = max(depth - 1, 0)
+        elif depth == 0 and char in stops:
+            return pos
+        pos += 1
+    return -1
+
+
+def _matching_brace(css: str, pos: int) -> int:
+    depth = 0
+    while True:
+        pos = _scan(css, pos, '{}')
+        if pos == -1:
+            return len(css)
+        depth += 1 if css[pos] == '{' else -1
+        if depth == 0:
+            return pos
+        pos += 1
+
+
+def _split_top_level(text: str, separator: str = ',') -> list[str]:
+    parts, start, pos = [], 0, 0
+    while True:
+        pos = _scan(text, pos, separator)
+        if pos == -1:
+            parts.append(text[start:])
+            return [part.strip() for part in parts if part.strip()]
+        parts.append(text[start:pos])
+        start = pos = pos + 1
+
+
+def _parse_block(css: str, pos: int) -> tuple[list, int]:
+    nodes = []
+    while pos < len(css):
+        stop = _scan(css, pos, '{};')
+        if stop == -1:
+            break
+        prelude = css[pos:stop].strip()
+        if css[stop] == '}':
+            return nodes, stop + 1
+        if css[stop] == ';':
+            if prelude:
+                nodes.append(AtRule(prelude))
+            pos = stop + 1
+            continue
+        if prelude.lower().startswith(NESTING_AT_RULES):
+            children, pos = _parse_block(css, stop + 1)
+            nodes.append(AtRule(prelude, children=children))
+            continue
+        end = _matching_brace(css, stop)
+        body = css[stop + 1:end]
+        if prelude.startswith('@'):
+            nodes.append(AtRule(prelude, body=body))
+        else:
+            nodes.append(Rule(_split_top_level(prelude), body))
+        pos = end + 1
+    return nodes, len(css)
+
+
+def parse(css: str) -> list:
+    """Parse a stylesheet into a list of Rule and AtRule nodes."""
+    css = _COMMENT_OR_STRING.sub(lambda m: m.group(1) or '', css)
+    return _parse_block(css, 0)[0]
+
+
+def selector_used(selector: str, usage: Usage) -> bool:
+    """True if every class, id and element in selector occurs in usage."""
+    simple = _PSEUDO.sub('', _PSEUDO_FUNCTION.sub(
+        '', _ATTRIBUTE.sub('', selector)))
+    names = _CLASS.findall(simple) + _ID.findall(simple)
+    if not all(name in usage.words or name in SAFELIST for name in names):
+        return False
+    elements = _TAG.findall(_ID.sub('', _CLASS.sub('', simple)))
+    return all(tag.lower() in usage.tags or tag.lower() in SAFE_TAGS
+               for tag in elements)
+
+
+def prune(nodes: list, usage: Usage) -> list:
+    """The rules of nodes that can match markup described by usage."""
+    kept = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            selectors = [s for s in node.selectors if selector_used(s, usage)]
+            if selectors:
+                kept.append(Rule(selectors, node.declarations))
+        elif node.children is not None:
+            children = prune(node.children, usage)
+            if children:
+                kept.append(AtRule(node.prelude, children=children))
+        elif not node.prelude.lower().startswith('@charset'):
+            kept.append(node)
+
+    # drop animations nothing refers to any more
+    referenced = serialize([n for n in kept if not _is_keyframes(n)])
+    return [n for n in kept if not _is_keyframes(n)
+            or n.prelude.split()[-1] in referenced]
+
+
+def _is_keyframes(node) -> bool:
+    return (isinstance(node, AtRule)
+            and _KEYFRAMES.match(node.prelude) is not None)
+
+
+def _outside_strings(text: str, func) -> str:
+    parts = _STRING.split(text)
+    # odd indices are the quoted strings captured by the split
+    return ''.join(part if i % 2 else func(part)
+                   for i, part in enumerate(parts))
+
+
+def _minify_declarations(body: str) -> str:
+    def squeeze(text):
+        text = re.sub(r'\s+', ' ', text)
+        text = re.sub(r'\s*([;:{}])\s*', r'\1', text)
+        return re.sub(r'\s*!\s*important', '!important', text)
+    return _outside_strings(body, squeeze).strip().rstrip(';')
+
+
+def _minify_selector(selector: str) -> str:
+    def squeeze(text):
+        text = re.sub(r'\s+', ' ', text)
+        return re.sub(r'\s*([>+~,])\s*', r'\1', text)
+    return _outside_strings(selector, squeeze).strip()
+
+
+def _minify_prelude(prelude: str) -> str:
+    def squeeze(text):
+        text = re.sub(r'\s+', ' ', text)
+        return re.sub(r'\s*([:,])\s*', r'\1', text)
+    return _outside_strings(prelude, squeeze).strip()
+
+
+def serialize(nodes: list) -> str:
+    """Minified CSS for nodes."""
+    out = []
+    for node in nodes:
+        if isinstance(node, Rule):
+            out.append(','.join(map(_minify_selector, node.selectors))
+                       + '{' + _minify_declarations(node.declarations) + '}')
+        elif node.children is not None:
+            out.append(_minify_prelude(node.prelude)
+                       + '{' + serialize(node.children) + '}')
+        elif node.body is not None:
+            nested = parse(node.body)
+            inner = (serialize(nested)
+                     if nested and all(isinstance(n, Rule) for n in nested)
+                     else _minify_declarations(node.body))
+            out.append(_minify_prelude(node.prelude) + '{' + inner + '}')
+        else:
+            out.append(_minify_prelude(node.prelude) + ';')
+    return ''.join(out)
+
+
+def build(css: str, usage: Usage) -> str:
+    """Prune css to usage and minify it."""
+    output = serialize(prune(parse(css), usage))
+    if not output.isascii():
+        output = '@charset "UTF-8";' + output
+    return output
+
+
+class TemplateScanner:
+    """Collect the markup of templates under a root directory."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+
+    def read(self, name: str) -> str:
+        path = (self.root / name).resolve()
+        if self.root.resolve() not in path.parents or not path.is_file():
+            # "../base.html" style names are relative to the root
+            path = self.root / Path(name).name
+        return path.read_text(encoding='utf-8') if path.is_file() else ''
+
+    def expand(self, text: str, seen: set[str] | None = None) -> str:
+        """text plus every template it includes or fragment it emits."""
+        seen = set() if seen is None else seen
+        parts = [text]
+        names = _INCLUDE.findall(text) + [
+            f'fragments/{name}.html' for name in _FRAGMENT.findall(text)]
+        for name in names:
+            if name not in seen:
+                seen.add(name)
+                parts.append(self.expand(self.read(name), seen))
+        return '\n'.join(parts)
+
+    def page_templates(self) -> list[str]:
+        """Templates rendered as whole pages (those extending another)."""
+        return sorted(
+            path.relative_to(self.root).as_posix()
+            for path in self.root.rglob('*.html')
+            if _EXTENDS.search(path.read_text(encoding='utf-8')))
+
+    def above_the_fold(self, name: str) -> str:
+        """Navigation from the base template plus the page's masthead."""
+        text = self.read(name)
+        parts = []
+        parent = _EXTENDS.search(text)
+        if parent:
+            base = self.read(parent.group(1))
+            parts.append(re.split(r'{%\s*block\s+content', base)[0])
+        header_block = _HEADER_BLOCK.search(text)
+        if header_block:
+            parts.append(header_block.group(1))
+        masthead = _HEADER.search(_HEADER_BLOCK.sub('', text))
+        if masthead:
+            parts.append(masthead.group(0))
+        return self.expand('\n'.join(parts))
+
+
+def critical_css_name(template_name: str) -> str:
+    """File name of the critical CSS built for template_name."""
+    return template_name.replace('/', '--').rsplit('.', 1)[0] + '.css'
+
+
+def collect_usage(paths) -> Usage:
+    """Usage of every file in paths."""
+    usage = Usage()
+    for path in paths:
+        usage.add(Path(path).read_text(encoding='utf-8', errors='ignore'))
+    return usage
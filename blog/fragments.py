@@ -0,0 +1,64 @@
+from django.http import HttpRequest
+
+from .forms import UsersComments
+from .models import Post
+from .pagecache import register_fragment
+from .pagination import (BLOGS_PER_PAGE, POST_COUNT_CACHE_KEY,
+                         CachedCountPaginator)
+
+
+def _is_admin(user) -> bool:
+    return user.is_authenticated and (
+        user.is_superuser
+        or user.is_staff
+        or getattr(user, 'role', '') == 'admin'
+    )
+
+
+@register_fragment('nav_auth', 'fragments/nav_auth.html')
+def nav_auth(request: HttpRequest, arg: str) -> dict:
+    return {}
+
+
+@register_fragment('messages', 'fragments/messages.html')
+def flash_messages(request: HttpRequest, arg: str) -> dict:
+    return {}
+
+
+@register_fragment('add_post_button', 'fragments/add_post_button.html')
+def add_post_button(request: HttpRequest, arg: str) -> dict:
+    return {}
+
+
+@register_fragment('post_delete_button', 'fragments/post_delete_button.html')
+def post_delete_button(request: HttpRequest, arg: str) -> dict:
+    return {'is_admin': _is_admin(request.user), 'post_id': arg}
+
+
+@register_fragment('post_edit_button', 'fragments/post_edit_button.html')
+def post_edit_button(request: HttpRequest, arg: str) -> dict:
+    return {'is_admin': _is_admin(request.user), 'post_id': arg}
+
+
+@register_fragment('comment_form', 'fragments/comment_form.html')
+def comment_form(request: HttpRequest, arg: str) -> dict:
+    # a bound form with errors is handed over by show_post on POST
+    form = getattr(request, 'fragment_context', {}).get('form')
+    return {'form': form or UsersComments(), 'post_id': arg}
+
+
+@register_fragment('blog_page_numbers', 'fragments/blog_page_numbers.html')
+def blog_page_numbers(request: HttpRequest, arg: str) -> dict:
+    # the total changes with every new post, so it is kept out of the
+    # cached listing body and read from the cached count instead
+    paginator = CachedCountPaginator(
+        Post.objects.all(), BLOGS_PER_PAGE, cache_key=POST_COUNT_CACHE_KEY)
+    try:
+        current_page = int(arg) if arg else None
+    except ValueError:
+        current_page = None
+    return {
+        'current_page': current_page,
+        'page_range': paginator.get_elided_page_range(current_page or 1),
+        'total_posts': paginator.count,
+    }
@@ -0,0 +1,174 @@
+"""
+Responsive derivatives of header images and static backgrounds.
+
+The build_images command resizes every local image (static files and
+uploads under MEDIA_ROOT) to IMAGE_DERIVATIVE_WIDTHS in WebP and JPEG,
+plus a tiny blurred placeholder inlined as a data URI. Output file names
+carry a hash of the source bytes, and the manifest records that hash per
+source, so unchanged images are skipped on the next run.
+
+Templates look sources up through the ``images`` template tags, by URL
+or, for static files, by their name (the storage may serve those under a
+hashed URL); remote URLs, or images not built yet, fall back to the
+original file.
+"""
+import base64
+import hashlib
+import io
+import json
+import os
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.templatetags.static import static
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp')
+MANIFEST_NAME = 'manifest.json'
+PLACEHOLDER_WIDTH = 20
+
+# extension -> (Pillow format, mime type, save options)
+FORMATS = {
+    'webp': ('WEBP', 'image/webp', {'quality': 78, 'method': 6}),
+    'jpg': ('JPEG', 'image/jpeg',
+            {'quality': 80, 'optimize': True, 'progressive': True}),
+}
+
+_manifest_cache: dict[str, tuple[float, dict]] = {}
+
+
+def derivatives_root() -> Path:
+    return Path(settings.IMAGE_DERIVATIVES_ROOT)
+
+
+def manifest_path() -> Path:
+    return derivatives_root() / MANIFEST_NAME
+
+
+def load_manifest() -> dict:
+    """The manifest, re-read only when the file changes."""
+    path = manifest_path()
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return {}
+    cached = _manifest_cache.get(str(path))
+    if cached and cached[0] == mtime:
+        return cached[1]
+    with open(path, encoding='utf-8') as fh:
+        manifest = json.load(fh)
+    _manifest_cache[str(path)] = (mtime, manifest)
+    return manifest
+
+
+def save_manifest(manifest: dict) -> None:
+    path = manifest_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix('.tmp')
+    with open(tmp, 'w', encoding='utf-8') as fh:
+        json.dump(manifest, fh, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def source_images() -> dict[str, Path]:
+    """Every local image that can be built, keyed by the URL serving it."""
+    roots = [(Path(d), settings.STATIC_URL)
+             for d in settings.STATICFILES_DIRS]
+    if settings.MEDIA_ROOT:
+        roots.append((Path(settings.MEDIA_ROOT), settings.MEDIA_URL))
+    output = derivatives_root().resolve()
+
+    sources = {}
+    for root, url_prefix in roots:
+        if not root.is_dir():
+            continue
+        for path in sorted(root.rglob('*')):
+            if (path.suffix.lower() not in IMAGE_EXTENSIONS
+                    or output in path.resolve().parents):
+                continue
+            relative = path.relative_to(root).as_posix()
+            sources[url_prefix.rstrip('/') + '/' + relative] = path
+    return sources
+
+
+def content_hash(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:16]
+
+
+def build_derivatives(path: str, digest: str, out_dir: str,
+                      widths: tuple[int, ...]) -> dict:
+    """
+    Write the resized variants of the image at path and return its
+    manifest entry. Runs in worker processes, so it only takes plain values.
+    """
+    from PIL import Image, ImageFilter, ImageOps
+
+    with Image.open(path) as original:
+        image = ImageOps.exif_transpose(original).convert('RGB')
+    width, height = image.size
+    stem = Path(path).stem
+    # never upscale; the original width stands in for larger targets
+    targets = sorted({min(w, width) for w in widths})
+
+    variants = {ext: [] for ext in FORMATS}
+    for target in targets:
+        resized = image if target == width else image.resize(
+            (target, round(height * target / width)), Image.LANCZOS)
+        for ext, (fmt, _mime, options) in FORMATS.items():
+            name = f'{stem}.{digest}.{target}.{ext}'
+            resized.save(os.path.join(out_dir, name), fmt, **options)
+            variants[ext].append([target, name])
+
+    tiny = image.resize(
+        (PLACEHOLDER_WIDTH, max(1, round(height * PLACEHOLDER_WIDTH / width))),
+        Image.BILINEAR).filter(ImageFilter.GaussianBlur(1))
+    buffer = io.BytesIO()
+    tiny.save(buffer, 'JPEG', quality=40)
+    placeholder = ('data:image/jpeg;base64,'
+                   + base64.b64encode(buffer.getvalue()).decode())
+
+    return {
+        'hash': digest,
+        'width': width,
+        'height': height,
+        'variants': variants,
+        'placeholder': placeholder,
+    }
+
+
+def lookup(url: str | None) -> dict | None:
+    """Manifest entry for the image served at url, if it has been built."""
+    if not url:
+        return None
+    parts = urlsplit(url)
+    if parts.netloc:
+        return None
+    return load_manifest().get(parts.path)
+
+
+def resolve(src: str | None) -> tuple[str, dict | None]:
+    """
+    The URL serving src and its manifest entry. src is either a URL
+    (post images, uploads) or the name of a static file such as
+    'assets/img/home-bg.jpg', which is looked up by its unhashed URL.
+    """
+    if not src:
+        return '', None
+    parts = urlsplit(src)
+    if parts.scheme or parts.netloc or src.startswith('/'):
+        return src, lookup(src)
+    key = settings.STATIC_URL.rstrip('/') + '/' + src
+    return static(src), load_manifest().get(key)
+
+
+def derivative_url(name: str) -> str:
+    return static(f'{settings.IMAGE_DERIVATIVES_URL}{name}')
+
+
+def srcset(entry: dict, ext: str) -> str:
+    return ', '.join(f'{derivative_url(name)} {width}w'
+                     for width, name in entry['variants'][ext])
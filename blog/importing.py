@@ -0,0 +1,379 @@
+"""
+Bulk import of posts and their comments.
+
+Two sources are read as streams, one record at a time:
+
+* JSON lines (optionally gzipped), one post per line::
+
+    {"title": "...", "subtitle": "...", "body": "<p>...</p>",
+     "author": "alice", "date": "2024-05-01T09:30:00+00:00",
+     "img_url": "...", "comments": [
+         {"user": "bob", "comment": "...", "date": "..."}]}
+
+  ``author__username`` (as written by the admin JSONL export) is accepted
+  for ``author``. Only title, body and author are required.
+
+* A directory of Markdown files, each with a front matter block of
+  ``key: value`` lines (title, subtitle, author, date, img_url) between
+  ``---`` lines. The body is converted with the optional ``markdown``
+  package, or split into headings and paragraphs without it.
+
+PostImporter writes a batch of records with bulk_create in one
+transaction: posts carry their rendered body and comment counters, so
+neither save() nor the comment signals are needed. Authors are looked up
+by username once per batch for the names not seen before and kept for the
+rest of the import.
+
+Records with a ``model`` key come from a site backup (see blog.backup)
+and are restored rather than added: users are upserted by username with
+their profile, posts and comments by id, keeping their counters. Call
+finish() once at the end so the id sequences move past the restored ids.
+"""
+import gzip
+import json
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from datetime import timezone as dt_timezone
+from html import escape
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from users.models import Profile
+
+from .backup import USER_FIELDS
+from .models import Comments, Post
+from .rendering import render_body
+from .signals import posts_bulk_loaded
+
+try:
+    import markdown
+except ImportError:  # pragma: no cover - optional dependency
+    markdown = None
+
+# backup records that only describe the export
+INFORMATIONAL_MODELS = ('meta', 'media')
+FRONT_MATTER_RE = re.compile(r'\A---\s*\n(.*?)\n---\s*\n', re.DOTALL)
+HEADING_RE = re.compile(r'(#{1,6})\s+(.+)')
+
+
+class InvalidRecord(ValueError):
+    """Raised for input that cannot be imported."""
+
+
+def _open_text(path: Path):
+    if path.suffix == '.gz':
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return path.open(encoding='utf-8')
+
+
+def read_jsonl(path: Path, skip: int = 0) -> Iterator[dict]:
+    """The records of a JSON lines file, after the first skip lines."""
+    with _open_text(path) as lines:
+        for number, line in enumerate(islice(lines, skip, None), skip + 1):
+            if not line.strip():
+                yield {}
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise InvalidRecord(f'{path}:{number}: {e}') from None
+
+
+def markdown_to_html(text: str) -> str:
+    if markdown is not None:
+        return markdown.markdown(text, extensions=['extra'])
+    # without the package: ATX headings and paragraphs only
+    blocks = []
+    for block in re.split(r'\n\s*\n', text.strip()):
+        heading = HEADING_RE.fullmatch(block.strip())
+        if heading:
+            level = len(heading[1])
+            blocks.append(f'<h{level}>{escape(heading[2])}</h{level}>')
+        elif block.strip():
+            blocks.append(f'<p>{escape(" ".join(block.split()))}</p>')
+    return '\n'.join(blocks)
+
+
+def parse_markdown(text: str, default_title: str = '') -> dict:
+    """A record from a Markdown document with front matter."""
+    record = {'title': default_title}
+    match = FRONT_MATTER_RE.match(text)
+    if match:
+        for line in match[1].splitlines():
+            key, sep, value = line.partition(':')
+            if sep and key.strip():
+                record[key.strip()] = value.strip().strip('\'"')
+        text = text[match.end():]
+    record['body'] = markdown_to_html(text)
+    return record
+
+
+def read_markdown_dir(path: Path, skip: int = 0) -> Iterator[dict]:
+    """The records of the *.md files under path, in file name order."""
+    files = sorted(path.rglob('*.md'))
+    for file in files[skip:]:
+        yield parse_markdown(file.read_text(encoding='utf-8'), file.stem)
+
+
+def read_records(path: Path, skip: int = 0) -> Iterator[dict]:
+    if path.is_dir():
+        return read_markdown_dir(path, skip)
+    return read_jsonl(path, skip)
+
+
+def _parse_date(value, default: datetime) -> datetime:
+    if not value:
+        return default
+    parsed = parse_datetime(str(value))
+    if parsed is None:
+        raise InvalidRecord(f'invalid date {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed, dt_timezone.utc)
+    return parsed
+
+
+@dataclass
+class ImportResult:
+    posts: int = 0
+    comments: int = 0
+    users: int = 0
+    skipped: int = 0
+    unknown_authors: set = field(default_factory=set)
+    # ids of backup posts skipped for their unknown authors
+    skipped_posts: set = field(default_factory=set)
+
+
+class PostImporter:
+    """
+    Writes batches of post records, caching the author lookups.
+
+    skipped_posts are the ids of backup posts an earlier run skipped, whose
+    comments are skipped as well when the import is resumed.
+    """
+
+    def __init__(self, create_authors: bool = False,
+                 skipped_posts: Iterable[int] = ()):
+        self.create_authors = create_authors
+        self._user_ids: dict[str, int | None] = {}
+        self._skipped_posts: set[int] = set(skipped_posts)
+        self._explicit_ids = False
+
+    def _resolve(self, usernames: Iterable[str]) -> None:
+        missing = {name for name in usernames
+                   if name and name not in self._user_ids}
+        if not missing:
+            return
+        User = get_user_model()
+        found = dict(User.objects.filter(username__in=missing)
+                     .values_list('username', 'pk'))
+        new = missing - found.keys()
+        if new and self.create_authors:
+            users = [User(username=name) for name in sorted(new)]
+            for user in users:
+                user.set_unusable_password()
+            users = User.objects.bulk_create(users)
+            Profile.objects.bulk_create([Profile(user=u) for u in users])
+            found.update((u.username, u.pk) for u in users)
+        for name in missing:
+            self._user_ids[name] = found.get(name)
+
+    def import_batch(self, records: list[dict]) -> ImportResult:
+        """Insert one batch of records in a single transaction."""
+        result = ImportResult()
+        now = timezone.now()
+        backup = [r for r in records if 'model' in r]
+        records = [r for r in records if 'model' not in r]
+        restored_ids = []
+        with transaction.atomic():
+            if backup:
+                restored_ids = self._restore(backup, now, result)
+            self._resolve(
+                [r.get('author') or r.get('author__username')
+                 for r in records]
+                + [c.get('user') for r in records
+                   for c in r.get('comments', ())])
+            posts, threads = self._build(records, now, result)
+            Post.objects.bulk_create(posts)
+            for post, comments in zip(posts, threads):
+                for comment in comments:
+                    comment.post = post
+            result.comments += len(Comments.objects.bulk_create(
+                [c for comments in threads for c in comments]))
+        posts_bulk_loaded(restored_ids)
+        result.posts += len(posts)
+        return result
+
+    def finish(self) -> None:
+        """Move the id sequences past the ids restored from a backup."""
+        if not self._explicit_ids:
+            return
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [Post, Comments])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+    def _post(self, record: dict, author_id: int, now: datetime,
+              **fields) -> Post:
+        if not record.get('title') or not record.get('body'):
+            raise InvalidRecord(
+                f'record without title or body: {record.get("title")!r}')
+        fields.setdefault('updated_at', now)
+        return Post(
+            title=record['title'][:200],
+            subtitle=(record.get('subtitle') or '')[:300],
+            body=record['body'],
+            img_url=record.get('img_url') or None,
+            author_id=author_id,
+            date=_parse_date(record.get('date'), now),
+            **fields,
+            **render_body(record['body']))
+
+    def _build(self, records: list[dict], now: datetime,
+               result: ImportResult) -> tuple[list, list]:
+        posts, threads = [], []
+        for record in records:
+            if not record:
+                continue
+            author = record.get('author') or record.get('author__username')
+            author_id = self._user_ids.get(author)
+            if author_id is None:
+                result.skipped += 1
+                result.unknown_authors.add(author)
+                continue
+            post = self._post(record, author_id, now)
+            comments = []
+            for item in record.get('comments', ()):
+                if not item.get('comment'):
+                    raise InvalidRecord(
+                        f'comment without text on {record["title"]!r}')
+                # comments by unknown users are kept as anonymous
+                comments.append(Comments(
+                    the_user_id=self._user_ids.get(item.get('user')),
+                    comment=item['comment'],
+                    date=_parse_date(item.get('date'), post.date)))
+            post.comment_count = len(comments)
+            post.last_commented_at = max(
+                (c.date for c in comments), default=None)
+            posts.append(post)
+            threads.append(comments)
+        return posts, threads
+
+    def _restore(self, records: list[dict], now: datetime,
+                 result: ImportResult) -> list[int]:
+        """Upsert backup records; returns the ids of the restored posts."""
+        by_model = {'user': [], 'post': [], 'comment': []}
+        for record in records:
+            if record['model'] in by_model:
+                by_model[record['model']].append(record)
+            elif record['model'] not in INFORMATIONAL_MODELS:
+                raise InvalidRecord(f'unknown model {record["model"]!r}')
+        if by_model['user']:
+            result.users = self._restore_users(by_model['user'])
+        self._resolve([r.get('author') for r in by_model['post']]
+                      + [r.get('user') for r in by_model['comment']])
+
+        posts = []
+        for record in by_model['post']:
+            author_id = self._user_ids.get(record.get('author'))
+            if author_id is None:
+                result.skipped += 1
+                result.unknown_authors.add(record.get('author'))
+                self._skipped_posts.add(record.get('id'))
+                result.skipped_posts.add(record.get('id'))
+                continue
+            posts.append(self._post(
+                record, author_id, now, id=record['id'],
+                updated_at=_parse_date(record.get('updated_at'), now),
+                comment_count=record.get('comment_count') or 0,
+                last_commented_at=_parse_date(
+                    record.get('last_commented_at'), None)))
+        if posts:
+            Post.objects.bulk_create(
+                posts, update_conflicts=True, unique_fields=['id'],
+                update_fields=[f.name for f in Post._meta.concrete_fields
+                               if not f.primary_key])
+
+        comments = []
+        for record in by_model['comment']:
+            if record.get('post') in self._skipped_posts:
+                continue
+            if not record.get('comment'):
+                raise InvalidRecord(f'comment {record.get("id")} without text')
+            comments.append(Comments(
+                id=record['id'], post_id=record['post'],
+                the_user_id=self._user_ids.get(record.get('user')),
+                comment=record['comment'],
+                date=_parse_date(record.get('date'), now)))
+        self._check_posts_exist(comments, posts)
+        if comments:
+            Comments.objects.bulk_create(
+                comments, update_conflicts=True, unique_fields=['id'],
+                update_fields=['post', 'the_user', 'comment', 'date',
+                               'updated_at'])
+
+        # also after a resume that only had the tail of a backup left
+        self._explicit_ids = True
+        result.posts = len(posts)
+        result.comments = len(comments)
+        return [post.id for post in posts]
+
+    def _check_posts_exist(self, comments: list, posts: list) -> None:
+        # the foreign key would only fail at commit, as an IntegrityError
+        wanted = {c.post_id for c in comments} - {p.id for p in posts}
+        if not wanted:
+            return
+        missing = wanted - set(Post.objects.filter(pk__in=wanted)
+                               .values_list('pk', flat=True))
+        if missing:
+            raise InvalidRecord(
+                f'comments on posts {sorted(missing)[:10]}, which are neither '
+                'in the backup nor in the database; restore the full backup '
+                'this incremental one was taken after first')
+
+    def _restore_users(self, records: list[dict]) -> int:
+        User = get_user_model()
+        # hashes are only in exports that asked for them; the others keep
+        # the password of an existing account and get an unusable one
+        with_password, without_password = [], []
+        for record in records:
+            if not record.get('username'):
+                raise InvalidRecord('user without username')
+            user = User(**{name: record[name] for name in USER_FIELDS
+                           if name in record})
+            user.date_joined = _parse_date(record.get('date_joined'),
+                                           timezone.now())
+            user.last_login = _parse_date(record.get('last_login'), None)
+            if record.get('password'):
+                user.password = record['password']
+                with_password.append(user)
+            else:
+                user.password = make_password(None)
+                without_password.append(user)
+        fields = [name for name in USER_FIELDS if name != 'username']
+        for users, update_fields in ((with_password, fields + ['password']),
+                                     (without_password, fields)):
+            if users:
+                User.objects.bulk_create(
+                    users, update_conflicts=True,
+                    unique_fields=['username'], update_fields=update_fields)
+
+        usernames = [record['username'] for record in records]
+        self._user_ids.update(User.objects.filter(username__in=usernames)
+                              .values_list('username', 'pk'))
+        Profile.objects.bulk_create(
+            [Profile(user_id=self._user_ids[record['username']],
+                     bio=record.get('bio') or '',
+                     location=record.get('location') or '')
+             for record in records],
+            update_conflicts=True, unique_fields=['user'],
+            update_fields=['bio', 'location'])
+        return len(records)
@@ -0,0 +1,141 @@
+"""
+Database-backed email outbox.
+
+OutboxBackend is configured as EMAIL_BACKEND, so views (contact form,
+password reset) only INSERT a row and return. The send_outbox worker then
+delivers due rows through OUTBOX_DELIVERY_BACKEND over a single connection
+per batch, retrying failures with exponential backoff.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+# how long a claimed message is hidden from other workers while sending
+LEASE_SECONDS: int = 300
+
+
+class OutboxBackend(BaseEmailBackend):
+    """Email backend that stores messages in the outbox instead of sending."""
+
+    def send_messages(self, email_messages) -> int:
+        rows = [_to_row(message) for message in email_messages
+                if message.recipients()]
+        OutgoingEmail.objects.bulk_create(rows)
+        return len(rows)
+
+
+def _to_row(message) -> OutgoingEmail:
+    return OutgoingEmail(
+        subject=message.subject,
+        body=message.body,
+        from_email=message.from_email or settings.DEFAULT_FROM_EMAIL or '',
+        to=list(message.to),
+        cc=list(message.cc),
+        bcc=list(message.bcc),
+        reply_to=list(message.reply_to),
+        headers=dict(message.extra_headers),
+        alternatives=[list(alt) for alt in getattr(
+            message, 'alternatives', [])],
+    )
+
+
+def _to_message(row: OutgoingEmail, connection) -> EmailMultiAlternatives:
+    message = EmailMultiAlternatives(
+        subject=row.subject, body=row.body, from_email=row.from_email,
+        to=row.to, cc=row.cc, bcc=row.bcc, reply_to=row.reply_to,
+        headers=row.headers, connection=connection)
+    for content, mimetype in row.alternatives:
+        message.attach_alternative(content, mimetype)
+    return message
+
+
+def backoff_delay(attempts: int) -> timedelta:
+    """Delay before retry number `attempts`: base * 2**(attempts - 1)."""
+    base = getattr(settings, 'OUTBOX_BACKOFF_SECONDS', 30)
+    cap = getattr(settings, 'OUTBOX_BACKOFF_MAX_SECONDS', 3600)
+    return timedelta(seconds=min(base * 2 ** (attempts - 1), cap))
+
+
+def _record_failure(row: OutgoingEmail, exc: Exception,
+                    max_attempts: int) -> None:
+    row.attempts += 1
+    row.last_error = f'{type(exc).__name__}: {exc}'
+    if row.attempts >= max_attempts:
+        row.status = OutgoingEmail.FAILED
+    row.next_attempt_at = timezone.now() + backoff_delay(row.attempts)
+
+
+def claim_batch(batch_size: int) -> list[OutgoingEmail]:
+    """
+    Lease up to batch_size due messages. Leased rows are pushed into the
+    future so concurrent workers skip them, and become due again if this
+    worker dies before recording the outcome.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            OutgoingEmail.objects.select_for_update(skip_locked=True)
+            .filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+            .order_by('next_attempt_at', 'id')[:batch_size])
+        OutgoingEmail.objects.filter(pk__in=[row.pk for row in rows]).update(
+            next_attempt_at=now + timedelta(seconds=LEASE_SECONDS))
+    return rows
+
+
+def deliver_batch(batch_size: int = 50) -> tuple[int, int]:
+    """
+    Deliver one batch of due messages over a single backend connection.
+    Returns (sent, failed) counts.
+    """
+    rows = claim_batch(batch_size)
+    if not rows:
+        return 0, 0
+
+    max_attempts = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 5)
+    backend = getattr(settings, 'OUTBOX_DELIVERY_BACKEND',
+                      'django.core.mail.backends.smtp.EmailBackend')
+    connection = get_connection(backend, fail_silently=False)
+    sent, failed = [], []
+
+    try:
+        connection.open()
+        for row in rows:
+            try:
+                connection.send_messages([_to_message(row, connection)])
+            except Exception as exc:
+                logger.warning('Outbox delivery of #%s failed: %s',
+                               row.pk, exc)
+                _record_failure(row, exc, max_attempts)
+                failed.append(row)
+                # a dropped connection would fail the rest of the batch
+                connection.close()
+                connection.open()
+            else:
+                row.attempts += 1
+                row.status = OutgoingEmail.SENT
+                row.sent_at = timezone.now()
+                sent.append(row)
+    except Exception as exc:
+        # could not (re)connect: push back everything not yet handled
+        logger.exception('Outbox connection failed')
+        handled = {row.pk for row in sent + failed}
+        for row in rows:
+            if row.pk not in handled:
+                _record_failure(row, exc, max_attempts)
+                failed.append(row)
+    finally:
+        connection.close()
+
+    OutgoingEmail.objects.bulk_update(
+        sent + failed,
+        ['status', 'attempts', 'next_attempt_at', 'last_error', 'sent_at'])
+    return len(sent), len(failed)
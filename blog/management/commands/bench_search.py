@@ -0,0 +1,97 @@
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from blog.models import Post
+from blog.search import search_posts
+
+WORDS = (
+    'django python database index query cache latency throughput server '
+    'client template render worker queue request response static image '
+    'search ranking token session cookie signal model field migration '
+    'backend frontend deploy docker linux network socket thread process'
+).split()
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _paragraph(rng: random.Random, words: int) -> str:
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+# every topic word is planted in this many posts, so a query matches the
+# same number of rows at every corpus size, like a real topical search
+POSTS_PER_TOPIC = 20
+
+
+def _percentiles(timings: list[float]) -> tuple[float, float]:
+    timings = sorted(timings)
+    return (statistics.median(timings),
+            timings[max(int(len(timings) * 0.95) - 1, 0)])
+
+
+class Command(BaseCommand):
+    help = ('Measure search latency as the post count grows, next to the '
+            'unindexed icontains scan it replaces. Synthetic posts are '
+            'inserted in a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', default='1000,10000,50000',
+            help='Comma separated post counts to measure at.')
+        parser.add_argument(
+            '--queries', type=int, default=200,
+            help='Searches timed at each size.')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        sizes = sorted(int(size) for size in options['sizes'].split(','))
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                self._run(sizes, options['queries'], rng)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, queries, rng):
+        author = get_user_model().objects.create(username='bench-search')
+        inserted = 0
+        self.stdout.write(
+            f'{"posts":>8} {"fts p50":>9} {"fts p95":>9} '
+            f'{"scan p50":>9} {"scan p95":>9}   (ms)')
+        for size in sizes:
+            while inserted < size:
+                batch = min(1000, size - inserted)
+                Post.objects.bulk_create([
+                    Post(title=_paragraph(rng, 6),
+                         subtitle=_paragraph(rng, 10),
+                         body=(f'topic{(inserted + i) // POSTS_PER_TOPIC} '
+                               + _paragraph(rng, rng.randint(100, 800))),
+                         author=author)
+                    for i in range(batch)
+                ])
+                inserted += batch
+
+            topics = inserted // POSTS_PER_TOPIC
+            fts, scan = [], []
+            for _ in range(queries):
+                text = f'topic{rng.randrange(topics)}'
+                start = time.perf_counter()
+                search_posts(text, limit=20)
+                fts.append((time.perf_counter() - start) * 1000)
+                start = time.perf_counter()
+                list(Post.objects.filter(
+                    body__icontains=f'{text} ')[:20])
+                scan.append((time.perf_counter() - start) * 1000)
+            fts_p50, fts_p95 = _percentiles(fts)
+            scan_p50, scan_p95 = _percentiles(scan)
+            self.stdout.write(
+                f'{size:>8} {fts_p50:>9.2f} {fts_p95:>9.2f} '
+                f'{scan_p50:>9.2f} {scan_p95:>9.2f}')
@@ -0,0 +1,71 @@
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from blog.models import Post
+
+MODES = ('db', 'cached_db', 'signed_cookies')
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Measure queries and latency per request of the home page for '
+            'each session mode, anonymous and logged in. Test data is '
+            'inserted in a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic(), override_settings(
+                    ALLOWED_HOSTS=['testserver']):
+                self._run(options['requests'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, requests):
+        user = get_user_model().objects.create_user(
+            username='bench-sessions', password='bench')
+        for i in range(3):
+            Post.objects.create(
+                title=f'bench session post {i}', body='body', author=user)
+        url = reverse('home')
+
+        self.stdout.write(
+            f'{"mode":<15} {"visitor":<10} {"queries/req":>12} '
+            f'{"p50 ms":>8} {"rows":>6}')
+        for mode in MODES:
+            engine = f'django.contrib.sessions.backends.{mode}'
+            with override_settings(SESSION_ENGINE=engine):
+                for visitor in ('anonymous', 'user'):
+                    client = Client()
+                    if visitor == 'user':
+                        client.force_login(user)
+                    rows_before = Session.objects.count()
+                    client.get(url)  # fill the page cache
+                    queries, timings = self._measure(client, url, requests)
+                    rows = Session.objects.count() - rows_before
+                    self.stdout.write(
+                        f'{mode:<15} {visitor:<10} {queries:>12.2f} '
+                        f'{statistics.median(timings):>8.2f} {rows:>6}')
+
+    def _measure(self, client, url, requests):
+        timings = []
+        with CaptureQueriesContext(connections['default']) as captured:
+            for _ in range(requests):
+                start = time.perf_counter()
+                client.get(url)
+                timings.append((time.perf_counter() - start) * 1000)
+        return len(captured) / requests, timings
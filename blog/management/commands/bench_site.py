@@ -0,0 +1,237 @@
+import json
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from blog.models import Post
+from blog.pagination import BLOGS_PER_PAGE, encode_cursor
+from blog.seeding import SEED_PASSWORD, post_body, seed
+
+# metrics compared against the baseline; the query count may not grow at
+# all, the others by at most --threshold
+TIMED_METRICS = ('p50_ms', 'p95_ms', 'peak_kib')
+
+
+class _Rollback(Exception):
+    pass
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    return sorted_values[max(int(len(sorted_values) * fraction) - 1, 0)]
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Human readable regressions of results against baseline."""
+    regressions = []
+    for name, old in baseline['scenarios'].items():
+        new = results['scenarios'].get(name)
+        if new is None:
+            continue
+        if new['queries'] > old['queries']:
+            regressions.append(
+                f'{name}: {new["queries"]} queries per request, '
+                f'baseline {old["queries"]}')
+        for metric in TIMED_METRICS:
+            if new[metric] > old[metric] * (1 + threshold):
+                growth = new[metric] / old[metric] - 1
+                regressions.append(
+                    f'{name}: {metric} {new[metric]:.2f}, baseline '
+                    f'{old[metric]:.2f} (+{growth:.0%})')
+    return regressions
+
+
+class Command(BaseCommand):
+    help = ('Measure latency percentiles, queries and peak memory per '
+            'request of the main pages, login and posting against seeded '
+            'data. Results are written as JSON and compared to a baseline; '
+            'the command fails on regressions beyond --threshold. The data '
+            'is seeded in a transaction that is rolled back.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Timed requests per scenario.')
+        parser.add_argument(
+            '--page-cache', action='store_true',
+            help='Measure with the page cache on (default: every request '
+                 'renders).')
+        parser.add_argument(
+            '--output', default=None,
+            help='Write this run\'s results to this JSON file.')
+        parser.add_argument(
+            '--baseline',
+            default=str(Path(settings.BASE_DIR) / 'benchmarks'
+                        / 'baseline.json'))
+        parser.add_argument(
+            '--update-baseline', action='store_true',
+            help='Record this run as the new baseline instead of comparing.')
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Allowed slowdown before a timed metric counts as a '
+                 'regression (0.25 = 25%%).')
+
+    def handle(self, *args, **options):
+        data = {key: options[key]
+                for key in ('users', 'posts', 'comments', 'seed')}
+        data['page_cache'] = options['page_cache']
+        overrides = {
+            'ALLOWED_HOSTS': ['testserver'],
+            # every login comes from the same address
+            'THROTTLE_RATES': {},
+            # replicas cannot see the seed data, which is never committed
+            'DATABASE_REPLICAS': [],
+        }
+        if not options['page_cache']:
+            overrides['PAGE_CACHE_TIMEOUT'] = 0
+
+        try:
+            with transaction.atomic(), override_settings(**overrides):
+                scenarios = self._run(options)
+                raise _Rollback
+        except _Rollback:
+            pass
+
+        results = {
+            'data': data,
+            'environment': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+            },
+            'scenarios': scenarios,
+        }
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(results, indent=2))
+
+        baseline_path = Path(options['baseline'])
+        if options['update_baseline']:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(results, indent=2) + '\n')
+            self.stdout.write(f'Baseline written to {baseline_path}.')
+            return
+        if not baseline_path.exists():
+            self.stdout.write(
+                f'No baseline at {baseline_path}; record one with '
+                '--update-baseline.')
+            return
+
+        baseline = json.loads(baseline_path.read_text())
+        if baseline['data'] != data:
+            raise CommandError(
+                f'{baseline_path} was recorded with {baseline["data"]}, '
+                f'not {data}; rerun with the same options')
+        regressions = compare(results, baseline, options['threshold'])
+        if regressions:
+            raise CommandError(
+                'Regressions against the baseline:\n  '
+                + '\n  '.join(regressions))
+        self.stdout.write(self.style.SUCCESS(
+            f'No regressions against {baseline_path}.'))
+
+    def _run(self, options) -> dict[str, dict]:
+        self.stdout.write(
+            f'Seeding {options["users"]} users, {options["posts"]} posts, '
+            f'{options["comments"]} comments...')
+        seed(options['users'], options['posts'], options['comments'],
+             rng=random.Random(options['seed']))
+        rng = random.Random(options['seed'])
+        author = Post.objects.order_by('pk').values_list(
+            'author__username', flat=True).first()
+
+        self.stdout.write(
+            f'{"scenario":<18} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+            f'{"queries":>8} {"peak KiB":>9}')
+        scenarios = {}
+        for name, request in self._scenarios(author, rng):
+            stats = self._measure(request, options['requests'])
+            scenarios[name] = stats
+            self.stdout.write(
+                f'{name:<18} {stats["p50_ms"]:>8.2f} '
+                f'{stats["p95_ms"]:>8.2f} {stats["p99_ms"]:>8.2f} '
+                f'{stats["queries"]:>8} {stats["peak_kib"]:>9.0f}')
+        return scenarios
+
+    def _scenarios(self, author: str, rng: random.Random):
+        """(name, request) pairs; request() performs one request."""
+        posts = Post.objects.order_by('-date', '-id')
+        total = posts.count()
+        deep = posts.only('date', 'id')[int(total * 0.9)]
+        by_comments = Post.objects.order_by('comment_count', 'pk')
+        small = by_comments.first()
+        huge = by_comments.last()
+
+        reader = Client()
+        writer = Client()
+        writer.force_login(small.author)
+
+        def get(url):
+            return lambda: reader.get(url)
+
+        def add_post():
+            return writer.post(reverse('add_post'), {
+                'title': f'Benchmark post {rng.random()}',
+                'subtitle': 'Measured',
+                'body': post_body(rng),
+            })
+
+        def login():
+            return Client().post(reverse('login'), {
+                'username': author, 'password': SEED_PASSWORD})
+
+        all_blogs = reverse('all_blogs')
+        yield 'home', get(reverse('home'))
+        yield 'all_blogs_first', get(all_blogs)
+        yield 'all_blogs_deep', get(
+            f'{all_blogs}?page={max(total // BLOGS_PER_PAGE, 1)}')
+        yield 'all_blogs_cursor', get(
+            f'{all_blogs}?cursor={encode_cursor([deep.date, deep.id])}')
+        yield 'show_post_small', get(small.get_absolute_url())
+        yield 'show_post_huge', get(huge.get_absolute_url())
+        yield 'add_post', add_post
+        yield 'login', login
+
+    def _measure(self, request, requests: int) -> dict:
+        request()  # warm up imports, templates and connections
+        timings, queries = [], []
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                start = time.perf_counter()
+                response = request()
+                timings.append((time.perf_counter() - start) * 1000)
+            if response.status_code not in (200, 302):
+                raise CommandError(
+                    f'{response.request["PATH_INFO"]} answered '
+                    f'{response.status_code}')
+            queries.append(len(captured))
+
+        # memory is traced on a separate request: tracing slows everything
+        tracemalloc.start()
+        try:
+            request()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+        timings.sort()
+        return {
+            'p50_ms': round(statistics.median(timings), 3),
+            'p95_ms': round(_percentile(timings, 0.95), 3),
+            'p99_ms': round(_percentile(timings, 0.99), 3),
+            'queries': max(queries),
+            'peak_kib': round(peak / 1024, 1),
+        }
@@ -0,0 +1,55 @@
+import gzip
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.cssbuild import (TemplateScanner, Usage, build, collect_usage,
+                           critical_css_name)
+
+
+class Command(BaseCommand):
+    help = ('Prune css/style.css to the selectors the templates use, '
+            'minify it and write per-template critical CSS.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', default=None,
+            help='Stylesheet to build (default: static/css/style.css).')
+
+    def handle(self, *args, **options):
+        base_dir = Path(settings.BASE_DIR)
+        source = Path(options['source'] or base_dir / 'static/css/style.css')
+        templates = base_dir / 'templates'
+        out_dir = Path(settings.CSS_BUILD_ROOT)
+        css = source.read_text(encoding='utf-8')
+
+        usage = collect_usage([
+            *templates.rglob('*.html'),
+            *(base_dir / 'static').rglob('*.js'),
+            *(base_dir / 'blog').rglob('*.py'),
+            *(base_dir / 'users').rglob('*.py'),
+        ])
+        full = build(css, usage)
+        (out_dir / 'critical').mkdir(parents=True, exist_ok=True)
+        (out_dir / 'style.min.css').write_text(full, encoding='utf-8')
+
+        self._report(source.name, css)
+        self._report('style.min.css', full)
+
+        scanner = TemplateScanner(templates)
+        for name in scanner.page_templates():
+            page = Usage()
+            page.add(scanner.above_the_fold(name))
+            critical = build(css, page)
+            path = out_dir / 'critical' / critical_css_name(name)
+            path.write_text(critical, encoding='utf-8')
+            self._report(f'critical/{path.name}', critical)
+
+        self.stdout.write(self.style.SUCCESS(f'Wrote {out_dir}'))
+
+    def _report(self, label, css):
+        data = css.encode()
+        self.stdout.write(
+            f'{label:<36} {len(data):>9,} B  '
+            f'gzip {len(gzip.compress(data)):>7,} B')
@@ -0,0 +1,81 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from blog.images import (build_derivatives, content_hash, derivatives_root,
+                         load_manifest, save_manifest, source_images)
+
+
+class Command(BaseCommand):
+    help = ('Build resized WebP/JPEG derivatives and blurred placeholders '
+            'for static and uploaded images, skipping unchanged ones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Worker processes (default: one per CPU, 0 builds '
+                 'in this process).')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Rebuild every image even if its content hash is known.')
+
+    def handle(self, *args, **options):
+        out_dir = derivatives_root()
+        out_dir.mkdir(parents=True, exist_ok=True)
+        widths = tuple(settings.IMAGE_DERIVATIVE_WIDTHS)
+        manifest = dict(load_manifest())
+        sources = source_images()
+
+        jobs = {}
+        for url, path in sources.items():
+            digest = content_hash(path)
+            entry = manifest.get(url)
+            if (not options['force'] and entry
+                    and entry['hash'] == digest
+                    and self._variants_exist(entry)):
+                continue
+            jobs[url] = (str(path), digest)
+
+        if jobs:
+            args = ([path for path, _ in jobs.values()],
+                    [digest for _, digest in jobs.values()],
+                    [str(out_dir)] * len(jobs),
+                    [widths] * len(jobs))
+            if options['workers'] == 0:
+                results = list(map(build_derivatives, *args))
+            else:
+                with ProcessPoolExecutor(options['workers']) as executor:
+                    results = list(executor.map(build_derivatives, *args))
+            for url, entry in zip(jobs, results):
+                self._remove_stale(manifest.get(url), entry)
+                manifest[url] = entry
+                self.stdout.write(f'Built {url}')
+
+        # forget images whose source is gone
+        for url in manifest.keys() - sources.keys():
+            self._remove_stale(manifest.pop(url), None)
+        save_manifest(manifest)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Built {len(jobs)} images, '
+            f'{len(sources) - len(jobs)} unchanged.'))
+
+    def _variants_exist(self, entry):
+        root = derivatives_root()
+        return all((root / name).exists()
+                   for variants in entry['variants'].values()
+                   for _width, name in variants)
+
+    def _remove_stale(self, old, new):
+        if not old:
+            return
+        keep = set()
+        if new:
+            keep = {name for variants in new['variants'].values()
+                    for _width, name in variants}
+        root = derivatives_root()
+        for variants in old['variants'].values():
+            for _width, name in variants:
+                if name not in keep:
+                    (root / name).unlink(missing_ok=True)
@@ -0,0 +1,73 @@
+import os
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from blog.backup import export_records, gzip_chunks, jsonl_lines
+
+LABELS = {'user': 'users', 'post': 'posts', 'comment': 'comments',
+          'media': 'media files'}
+
+
+class Command(BaseCommand):
+    help = ('Write users with their profiles, posts, comments and a '
+            'manifest of the media files as gzipped JSON lines, streamed '
+            'from one consistent snapshot. Restore it with import_posts. '
+            'Unlike dumpdata the memory used does not grow with the tables.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', type=Path,
+            help='File to write, e.g. backup.jsonl.gz.')
+        parser.add_argument(
+            '--since', default=None,
+            help='Only rows created or changed at or after this ISO 8601 '
+                 'time (deletions are not included).')
+        parser.add_argument(
+            '--without-passwords', action='store_true',
+            help='Leave out the password hashes.')
+        parser.add_argument(
+            '--database', default=DEFAULT_DB_ALIAS,
+            help='Database to export from, e.g. a replica.')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_datetime(options['since'])
+            if since is None:
+                raise CommandError(f'invalid --since {options["since"]!r}')
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+
+        output = options['output']
+        counts = {}
+
+        def counted(records):
+            for record in records:
+                counts[record['model']] = counts.get(record['model'], 0) + 1
+                yield record
+
+        records = counted(export_records(
+            since, passwords=not options['without_passwords'],
+            using=options['database']))
+        start = time.perf_counter()
+        # write then rename, so a failed export never looks complete
+        partial = output.with_name(output.name + '.tmp')
+        try:
+            with partial.open('wb') as fh:
+                for chunk in gzip_chunks(jsonl_lines(records)):
+                    fh.write(chunk)
+        except BaseException:
+            partial.unlink(missing_ok=True)
+            raise
+        os.replace(partial, output)
+
+        summary = ', '.join(f'{counts.get(model, 0)} {label}'
+                            for model, label in LABELS.items())
+        self.stdout.write(self.style.SUCCESS(
+            f'Exported {summary} to {output} ({output.stat().st_size} bytes) '
+            f'in {time.perf_counter() - start:.1f}s.'))
@@ -0,0 +1,111 @@
+import json
+import os
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import reset_queries
+
+from blog.importing import InvalidRecord, PostImporter, read_records
+
+
+class Command(BaseCommand):
+    help = ('Import posts and their comments from a JSON lines file '
+            '(optionally .gz) or a directory of Markdown files with front '
+            'matter, with bulk_create in batches, or restore a backup '
+            'written by export_site. After a failure, run it again with '
+            '--resume to continue after the last committed batch.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', type=Path)
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Records inserted per transaction.')
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Create users (without a usable password) for unknown '
+                 'authors instead of skipping their posts.')
+        parser.add_argument(
+            '--checkpoint', type=Path, default=None,
+            help='Progress file (default: SOURCE.checkpoint).')
+        parser.add_argument(
+            '--resume', action='store_true',
+            help='Skip the records the checkpoint says were imported.')
+
+    def handle(self, *args, **options):
+        source = options['source']
+        if not source.exists():
+            raise CommandError(f'{source} does not exist')
+        checkpoint = options['checkpoint'] or source.with_name(
+            source.name + '.checkpoint')
+        progress = {'source': str(source.resolve()), 'records': 0,
+                    'users': 0, 'posts': 0, 'comments': 0, 'skipped': 0,
+                    'skipped_posts': []}
+        if options['resume'] and checkpoint.exists():
+            saved = json.loads(checkpoint.read_text())
+            if saved['source'] != progress['source']:
+                raise CommandError(
+                    f'{checkpoint} belongs to {saved["source"]}')
+            progress.update(saved)
+            self.stdout.write(
+                f'Resuming after {progress["records"]} records.')
+        elif checkpoint.exists():
+            raise CommandError(
+                f'{checkpoint} exists: pass --resume to continue that '
+                'import, or delete it to start over')
+
+        importer = PostImporter(create_authors=options['create_authors'],
+                                skipped_posts=progress['skipped_posts'])
+        records = read_records(source, skip=progress['records'])
+        unknown = set()
+        start = time.perf_counter()
+        imported = 0
+        try:
+            while batch := list(islice(records, options['batch_size'])):
+                result = importer.import_batch(batch)
+                # the batch is committed: move the checkpoint past it
+                progress['records'] += len(batch)
+                progress['users'] += result.users
+                progress['posts'] += result.posts
+                progress['comments'] += result.comments
+                progress['skipped'] += result.skipped
+                # their comments may come in later batches, after a resume
+                progress['skipped_posts'] += sorted(result.skipped_posts)
+                unknown |= result.unknown_authors
+                self._save(checkpoint, progress)
+                if settings.DEBUG:
+                    # every INSERT would otherwise stay in the query log
+                    reset_queries()
+                imported += result.posts
+                rate = imported / (time.perf_counter() - start)
+                self.stdout.write(
+                    f'Imported {progress["posts"]} posts and '
+                    f'{progress["comments"]} comments '
+                    f'({rate:.0f} posts/s)...')
+        except InvalidRecord as e:
+            raise CommandError(
+                f'{e}\nStopped after {progress["records"]} records; fix '
+                'the input and rerun with --resume.')
+
+        importer.finish()
+        checkpoint.unlink(missing_ok=True)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {progress["posts"]} posts and {progress["comments"]} '
+            f'comments in {elapsed:.1f}s '
+            f'({imported / elapsed if elapsed else 0:.0f} posts/s).'))
+        if progress['users']:
+            self.stdout.write(f'Restored {progress["users"]} users.')
+        if progress['skipped']:
+            names = ', '.join(sorted(map(str, unknown))[:10])
+            self.stdout.write(self.style.WARNING(
+                f'Skipped {progress["skipped"]} posts by unknown authors '
+                f'({names}); see --create-authors.'))
+
+    def _save(self, checkpoint: Path, progress: dict) -> None:
+        # write then rename, so a crash never leaves a torn checkpoint
+        partial = checkpoint.with_name(checkpoint.name + '.tmp')
+        partial.write_text(json.dumps(progress))
+        os.replace(partial, checkpoint)
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# GUNICORN_WORKER_CLASS of each serving profile in config/gunicorn.py
+PROFILES = {'sync': 'sync', 'asgi': 'uvicorn'}
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _wait_for_port(host: str, port: int, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise CommandError(f'server on {host}:{port} did not start')
+
+
+async def _slow_request(host: str, port: int, path: str,
+                        slow: float) -> int:
+    """One request whose headers trickle in over `slow` seconds."""
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        request = (f'GET {path} HTTP/1.1\r\nHost: {host}\r\n'
+                   'User-Agent: loadtest\r\nAccept: text/html\r\n'
+                   'Accept-Encoding: gzip\r\nConnection: close\r\n\r\n'
+                   ).encode()
+        pieces = 4
+        step = -(-len(request) // pieces)
+        for offset in range(0, len(request), step):
+            writer.write(request[offset:offset + step])
+            await writer.drain()
+            if offset + step < len(request):
+                await asyncio.sleep(slow / (pieces - 1))
+        status_line = await reader.readline()
+        await reader.read()
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def _run_clients(host, port, paths, concurrency, duration, slow,
+                       timeout):
+    deadline = time.monotonic() + duration
+    latencies, errors = [], 0
+
+    async def client(index):
+        nonlocal errors
+        n = index
+        # spread the arrivals out instead of starting in lockstep
+        await asyncio.sleep(random.uniform(0, slow))
+        while time.monotonic() < deadline:
+            path = paths[n % len(paths)]
+            n += 1
+            start = time.monotonic()
+            try:
+                status = await asyncio.wait_for(
+                    _slow_request(host, port, path, slow), timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                errors += 1
+                continue
+            if status >= 400:
+                errors += 1
+            else:
+                latencies.append(time.monotonic() - start)
+
+    await asyncio.gather(*(client(i) for i in range(concurrency)))
+    return latencies, errors
+
+
+class Command(BaseCommand):
+    help = ('Compare the sync (WSGI) and ASGI gunicorn profiles under '
+            'concurrent slow clients. Each profile is started from '
+            'config/gunicorn.py against the configured database, which '
+            'should already hold some posts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profiles', default='sync,asgi',
+            help='Comma separated profiles to start: sync, asgi.')
+        parser.add_argument(
+            '--url', default=None,
+            help='Load an already running server instead of starting one.')
+        parser.add_argument(
+            '--path', action='append', dest='paths',
+            help='Path to request, repeatable (default: /, /all-blogs/ '
+                 'and the first post).')
+        parser.add_argument('--concurrency', type=int, default=100)
+        parser.add_argument('--duration', type=float, default=15.0)
+        parser.add_argument(
+            '--slow', type=float, default=0.5,
+            help='Seconds each client takes to send its request headers.')
+        parser.add_argument(
+            '--workers', type=int, default=2,
+            help='Gunicorn workers per profile.')
+        parser.add_argument(
+            '--threads', type=int, default=1,
+            help='Threads per sync worker (gthread when above 1).')
+        parser.add_argument('--timeout', type=float, default=30.0,
+                            help='Client side timeout per request.')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or self._default_paths()
+        self.stdout.write(
+            f'{options["concurrency"]} clients for {options["duration"]:g}s, '
+            f'{options["slow"]:g}s to send each request, paths: '
+            f'{" ".join(paths)}')
+        self.stdout.write(
+            f'{"profile":<8} {"requests":>9} {"req/s":>8} {"p50 ms":>8} '
+            f'{"p95 ms":>8} {"errors":>7}')
+
+        if options['url']:
+            url = urlsplit(options['url'])
+            self._report('url', self._load(
+                url.hostname, url.port or 80, paths, options))
+            return
+
+        for profile in options['profiles'].split(','):
+            if profile not in PROFILES:
+                raise CommandError(f'unknown profile {profile!r}')
+            port = _free_port()
+            server = self._start(profile, port, options)
+            try:
+                _wait_for_port('127.0.0.1', port, 30)
+                # warm the worker caches before measuring
+                self._load('127.0.0.1', port, paths, {
+                    **options, 'concurrency': options['workers'],
+                    'duration': 1.0, 'slow': 0})
+                self._report(profile, self._load(
+                    '127.0.0.1', port, paths, options))
+            finally:
+                server.terminate()
+                server.wait(30)
+
+    def _default_paths(self) -> list[str]:
+        from blog.models import Post
+
+        paths = ['/', '/all-blogs/']
+        post = Post.objects.order_by('-date').only('pk').first()
+        if post:
+            paths.append(post.get_absolute_url())
+        return paths
+
+    def _start(self, profile, port, options) -> subprocess.Popen:
+        base_dir = Path(settings.BASE_DIR)
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get(
+                'DJANGO_SETTINGS_MODULE', 'config.settings.dev'),
+            'GUNICORN_WORKER_CLASS': PROFILES[profile],
+            'ASYNC_VIEWS': str(profile == 'asgi'),
+            'GUNICORN_BIND': f'127.0.0.1:{port}',
+            'WEB_CONCURRENCY': str(options['workers']),
+            'GUNICORN_THREADS': str(options['threads']),
+            'GUNICORN_ACCESS_LOG': '',
+        }
+        return subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn',
+             '-c', str(base_dir / 'config' / 'gunicorn.py')],
+            cwd=base_dir, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    def _load(self, host, port, paths, options):
+        start = time.monotonic()
+        latencies, errors = asyncio.run(_run_clients(
+            host, port, paths, options['concurrency'], options['duration'],
+            options['slow'], options['timeout']))
+        return latencies, errors, time.monotonic() - start
+
+    def _report(self, label, result) -> None:
+        latencies, errors, elapsed = result
+        if latencies:
+            latencies.sort()
+            p50 = statistics.median(latencies) * 1000
+            p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000
+        else:
+            p50 = p95 = 0.0
+        self.stdout.write(
+            f'{label:<8} {len(latencies):>9} '
+            f'{len(latencies) / elapsed:>8.1f} {p50:>8.0f} {p95:>8.0f} '
+            f'{errors:>7}')
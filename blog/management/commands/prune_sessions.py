@@ -0,0 +1,40 @@
+import time
+
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = ('Delete expired rows from django_session in small batches, '
+            'so the table stays bounded without long locks.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Sessions deleted per statement.')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep pruning on a schedule instead of exiting.')
+        parser.add_argument(
+            '--interval', type=float, default=3600.0,
+            help='Seconds between prunes with --loop.')
+
+    def handle(self, *args, **options):
+        while True:
+            deleted = self._prune(options['batch_size'])
+            self.stdout.write(f'Pruned {deleted} expired sessions.')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+    def _prune(self, batch_size: int) -> int:
+        now = timezone.now()
+        deleted = 0
+        while True:
+            # expire_date is indexed: each batch is a short range scan
+            keys = list(Session.objects.filter(expire_date__lt=now)
+                        .values_list('session_key', flat=True)[:batch_size])
+            if not keys:
+                return deleted
+            deleted += Session.objects.filter(session_key__in=keys).delete()[0]
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+
+from blog.models import Comments, Post
+
+
+class Command(BaseCommand):
+    help = ('Recompute Post.comment_count and last_commented_at from the '
+            'Comments table in batches, fixing any drift.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Report drifted posts without writing.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        checked = fixed = 0
+        last_id = 0
+
+        while True:
+            # walk the primary key so every batch is an index range scan
+            posts = list(
+                Post.objects.filter(pk__gt=last_id).order_by('pk')
+                .only('pk', *Post.COUNTER_FIELDS)[:batch_size])
+            if not posts:
+                break
+            last_id = posts[-1].pk
+
+            stats = {
+                row['post_id']: row for row in
+                Comments.objects.filter(post_id__in=[p.pk for p in posts])
+                .order_by().values('post_id')
+                .annotate(count=Count('id'), last=Max('date'))
+            }
+            drifted = []
+            for post in posts:
+                row = stats.get(post.pk, {'count': 0, 'last': None})
+                if (post.comment_count, post.last_commented_at) != (
+                        row['count'], row['last']):
+                    post.comment_count = row['count']
+                    post.last_commented_at = row['last']
+                    drifted.append(post)
+
+            if drifted and not options['dry_run']:
+                with transaction.atomic():
+                    Post.objects.bulk_update(drifted, Post.COUNTER_FIELDS)
+            checked += len(posts)
+            fixed += len(drifted)
+
+        verb = 'would fix' if options['dry_run'] else 'fixed'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} posts, {verb} {fixed}.'))
@@ -0,0 +1,76 @@
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from blog.models import Post
+from blog.pagecache import invalidate_tags
+from blog.rendering import RENDER_VERSION, render_body
+
+
+class Command(BaseCommand):
+    help = ('Fill Post.body_html, body_text, excerpt, word_count and '
+            'reading_time from body in batches, rendering across a '
+            'process pool.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--workers', type=int, default=None,
+            help='Worker processes (default: one per CPU, 0 renders '
+                 'in this process).')
+        parser.add_argument(
+            '--all', action='store_true',
+            help='Re-render every post, e.g. after changing the sanitizer. '
+                 'By default only posts not rendered with the current '
+                 'RENDER_VERSION are processed.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        workers = options['workers']
+        queryset = Post.objects.all()
+        if not options['all']:
+            # not body_html='': a body the sanitizer empties entirely would
+            # be picked up (and saved, expiring its pages) on every run
+            queryset = queryset.filter(render_version__lt=RENDER_VERSION)
+
+        executor = ProcessPoolExecutor(workers) if workers != 0 else None
+        rendered = 0
+        last_id = 0
+        try:
+            while True:
+                # walk the primary key so every batch is an index range scan
+                posts = list(
+                    queryset.filter(pk__gt=last_id).order_by('pk')
+                    .only('pk', 'body')[:batch_size])
+                if not posts:
+                    break
+                last_id = posts[-1].pk
+
+                bodies = [post.body for post in posts]
+                if executor:
+                    results = executor.map(
+                        render_body, bodies,
+                        chunksize=max(1, len(bodies) // 32))
+                else:
+                    results = map(render_body, bodies)
+
+                now = timezone.now()
+                for post, fields in zip(posts, results):
+                    for name, value in fields.items():
+                        setattr(post, name, value)
+                    post.updated_at = now
+                with transaction.atomic():
+                    Post.objects.bulk_update(
+                        posts, [*Post.RENDERED_FIELDS, 'updated_at'])
+                invalidate_tags(*(f'post:{post.pk}' for post in posts),
+                                *(f'listed:{post.pk}' for post in posts),
+                                'listing:numbered')
+                rendered += len(posts)
+                self.stdout.write(f'Rendered {rendered} posts...')
+        finally:
+            if executor:
+                executor.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(f'Rendered {rendered} posts.'))
@@ -0,0 +1,39 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from blog.seeding import SEED_PASSWORD, seed
+
+
+class Command(BaseCommand):
+    help = ('Generate synthetic users, posts and comments with bulk_create, '
+            'with realistic length and thread size distributions.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--seed', type=int, default=None,
+            help='Random seed, for reproducible data.')
+
+    def handle(self, *args, **options):
+        if options['comments'] and not options['posts']:
+            raise CommandError('--comments needs --posts')
+        start = time.perf_counter()
+        try:
+            written = seed(
+                options['users'], options['posts'], options['comments'],
+                rng=random.Random(options['seed']),
+                batch_size=options['batch_size'],
+                progress=lambda message: self.stdout.write(
+                    f'Inserted {message}...'))
+        except ValueError as e:
+            raise CommandError(e)
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {written["users"]} users, {written["posts"]} posts '
+            f'and {written["comments"]} comments in '
+            f'{time.perf_counter() - start:.1f}s. Seeded users log in '
+            f'with the password {SEED_PASSWORD!r}.'))
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from blog.mail import deliver_batch
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued outbox email, reusing one connection per batch.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help='Messages sent over a single connection.')
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new messages instead of exiting.')
+        parser.add_argument(
+            '--interval', type=float, default=5.0,
+            help='Seconds to sleep between polls when the outbox is empty.')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = deliver_batch(options['batch_size'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f'batch: {sent} sent, {failed} failed')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Outbox drained: {total_sent} sent, {total_failed} failed.'))
@@ -3,12 +3,36 @@ from django.db import models
 from django.urls import reverse
 from django.utils import timezone
 
+from .rendering import render_body
+
+
+class PostQuerySet(models.QuerySet):
+
+    # every column the listing templates (index, allBlogs, search) read
+    LISTING_FIELDS = ('id', 'title', 'subtitle', 'date', 'excerpt',
+                      'reading_time', 'comment_count', 'author__username')
+
+    def for_listing(self):
+        """Posts with only the listing columns loaded, never the body."""
+        return self.select_related('author').only(*self.LISTING_FIELDS)
+
 
 class Post(models.Model):
     """Blog post model."""
     title = models.CharField(max_length=200)
     subtitle = models.CharField(max_length=300, blank=True)
     body = models.TextField()
+    # derived from body by render_body() on save; see render_posts
+    body_html = models.TextField(blank=True, editable=False)
+    # the words of body without markup; what full-text search indexes
+    body_text = models.TextField(blank=True, editable=False)
+    excerpt = models.TextField(blank=True, editable=False)
+    word_count = models.PositiveIntegerField(default=0, editable=False)
+    reading_time = models.PositiveSmallIntegerField(
+        default=0, editable=False, help_text='Minutes')
+    # RENDER_VERSION the columns above were rendered with, 0 if never
+    render_version = models.PositiveSmallIntegerField(
+        default=0, editable=False)
     img_url = models.URLField(blank=True, null=True)
     author = models.ForeignKey(
         settings.AUTH_USER_MODEL,
@@ -16,13 +40,74 @@ class Post(models.Model):
         related_name='posts'
     )
     date = models.DateTimeField(default=timezone.now)
+    # bumped on every save and on comment activity; drives conditional GET
+    updated_at = models.DateTimeField(default=timezone.now, db_index=True)
+    # denormalized from Comments by blog.signals; see reconcile_post_stats
+    comment_count = models.PositiveIntegerField(default=0, editable=False)
+    last_commented_at = models.DateTimeField(
+        null=True, blank=True, editable=False)
+
+    objects = PostQuerySet.as_manager()
+
+    # columns only ever written with F()/subquery UPDATEs
+    COUNTER_FIELDS = ('comment_count', 'last_commented_at')
+    # columns computed from body
+    RENDERED_FIELDS = ('body_html', 'body_text', 'excerpt', 'word_count',
+                       'reading_time', 'render_version')
 
     class Meta:
-        ordering = ['-date']
+        ordering = ['-date', '-id']
+        indexes = [
+            # keyset pagination walks (date, id) in both directions; on
+            # PostgreSQL the index also carries the bounded listing columns.
+            # excerpt stays out: it is a TextField, and a long one would
+            # push the entry past the ~2.7 KB btree limit and fail the save
+            models.Index(
+                fields=['date', 'id'], name='post_date_id_idx',
+                include=['title', 'subtitle', 'author', 'reading_time',
+                         'comment_count']),
+        ]
 
     def __str__(self):
         return self.title
 
+    def render(self):
+        """Recompute the RENDERED_FIELDS from body."""
+        for name, value in render_body(self.body).items():
+            setattr(self, name, value)
+
+    def save(self, *args, **kwargs):
+        """
+        Render body and bump updated_at. Saving an existing post only
+        updates its row: the comment counters and any fields left out by
+        only()/defer() are not written, and a post whose row has been
+        deleted meanwhile raises DatabaseError instead of being inserted
+        again (pass force_insert=True to re-create it).
+        """
+        self.updated_at = timezone.now()
+        deferred = self.get_deferred_fields()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            if 'body' not in deferred:
+                self.render()
+        else:
+            extra = ['updated_at']
+            if 'body' in update_fields:
+                self.render()
+                extra += self.RENDERED_FIELDS
+            kwargs['update_fields'] = [
+                *update_fields,
+                *(name for name in extra if name not in update_fields)]
+        # a full save of an existing post must not write back a stale
+        # in-memory copy of the counters maintained by the comment signals
+        if (not self._state.adding and not kwargs.get('force_insert')
+                and kwargs.get('update_fields') is None):
+            kwargs['update_fields'] = [
+                f.name for f in self._meta.concrete_fields
+                if not f.primary_key and f.name not in self.COUNTER_FIELDS
+                and f.attname not in deferred]
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
         return reverse('show_post', kwargs={'post_id': self.pk})
 
@@ -40,10 +125,58 @@ class Comments(models.Model):
     )
     comment = models.TextField()
     date = models.DateTimeField(default=timezone.now)
+    # edits (e.g. in the admin) for export_site --since
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     class Meta:
         ordering = ['date']
+        indexes = [
+            # a post's comments are paged newest first by (date, id)
+            models.Index(fields=['post', 'date', 'id'],
+                         name='comment_post_date_idx'),
+        ]
 
     def __str__(self):
         who = self.the_user.username if self.the_user else 'Anonymous'
         return f'Comment by {who} on {self.post.title}'
+
+
+class OutgoingEmail(models.Model):
+    """Email queued by OutboxBackend and delivered by send_outbox."""
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    )
+
+    subject = models.CharField(max_length=998)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    to = models.JSONField(default=list)
+    cc = models.JSONField(default=list, blank=True)
+    bcc = models.JSONField(default=list, blank=True)
+    reply_to = models.JSONField(default=list, blank=True)
+    headers = models.JSONField(default=dict, blank=True)
+    # [[content, mimetype], ...] as on EmailMultiAlternatives
+    alternatives = models.JSONField(default=list, blank=True)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['next_attempt_at', 'id']
+        indexes = [
+            # the worker polls for due pending messages
+            models.Index(fields=['status', 'next_attempt_at'],
+                         name='outbox_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.subject} -> {", ".join(self.to)}'
@@ -0,0 +1,215 @@
+"""
+Full-page cache with tag-based invalidation and per-user hole punching.
+
+Cached pages never contain per-user markup. Templates emit placeholders
+through the ``{% fragment %}`` tag and FragmentMiddleware fills them in on
+every response, so a single cached body is shared by anonymous and
+authenticated visitors alike.
+
+Each cached entry remembers the version of every tag it was built from
+(``post:<id>`` for a post page, ``listed:<id>`` for listings showing
+the post, ``comments:<id>``, ...). invalidate_tags() swaps a tag's
+version, which makes exactly the entries that used it stale.
+
+Versions are read when a view registers its tags, before the queries they
+guard, so an invalidation landing while the page renders leaves it stale
+rather than filed under the new version. Tags only known from a query's
+rows (``listed:<id>``) are read after it; for those, a page is not stored
+at all if any tag was invalidated while it rendered.
+"""
+import hashlib
+import re
+import uuid
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+from django.template.loader import render_to_string
+from django.utils.deprecation import MiddlewareMixin
+
+FRAGMENT_RE = re.compile(rb'<!--fragment:([\w-]+)(?::([\w-]*))?-->')
+
+# swapped by every invalidate_tags() call
+GENERATION_KEY = 'pagecache:generation'
+
+_fragments: dict[str, tuple[str, Callable[[HttpRequest, str], dict]]] = {}
+
+
+def _tag_key(tag: str) -> str:
+    return f'pagecache:tag:{tag}'
+
+
+def _page_key(request: HttpRequest) -> str:
+    url = f'{request.get_host()}{request.get_full_path()}'
+    return 'pagecache:page:' + hashlib.md5(url.encode()).hexdigest()
+
+
+def tag_versions(tags: Iterable[str]) -> dict[str, str]:
+    """Current version of each tag, minting one for tags never seen."""
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = cache.get_many(keys)
+    for key in keys.keys() - found.keys():
+        # a fresh token (never 0/1) so an evicted tag cannot match old pages
+        cache.add(key, uuid.uuid4().hex, None)
+        found[key] = cache.get(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+async def atag_versions(tags: Iterable[str]) -> dict[str, str]:
+    """Async tag_versions()."""
+    keys = {_tag_key(tag): tag for tag in tags}
+    found = await cache.aget_many(keys)
+    for key in keys.keys() - found.keys():
+        await cache.aadd(key, uuid.uuid4().hex, None)
+        found[key] = await cache.aget(key)
+    return {keys[key]: version for key, version in found.items()}
+
+
+def invalidate_tags(*tags: str) -> None:
+    """Mark every cached page built from any of tags as stale."""
+    versions = {_tag_key(tag): uuid.uuid4().hex for tag in tags}
+    versions[GENERATION_KEY] = uuid.uuid4().hex
+    cache.set_many(versions, None)
+
+
+def add_cache_tags(request: HttpRequest, *tags: str) -> None:
+    """
+    Record which tags the page being rendered depends on, at their current
+    versions. Call it before the queries the tags guard.
+    """
+    if getattr(request, 'cache_tags', None) is not None:
+        request.cache_tags.update(tag_versions(
+            tag for tag in tags if tag not in request.cache_tags))
+
+
+async def aadd_cache_tags(request: HttpRequest, *tags: str) -> None:
+    """Async add_cache_tags()."""
+    if getattr(request, 'cache_tags', None) is not None:
+        request.cache_tags.update(await atag_versions(
+            tag for tag in tags if tag not in request.cache_tags))
+
+
+def _cached_response(entry: dict) -> HttpResponse:
+    response = HttpResponse(
+        entry['content'], content_type=entry['content_type'])
+    response['X-Page-Cache'] = 'hit'
+    return response
+
+
+def _cache_entry(response: HttpResponse, tags: dict[str, str]) -> dict:
+    response['X-Page-Cache'] = 'miss'
+    return {
+        'content': response.content,
+        'content_type': response['Content-Type'],
+        'tags': tags,
+    }
+
+
+def _bypass(request: HttpRequest) -> bool:
+    # clients that just wrote must see their change, not a page a lagging
+    # read replica produced (config.routers); their fresh page is stored
+    return getattr(request, 'read_from_primary', False)
+
+
+def _cacheable(response: HttpResponse) -> bool:
+    return response.status_code == 200 and not response.streaming
+
+
+def cached_page(view_func: Callable[..., HttpResponse]
+                ) -> Callable[..., HttpResponse]:
+    """
+    Serve GET/HEAD responses of view_func from the shared cache until one
+    of the tags the view registered with add_cache_tags() is invalidated.
+    """
+    if iscoroutinefunction(view_func):
+        @wraps(view_func)
+        async def _wrapped_view(request: HttpRequest, *args,
+                                **kwargs) -> HttpResponse:
+            timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+            if request.method not in ('GET', 'HEAD') or not timeout:
+                return await view_func(request, *args, **kwargs)
+
+            key = _page_key(request)
+            found = await cache.aget_many([key, GENERATION_KEY])
+            entry = None if _bypass(request) else found.get(key)
+            if entry and await atag_versions(entry['tags']) == entry['tags']:
+                return _cached_response(entry)
+
+            request.cache_tags = {}
+            response = await view_func(request, *args, **kwargs)
+            if (_cacheable(response) and await cache.aget(GENERATION_KEY)
+                    == found.get(GENERATION_KEY)):
+                await cache.aset(
+                    key, _cache_entry(response, request.cache_tags), timeout)
+            return response
+
+        return _wrapped_view
+
+    @wraps(view_func)
+    def _wrapped_view(request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        timeout = getattr(settings, 'PAGE_CACHE_TIMEOUT', 300)
+        if request.method not in ('GET', 'HEAD') or not timeout:
+            return view_func(request, *args, **kwargs)
+
+        key = _page_key(request)
+        found = cache.get_many([key, GENERATION_KEY])
+        entry = None if _bypass(request) else found.get(key)
+        if entry and tag_versions(entry['tags']) == entry['tags']:
+            return _cached_response(entry)
+
+        request.cache_tags = {}
+        response = view_func(request, *args, **kwargs)
+        if (_cacheable(response)
+                and cache.get(GENERATION_KEY) == found.get(GENERATION_KEY)):
+            cache.set(key, _cache_entry(response, request.cache_tags),
+                      timeout)
+        return response
+
+    return _wrapped_view
+
+
+def register_fragment(name: str, template_name: str):
+    """
+    Register a per-user fragment. The decorated function receives the
+    request and the placeholder argument and returns the template context.
+    """
+    def decorator(func: Callable[[HttpRequest, str], dict]):
+        _fragments[name] = (template_name, func)
+        return func
+    return decorator
+
+
+def render_fragments(request: HttpRequest, content: bytes) -> bytes:
+    """Replace every fragment placeholder in content with its markup."""
+    def _render(match: re.Match) -> bytes:
+        name = match.group(1).decode()
+        arg = (match.group(2) or b'').decode()
+        if name not in _fragments:
+            return b''
+        template_name, get_context = _fragments[name]
+        context = {'current_user': request.user, 'arg': arg}
+        context.update(get_context(request, arg))
+        return render_to_string(
+            template_name, context, request=request).encode()
+
+    return FRAGMENT_RE.sub(_render, content)
+
+
+class FragmentMiddleware(MiddlewareMixin):
+    """
+    Fill {% fragment %} placeholders in HTML responses.
+
+    Under ASGI, MiddlewareMixin runs process_response() in a thread, where
+    the fragments may read request.user and the database.
+    """
+
+    def process_response(self, request: HttpRequest,
+                         response: HttpResponse) -> HttpResponse:
+        if (not response.streaming
+                and 'html' in response.get('Content-Type', '')
+                and b'<!--fragment:' in response.content):
+            response.content = render_fragments(request, response.content)
+        return response
@@ -0,0 +1,189 @@
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Sequence
+
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+# tables larger than this use the planner estimate instead of COUNT(*)
+ESTIMATE_THRESHOLD: int = 100_000
+COUNT_CACHE_TIMEOUT: int = 300
+POST_COUNT_CACHE_KEY: str = 'blog:post_count'
+BLOGS_PER_PAGE: int = 15
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded."""
+
+
+def encode_cursor(values: Sequence[Any], reverse: bool = False) -> str:
+    """Pack ordering values into an opaque, url-safe token."""
+    payload = [
+        v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps({'v': payload, 'r': int(reverse)},
+                     separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token: str) -> tuple[list[Any], bool]:
+    """Unpack a token produced by encode_cursor."""
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        data = json.loads(raw)
+        values, reverse = list(data['v']), bool(data['r'])
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(token)
+    return values, reverse
+
+
+class KeysetPage:
+    """A page of results plus the tokens needed to reach its neighbours."""
+
+    def __init__(self, object_list, has_next, has_previous,
+                 next_token=None, previous_token=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_token = next_token
+        self.previous_token = previous_token
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginate a queryset on a (field, pk) key without COUNT(*) or OFFSET.
+
+    Every page is a single indexed range scan of per_page + 1 rows, so
+    deep pages cost the same as the first one.
+    """
+
+    def __init__(self, queryset: QuerySet, per_page: int,
+                 ordering: tuple[str, str] = ('-date', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = ordering
+        self.fields = [f.lstrip('-') for f in ordering]
+        self.descending = ordering[0].startswith('-')
+
+    def _key(self, obj) -> list[Any]:
+        return [getattr(obj, f) for f in self.fields]
+
+    def _after(self, values: list[Any], reverse: bool) -> Q:
+        # rows that come strictly after `values` in the walk direction
+        first, second = self.fields
+        lookup = 'lt' if self.descending != reverse else 'gt'
+        return (Q(**{f'{first}__{lookup}': values[0]})
+                | Q(**{first: values[0], f'{second}__{lookup}': values[1]}))
+
+    def _parse(self, values: list[Any]) -> list[Any]:
+        model = self.queryset.model
+        return [model._meta.get_field(f).to_python(v)
+                for f, v in zip(self.fields, values)]
+
+    def _query(self, token: str | None) -> tuple[QuerySet, bool]:
+        reverse = False
+        qs = self.queryset
+        if token:
+            values, reverse = decode_cursor(token)
+            try:
+                values = self._parse(values)
+            except Exception:
+                raise InvalidCursor(token)
+            qs = qs.filter(self._after(values, reverse))
+
+        ordering = self.ordering
+        if reverse:
+            ordering = tuple(
+                f[1:] if f.startswith('-') else f'-{f}' for f in ordering)
+        return qs.order_by(*ordering)[:self.per_page + 1], reverse
+
+    def _build(self, rows: list, token: str | None,
+               reverse: bool) -> KeysetPage:
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+
+        if reverse:
+            rows.reverse()
+            has_next, has_previous = bool(token), has_more
+        else:
+            has_next, has_previous = has_more, bool(token)
+
+        next_token = previous_token = None
+        if rows and has_next:
+            next_token = encode_cursor(self._key(rows[-1]))
+        if rows and has_previous:
+            previous_token = encode_cursor(self._key(rows[0]), reverse=True)
+
+        return KeysetPage(rows, has_next, has_previous,
+                          next_token, previous_token)
+
+    def page(self, token: str | None = None) -> KeysetPage:
+        """Return the page addressed by token (the first page when None)."""
+        qs, reverse = self._query(token)
+        return self._build(list(qs), token, reverse)
+
+    async def apage(self, token: str | None = None) -> KeysetPage:
+        """Async page()."""
+        qs, reverse = self._query(token)
+        return self._build([row async for row in qs], token, reverse)
+
+
+def estimated_count(queryset: QuerySet) -> int:
+    """
+    Count rows cheaply: unfiltered querysets on large Postgres tables use
+    the planner's reltuples estimate, everything else an exact COUNT(*).
+    """
+    model = queryset.model
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql' and not queryset.query.where:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] >= ESTIMATE_THRESHOLD:
+            return int(row[0])
+    return queryset.count()
+
+
+def cached_count(queryset: QuerySet, cache_key: str,
+                 timeout: int = COUNT_CACHE_TIMEOUT) -> int:
+    """estimated_count() memoised in the shared cache under cache_key."""
+    count = cache.get(cache_key)
+    if count is None:
+        count = estimated_count(queryset)
+        cache.set(cache_key, count, timeout)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """Paginator whose total comes from cached_count() instead of COUNT(*)."""
+
+    def __init__(self, object_list, per_page, cache_key, **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.cache_key = cache_key
+
+    @cached_property
+    def count(self) -> int:
+        return cached_count(self.object_list, self.cache_key)
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator whose total comes from estimated_count(), for the admin."""
+
+    @cached_property
+    def count(self) -> int:
+        return estimated_count(self.object_list)
@@ -0,0 +1,103 @@
+import logging
+from contextlib import ExitStack
+from functools import wraps
+from inspect import iscoroutinefunction
+from typing import Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+from django.http import HttpRequest, HttpResponse
+from django.urls import resolve
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised in strict mode when a view runs more queries than declared."""
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def query_budget(
+        max_queries: int
+) -> Callable[[Callable[..., HttpResponse]], Callable[..., HttpResponse]]:
+    """
+    Declare the maximum number of queries a view (including its template
+    rendering) may run.
+
+    Overruns are logged; with ``QUERY_BUDGET_STRICT`` enabled (as the tests
+    do) they raise QueryBudgetExceeded so an N+1 regression fails loudly.
+    """
+    def decorator(
+            view_func: Callable[..., HttpResponse]
+    ) -> Callable[..., HttpResponse]:
+        def _check(counter: _QueryCounter, request: HttpRequest) -> None:
+            if counter.count > max_queries:
+                message = (
+                    f'{view_func.__name__} ran {counter.count} queries '
+                    f'(budget {max_queries}) for {request.path}')
+                if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+
+        if iscoroutinefunction(view_func):
+            @wraps(view_func)
+            async def _wrapped_view(
+                    request: HttpRequest, *args, **kwargs) -> HttpResponse:
+                # the async ORM runs queries on the request's sync thread,
+                # which has its own connections; wrap those
+                counter = _QueryCounter()
+                conns = await sync_to_async(connections.all)()
+                for conn in conns:
+                    conn.execute_wrappers.append(counter)
+                try:
+                    response = await view_func(request, *args, **kwargs)
+                finally:
+                    for conn in conns:
+                        conn.execute_wrappers.remove(counter)
+                _check(counter, request)
+                return response
+        else:
+            @wraps(view_func)
+            def _wrapped_view(
+                    request: HttpRequest, *args, **kwargs) -> HttpResponse:
+                counter = _QueryCounter()
+                with ExitStack() as stack:
+                    for conn in connections.all():
+                        stack.enter_context(conn.execute_wrapper(counter))
+                    response = view_func(request, *args, **kwargs)
+                    # TemplateResponse renders lazily; count that work too
+                    if hasattr(response, 'render') and not getattr(
+                            response, 'is_rendered', True):
+                        response.render()
+                _check(counter, request)
+                return response
+
+        _wrapped_view.query_budget = max_queries
+        return _wrapped_view
+
+    return decorator
+
+
+class QueryBudgetTestMixin:
+    """TestCase mixin asserting that a URL stays within its view's budget."""
+
+    def assertWithinQueryBudget(self, url: str, **kwargs) -> HttpResponse:
+        from django.test.utils import override_settings
+
+        view = resolve(url.split('?')[0]).func
+        self.assertIsNotNone(
+            getattr(view, 'query_budget', None),
+            f'{url} is not decorated with @query_budget')
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            response = self.client.get(url, **kwargs)
+        self.assertLess(response.status_code, 400)
+        return response
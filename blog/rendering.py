@@ -0,0 +1,149 @@
+"""
+Save-time rendering of post bodies.
+
+CKEditor submits raw HTML. render_body() turns it once, when the post is
+saved, into an allowlist-sanitized ``body_html`` plus the plain-text
+derivatives the listings and search need (body text, excerpt, word count,
+reading time), so requests only ever read precomputed columns.
+
+This module only depends on the standard library so the backfill command
+can run it in worker processes.
+"""
+import math
+import re
+from html import escape
+from html.parser import HTMLParser
+from urllib.parse import urlsplit
+
+WORDS_PER_MINUTE: int = 200
+EXCERPT_WORDS: int = 40
+# stored with the rendered columns; bump it whenever render_body's output
+# changes so that render_posts picks every post up again
+RENDER_VERSION: int = 2
+
+ALLOWED_TAGS = {
+    'a', 'abbr', 'b', 'blockquote', 'br', 'caption', 'code', 'del', 'div',
+    'em', 'figcaption', 'figure', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hr',
+    'i', 'img', 'li', 'ol', 'p', 'pre', 's', 'span', 'strike', 'strong',
+    'sub', 'sup', 'table', 'tbody', 'td', 'tfoot', 'th', 'thead', 'tr', 'u',
+    'ul',
+}
+ALLOWED_ATTRIBUTES = {
+    'a': {'href', 'title'},
+    'abbr': {'title'},
+    'img': {'src', 'alt', 'title', 'width', 'height'},
+    'td': {'colspan', 'rowspan'},
+    'th': {'colspan', 'rowspan', 'scope'},
+}
+URL_ATTRIBUTES = {'href', 'src'}
+ALLOWED_SCHEMES = {'', 'http', 'https', 'mailto'}
+VOID_TAGS = {'br', 'hr', 'img'}
+# dropped together with everything inside them
+DROP_CONTENT_TAGS = {
+    'script', 'style', 'iframe', 'object', 'embed', 'noscript', 'template',
+    'textarea', 'select', 'svg', 'math',
+}
+# tags that separate words in the plain-text rendering
+BLOCK_TAGS = {
+    'blockquote', 'br', 'caption', 'div', 'figcaption', 'figure', 'h1', 'h2',
+    'h3', 'h4', 'h5', 'h6', 'hr', 'li', 'p', 'pre', 'td', 'th', 'tr',
+}
+
+
+def _safe_url(value: str) -> bool:
+    # browsers ignore control characters and whitespace inside schemes
+    cleaned = re.sub(r'[\x00-\x20]', '', value)
+    try:
+        return urlsplit(cleaned).scheme.lower() in ALLOWED_SCHEMES
+    except ValueError:
+        return False
+
+
+class _BodyParser(HTMLParser):
+    """Rebuild the allowed subset of the markup and collect its text."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.html: list[str] = []
+        self.text: list[str] = []
+        self.open_tags: list[str] = []
+        self.dropping: list[str] = []
+
+    def handle_starttag(self, tag, attrs):
+        if self.dropping or tag in DROP_CONTENT_TAGS:
+            if tag in DROP_CONTENT_TAGS and tag not in VOID_TAGS:
+                self.dropping.append(tag)
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in ALLOWED_TAGS:
+            return
+
+        allowed = ALLOWED_ATTRIBUTES.get(tag, set())
+        parts = [tag]
+        for name, value in attrs:
+            if name not in allowed or value is None:
+                continue
+            if name in URL_ATTRIBUTES and not _safe_url(value):
+                continue
+            parts.append(f'{name}="{escape(value)}"')
+        if tag == 'a':
+            parts.append('rel="nofollow noopener"')
+        self.html.append(f'<{" ".join(parts)}>')
+        if tag not in VOID_TAGS:
+            self.open_tags.append(tag)
+
+    def handle_endtag(self, tag):
+        if self.dropping:
+            if tag == self.dropping[-1]:
+                self.dropping.pop()
+            return
+        if tag in BLOCK_TAGS:
+            self.text.append(' ')
+        if tag not in self.open_tags:
+            return
+        # close anything left open inside tag so the output stays balanced
+        while self.open_tags:
+            closing = self.open_tags.pop()
+            self.html.append(f'</{closing}>')
+            if closing == tag:
+                break
+
+    def handle_data(self, data):
+        if self.dropping:
+            return
+        self.html.append(escape(data, quote=False))
+        self.text.append(data)
+
+    def close(self):
+        super().close()
+        while self.open_tags:
+            self.html.append(f'</{self.open_tags.pop()}>')
+
+
+def sanitize_html(html: str) -> str:
+    """Return html reduced to the allowlisted tags and attributes."""
+    parser = _BodyParser()
+    parser.feed(html or '')
+    parser.close()
+    return ''.join(parser.html)
+
+
+def render_body(body: str) -> dict:
+    """All columns Post derives from body, keyed by field name."""
+    parser = _BodyParser()
+    parser.feed(body or '')
+    parser.close()
+
+    words = ''.join(parser.text).split()
+    excerpt = ' '.join(words[:EXCERPT_WORDS])
+    if len(words) > EXCERPT_WORDS:
+        excerpt += '…'
+    return {
+        'body_html': ''.join(parser.html),
+        'body_text': ' '.join(words),
+        'excerpt': excerpt,
+        'word_count': len(words),
+        'reading_time': math.ceil(len(words) / WORDS_PER_MINUTE),
+        'render_version': RENDER_VERSION,
+    }
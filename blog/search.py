@@ -0,0 +1,231 @@
+"""
+Ranked full-text search over post title, subtitle and body text.
+
+The body is indexed through Post.body_text, the plain text render_body()
+derives on save, so both backends see the same words and markup (tag and
+attribute names, entities) never matches or shows up in snippets.
+
+The index lives outside the Django model so it can use each database's
+native machinery, and is created by ensure_search_schema() on post_migrate:
+
+* PostgreSQL: a STORED generated ``search_vector`` tsvector column (title
+  weighted A, subtitle B, body text C) with a GIN index. Postgres
+  recomputes it on every INSERT/UPDATE, so the index is always current.
+* SQLite: an external-content FTS5 table kept in sync by AFTER INSERT /
+  UPDATE / DELETE triggers, so bulk_create and raw SQL writes are indexed
+  too.
+
+Other backends fall back to an unindexed icontains scan.
+"""
+import re
+from dataclasses import dataclass
+
+from django.db import connections
+from django.utils.html import escape, strip_tags
+from django.utils.safestring import SafeString, mark_safe
+
+from .models import Post
+
+# highlight delimiters that cannot appear in user text; they survive
+# strip_tags/escape and are swapped for <mark> afterwards
+_START, _STOP = '\x02', '\x03'
+
+SQLITE_SCHEMA = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS blog_post_fts USING fts5(
+        title, subtitle, body_text,
+        content='blog_post', content_rowid='id',
+        tokenize='porter unicode61')""",
+    """CREATE TRIGGER IF NOT EXISTS blog_post_fts_ai AFTER INSERT ON blog_post
+    BEGIN
+        INSERT INTO blog_post_fts(rowid, title, subtitle, body_text)
+        VALUES (new.id, new.title, new.subtitle, new.body_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS blog_post_fts_ad AFTER DELETE ON blog_post
+    BEGIN
+        INSERT INTO blog_post_fts(
+            blog_post_fts, rowid, title, subtitle, body_text)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.body_text);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS blog_post_fts_au
+    AFTER UPDATE OF title, subtitle, body_text ON blog_post
+    BEGIN
+        INSERT INTO blog_post_fts(
+            blog_post_fts, rowid, title, subtitle, body_text)
+        VALUES ('delete', old.id, old.title, old.subtitle, old.body_text);
+        INSERT INTO blog_post_fts(rowid, title, subtitle, body_text)
+        VALUES (new.id, new.title, new.subtitle, new.body_text);
+    END""",
+]
+
+SQLITE_DROP = [
+    'DROP TRIGGER IF EXISTS blog_post_fts_ai',
+    'DROP TRIGGER IF EXISTS blog_post_fts_ad',
+    'DROP TRIGGER IF EXISTS blog_post_fts_au',
+    'DROP TABLE IF EXISTS blog_post_fts',
+]
+
+POSTGRES_SCHEMA = [
+    """ALTER TABLE blog_post ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(subtitle, '')), 'B') ||
+        setweight(to_tsvector('english', coalesce(body_text, '')), 'C')
+    ) STORED""",
+    """CREATE INDEX IF NOT EXISTS blog_post_search_gin
+    ON blog_post USING gin (search_vector)""",
+]
+
+SQLITE_QUERY = f"""
+    SELECT p.id,
+           bm25(blog_post_fts, 10.0, 4.0, 1.0) AS rank,
+           highlight(blog_post_fts, 0, '{_START}', '{_STOP}'),
+           snippet(blog_post_fts, 2, '{_START}', '{_STOP}', '…', 32)
+    FROM blog_post_fts
+    JOIN blog_post p ON p.id = blog_post_fts.rowid
+    WHERE blog_post_fts MATCH %s
+    ORDER BY rank, p.date DESC
+    LIMIT %s OFFSET %s
+"""
+
+# ts_headline is expensive, so it only runs on the page of ranked hits
+POSTGRES_QUERY = f"""
+    SELECT hit.id, hit.rank,
+           ts_headline('english', hit.title, hit.q,
+                       'StartSel={_START}, StopSel={_STOP}, HighlightAll=true'),
+           ts_headline('english', hit.body_text, hit.q,
+                       'StartSel={_START}, StopSel={_STOP}, MaxFragments=2,
+                        MaxWords=32, MinWords=12')
+    FROM (
+        SELECT p.id, p.title, p.body_text, q,
+               ts_rank(p.search_vector, q) AS rank
+        FROM blog_post p, websearch_to_tsquery('english', %s) q
+        WHERE p.search_vector @@ q
+        ORDER BY rank DESC, p.date DESC
+        LIMIT %s OFFSET %s
+    ) hit
+    ORDER BY hit.rank DESC
+"""
+
+
+# trigram indexes behind the admin's icontains searches, which PostgreSQL
+# runs as UPPER(column::text) LIKE UPPER('%term%')
+TRIGRAM_INDEXES = {
+    'blog_post': ('title',),
+    'users_user': ('username', 'email', 'first_name', 'last_name'),
+}
+
+
+@dataclass
+class SearchResult:
+    post: Post
+    rank: float
+    title_html: SafeString
+    snippet_html: SafeString
+
+
+def ensure_search_schema(using: str = 'default') -> None:
+    """
+    Create the vendor specific search index if it does not exist yet, or
+    replace one built over the raw HTML body before body_text existed.
+    """
+    connection = connections[using]
+    if 'blog_post' not in connection.introspection.table_names():
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT sql FROM sqlite_master WHERE name = 'blog_post_fts'")
+            row = cursor.fetchone()
+            if row and 'body_text' not in row[0]:
+                # built over the raw HTML body; replace it
+                for statement in SQLITE_DROP:
+                    cursor.execute(statement)
+                row = None
+            created = row is None
+            for statement in SQLITE_SCHEMA:
+                cursor.execute(statement)
+            if created:
+                # index rows that existed before the FTS table
+                cursor.execute(
+                    "INSERT INTO blog_post_fts(blog_post_fts) "
+                    "VALUES ('rebuild')")
+        elif connection.vendor == 'postgresql':
+            cursor.execute(
+                "SELECT generation_expression FROM information_schema.columns "
+                "WHERE table_name = 'blog_post' "
+                "AND column_name = 'search_vector'")
+            row = cursor.fetchone()
+            if row and 'body_text' not in (row[0] or ''):
+                # built over the raw HTML body; its index goes with it
+                cursor.execute(
+                    'ALTER TABLE blog_post DROP COLUMN search_vector')
+            for statement in POSTGRES_SCHEMA:
+                cursor.execute(statement)
+
+
+def ensure_trigram_indexes(using: str = 'default') -> None:
+    """Create the PostgreSQL trigram indexes of TRIGRAM_INDEXES."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    tables = set(connection.introspection.table_names())
+    with connection.cursor() as cursor:
+        cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for table, columns in TRIGRAM_INDEXES.items():
+            if table not in tables:
+                continue
+            for column in columns:
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {table}_{column}_trgm '
+                    f'ON {table} USING gin '
+                    f'((UPPER({column}::text)) gin_trgm_ops)')
+
+
+def _fts5_query(text: str) -> str:
+    """Turn free text into an FTS5 AND query, prefix-matching the last term."""
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return ''
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _highlight(text: str | None) -> SafeString:
+    cleaned = escape(strip_tags(text or ''))
+    return mark_safe(
+        cleaned.replace(_START, '<mark>').replace(_STOP, '</mark>'))
+
+
+def search_posts(text: str, limit: int = 20,
+                 offset: int = 0) -> list[SearchResult]:
+    """Posts matching text, best match first, with highlighted excerpts."""
+    text = text.strip()
+    if not text:
+        return []
+
+    connection = connections[Post.objects.db]
+    if connection.vendor == 'sqlite':
+        query = _fts5_query(text)
+        if not query:
+            return []
+        sql, params = SQLITE_QUERY, [query, limit, offset]
+    elif connection.vendor == 'postgresql':
+        sql, params = POSTGRES_QUERY, [text, limit, offset]
+    else:
+        posts = Post.objects.for_listing().filter(
+            title__icontains=text)[offset:offset + limit]
+        return [SearchResult(post, 0.0, escape(post.title),
+                             escape(post.subtitle)) for post in posts]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        hits = cursor.fetchall()
+
+    posts = Post.objects.for_listing().in_bulk(
+        [hit[0] for hit in hits])
+    return [
+        SearchResult(posts[pk], float(rank), _highlight(title),
+                     _highlight(snippet))
+        for pk, rank, title, snippet in hits if pk in posts
+    ]
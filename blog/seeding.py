@@ -0,0 +1,171 @@
+"""
+Synthetic users, posts and comments for benchmarks and local testing.
+
+The sizes follow the long tails of a real blog rather than being uniform:
+post and comment lengths are log-normal, a few authors write most of the
+posts, and comments are spread over the posts by a Zipf weight so that a
+handful of posts carry huge threads while most have none or a few.
+
+Everything is written with bulk_create in batches, with the fields the
+model and the comment signals would otherwise fill in (rendered body,
+counters, profiles) computed here.
+"""
+import random
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.utils import timezone
+from users.models import Profile
+
+from .models import Comments, Post
+from .rendering import render_body
+from .signals import posts_bulk_loaded
+
+# every seeded user can log in with this password
+SEED_PASSWORD: str = 'seed-password'
+
+WORDS = (
+    'django python database index query cache latency throughput server '
+    'client template render worker queue request response static image '
+    'search ranking token session cookie signal model field migration '
+    'backend frontend deploy docker linux network socket thread process '
+    'the a of and to in is it that for on with as was this by'
+).split()
+
+
+def _words(rng: random.Random, count: int) -> str:
+    return ' '.join(rng.choices(WORDS, k=max(count, 1)))
+
+
+def _lognormal(rng: random.Random, median: float, sigma: float,
+               low: int, high: int) -> int:
+    return min(max(int(rng.lognormvariate(0, sigma) * median), low), high)
+
+
+def post_body(rng: random.Random) -> str:
+    """CKEditor-style HTML, median ~600 words with a long tail."""
+    words = _lognormal(rng, 600, 0.8, 50, 12_000)
+    parts = []
+    while words > 0:
+        size = min(words, rng.randint(40, 160))
+        if rng.random() < 0.15:
+            parts.append(f'<h2>{_words(rng, 4).capitalize()}</h2>')
+        parts.append(f'<p>{_words(rng, size).capitalize()}.</p>')
+        words -= size
+    return '\n'.join(parts)
+
+
+def comment_text(rng: random.Random) -> str:
+    """Median ~25 words, occasionally a few hundred."""
+    return _words(rng, _lognormal(rng, 25, 1.0, 1, 1500)).capitalize()
+
+
+def _next_seed_number(User) -> int:
+    """One past the highest seedN username, so reruns never collide."""
+    names = User.objects.filter(username__regex=r'^seed[0-9]+$').values_list(
+        'username', flat=True)
+    return max((int(name[4:]) for name in names), default=-1) + 1
+
+
+def _zipf_weights(count: int, exponent: float = 1.1) -> list[float]:
+    # cumulative, so rng.choices() does not re-sum them on every call
+    return list(accumulate(1 / rank ** exponent
+                           for rank in range(1, count + 1)))
+
+
+def seed(users: int, posts: int, comments: int, *,
+         rng: random.Random | None = None, batch_size: int = 1000,
+         progress=None) -> dict[str, int]:
+    """
+    Insert the given numbers of users, posts and comments. Returns the
+    number of rows written per model.
+    """
+    rng = rng or random.Random()
+    report = progress or (lambda message: None)
+    User = get_user_model()
+    now = timezone.now()
+
+    # one hash for every user instead of one PBKDF2 run per row
+    password = make_password(SEED_PASSWORD)
+    first = _next_seed_number(User)
+    user_ids = []
+    created_users = 0
+    for start in range(0, users, batch_size):
+        with transaction.atomic():
+            batch = User.objects.bulk_create([
+                User(username=f'seed{first + i}',
+                     email=f'seed{first + i}@example.com',
+                     password=password,
+                     date_joined=now - timedelta(days=rng.randint(0, 1500)))
+                for i in range(start, min(start + batch_size, users))])
+            Profile.objects.bulk_create([Profile(user=u) for u in batch])
+        user_ids.extend(u.pk for u in batch)
+        created_users += len(batch)
+        report(f'{created_users} users')
+    if not user_ids:
+        # posts and comments by users that already exist
+        user_ids = list(User.objects.values_list('pk', flat=True)[:1000])
+    if posts and not user_ids:
+        raise ValueError('posts need at least one user to write them')
+
+    author_weights = _zipf_weights(len(user_ids))
+    post_dates = {}
+    for start in range(0, posts, batch_size):
+        batch = []
+        for _ in range(min(batch_size, posts - start)):
+            body = post_body(rng)
+            author_id, = rng.choices(user_ids, cum_weights=author_weights)
+            post = Post(
+                title=_words(rng, rng.randint(3, 12)).capitalize()[:200],
+                subtitle=_words(rng, rng.randint(0, 20)).capitalize()[:300],
+                body=body,
+                author_id=author_id,
+                date=now - timedelta(minutes=rng.randint(0, 3 * 525_600)),
+                updated_at=now,
+                **render_body(body))
+            batch.append(post)
+        with transaction.atomic():
+            Post.objects.bulk_create(batch)
+        post_dates.update((post.pk, post.date) for post in batch)
+        report(f'{len(post_dates)} posts')
+
+    # rank the posts randomly, then give rank n a 1/n^1.1 share
+    post_ids = list(post_dates)
+    rng.shuffle(post_ids)
+    post_weights = _zipf_weights(len(post_ids))
+    counts: Counter = Counter()
+    last_comment = {}
+    written = 0
+    while written < comments:
+        size = min(batch_size, comments - written)
+        batch = []
+        for post_id in rng.choices(post_ids, cum_weights=post_weights,
+                                   k=size):
+            posted = post_dates[post_id]
+            date = posted + (now - posted) * rng.random() ** 3
+            batch.append(Comments(
+                post_id=post_id, the_user_id=rng.choice(user_ids),
+                comment=comment_text(rng), date=date))
+            counts[post_id] += 1
+            last_comment[post_id] = max(
+                date, last_comment.get(post_id, date))
+        with transaction.atomic():
+            Comments.objects.bulk_create(batch)
+        written += size
+        report(f'{written} comments')
+
+    # what the comment signals would have counted
+    commented = [Post(pk=pk, comment_count=counts[pk],
+                      last_commented_at=last_comment[pk]) for pk in counts]
+    for start in range(0, len(commented), batch_size):
+        with transaction.atomic():
+            Post.objects.bulk_update(
+                commented[start:start + batch_size], Post.COUNTER_FIELDS)
+
+    posts_bulk_loaded()
+    return {'users': created_users, 'posts': len(post_dates),
+            'comments': written}
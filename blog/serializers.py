@@ -0,0 +1,71 @@
+from rest_framework import serializers
+
+from .models import Comments, Post
+
+
+class SparseFieldsSerializer(serializers.ModelSerializer):
+    """
+    ModelSerializer that honours ``?fields=a,b`` and can tell the view
+    which model columns those fields need, so unused (possibly huge)
+    columns are never selected.
+
+    Meta.field_sources maps serializer fields to the model lookups they
+    read when that is not simply the field's own name.
+    """
+
+    @classmethod
+    def requested_fields(cls, request) -> list[str]:
+        available = list(cls.Meta.fields)
+        raw = request.query_params.get('fields') if request else None
+        if not raw:
+            return available
+        wanted = [name.strip() for name in raw.split(',')]
+        return [name for name in available if name in wanted] or available
+
+    @classmethod
+    def model_columns(cls, fields: list[str]) -> list[str]:
+        sources = getattr(cls.Meta, 'field_sources', {})
+        columns = {'pk'}
+        for name in fields:
+            columns.update(sources.get(name, (name,)))
+        return sorted(columns)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        keep = set(self.requested_fields(self.context.get('request')))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+
+class PostSerializer(SparseFieldsSerializer):
+    author = serializers.CharField(source='author.username', read_only=True)
+    url = serializers.SerializerMethodField()
+    # the sanitized HTML; the raw editor markup never leaves the site
+    body = serializers.CharField(source='body_html', read_only=True)
+
+    class Meta:
+        model = Post
+        fields = ('id', 'url', 'title', 'subtitle', 'author', 'date',
+                  'img_url', 'comment_count', 'last_commented_at', 'body')
+        field_sources = {
+            'url': ('id',),
+            'author': ('author__username',),
+            'body': ('body_html',),
+        }
+
+    def get_url(self, obj) -> str:
+        return obj.get_absolute_url()
+
+
+class CommentSerializer(SparseFieldsSerializer):
+    user = serializers.CharField(
+        source='the_user.username', read_only=True, default=None)
+
+    class Meta:
+        model = Comments
+        fields = ('id', 'post', 'user', 'comment', 'date')
+        field_sources = {
+            'post': ('post',),
+            'user': ('the_user__username',),
+        }
@@ -0,0 +1,119 @@
+from django.core.cache import cache
+from django.db.models import F, OuterRef, Q, QuerySet, Subquery
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .conditional import mark_posts_deleted
+from .models import Comments, Post
+from .pagecache import invalidate_tags
+from .pagination import POST_COUNT_CACHE_KEY
+from .search import ensure_search_schema, ensure_trigram_indexes
+
+
+def _neighbour_tags(post: Post) -> list[str]:
+    """Listing tags of the posts directly above and below post."""
+    newer = Post.objects.filter(
+        Q(date__gt=post.date) | Q(date=post.date, id__gt=post.id)
+    ).order_by('date', 'id').values_list('id', flat=True).first()
+    older = Post.objects.filter(
+        Q(date__lt=post.date) | Q(date=post.date, id__lt=post.id)
+    ).order_by('-date', '-id').values_list('id', flat=True).first()
+    return [f'listed:{pk}' for pk in (newer, older) if pk is not None]
+
+
+def posts_bulk_loaded(post_ids=()) -> None:
+    """
+    Expire what the receivers below would have for posts and comments
+    written with bulk_create/bulk_update, which send no signals: the
+    cached total, every listing page (new posts can land on any of them)
+    and the pages of the given existing posts.
+    """
+    cache.delete(POST_COUNT_CACHE_KEY)
+    invalidate_tags('listing', 'listing:numbered',
+                    *(f'post:{pk}' for pk in post_ids),
+                    *(f'comments:{pk}' for pk in post_ids))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """
+    Drop the cached post total when a post is added, and expire the cached
+    pages that show the post or the slot it now occupies in the listings.
+    """
+    if created:
+        cache.delete(POST_COUNT_CACHE_KEY)
+    invalidate_tags(f'post:{instance.pk}', f'listed:{instance.pk}',
+                    'listing:numbered', *_neighbour_tags(instance))
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    """Drop the cached post total and the pages that showed the post."""
+    cache.delete(POST_COUNT_CACHE_KEY)
+    mark_posts_deleted()
+    invalidate_tags(f'post:{instance.pk}', f'comments:{instance.pk}',
+                    f'listed:{instance.pk}', 'listing:numbered')
+
+
+@receiver(post_save, sender=Comments)
+def comment_saved(sender, instance, created, **kwargs):
+    """Count a new comment on its post in a single UPDATE."""
+    if created:
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1,
+            last_commented_at=Greatest(
+                Coalesce('last_commented_at', instance.date), instance.date),
+            updated_at=timezone.now(),
+        )
+
+
+def _deleted_with_post(origin) -> bool:
+    """
+    Whether a comment delete is part of deleting its post (directly or
+    through its author). Comments only cascade from their post, so any
+    origin other than comments means the post row is going as well and
+    its counters and pages need no per-comment upkeep.
+    """
+    if origin is None:
+        return False
+    model = origin.model if isinstance(origin, QuerySet) else type(origin)
+    return model is not Comments
+
+
+@receiver(post_delete, sender=Comments)
+def comment_deleted(sender, instance, origin=None, **kwargs):
+    """Uncount a removed comment and recompute the post's last activity."""
+    if _deleted_with_post(origin):
+        return
+    latest = Comments.objects.filter(
+        post_id=OuterRef('pk')).order_by('-date').values('date')[:1]
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1,
+        last_commented_at=Subquery(latest),
+        updated_at=timezone.now(),
+    )
+
+
+@receiver(post_save, sender=Comments)
+@receiver(post_delete, sender=Comments)
+def comment_changed(sender, instance, origin=None, **kwargs):
+    """
+    Expire the cached page of the post the comment belongs to and the
+    listing pages showing its comment count.
+    """
+    if _deleted_with_post(origin):
+        # post_deleted expires the post's pages
+        return
+    invalidate_tags(f'comments:{instance.post_id}',
+                    f'listed:{instance.post_id}')
+
+
+@receiver(post_migrate)
+def create_search_index(sender, using, **kwargs):
+    """Create the full-text and trigram indexes once the tables exist."""
+    if sender.name == 'blog':
+        ensure_search_schema(using)
+    if sender.name in ('blog', 'users'):
+        ensure_trigram_indexes(using)
@@ -0,0 +1,43 @@
+from django import template
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from blog.images import FORMATS, derivative_url, resolve, srcset
+
+register = template.Library()
+
+
+@register.simple_tag
+def background_style(src):
+    """
+    Inline style for a masthead: the blurred placeholder when src (a URL
+    or a static file name) has derivatives (responsive_picture paints the
+    real image over it), otherwise the original image.
+    """
+    url, entry = resolve(src)
+    image = entry['placeholder'] if entry else url
+    return format_html("background-image: url('{}')", image or '')
+
+
+@register.simple_tag
+def responsive_picture(src, alt='', css_class='', img_class='',
+                       sizes='100vw', priority=False):
+    """
+    A <picture> offering every built width in WebP and JPEG, or nothing
+    when src has no derivatives (the caller's fallback shows the original).
+    """
+    _url, entry = resolve(src)
+    if not entry:
+        return ''
+    sources = format_html(
+        '<source type="{}" srcset="{}" sizes="{}">',
+        FORMATS['webp'][1], srcset(entry, 'webp'), sizes)
+    largest = entry['variants']['jpg'][-1][1]
+    return format_html(
+        '<picture class="{}">{}<img class="{}" src="{}" srcset="{}" '
+        'sizes="{}" width="{}" height="{}" alt="{}" decoding="async" {}>'
+        '</picture>',
+        css_class, sources, img_class, derivative_url(largest),
+        srcset(entry, 'jpg'),
+        sizes, entry['width'], entry['height'], alt,
+        mark_safe('fetchpriority="high"' if priority else 'loading="lazy"'))
@@ -0,0 +1,14 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+register = template.Library()
+
+
+@register.simple_tag
+def fragment(name, arg=''):
+    """
+    Emit a placeholder that FragmentMiddleware replaces with per-user
+    markup, keeping the surrounding page safe to cache for everyone.
+    """
+    suffix = f':{arg}' if arg != '' else ''
+    return mark_safe(f'<!--fragment:{name}{suffix}-->')
@@ -0,0 +1,52 @@
+from pathlib import Path
+
+from django import template
+from django.conf import settings
+from django.templatetags.static import static
+from django.utils.html import format_html
+from django.utils.safestring import mark_safe
+
+from blog.cssbuild import critical_css_name
+
+register = template.Library()
+
+_critical_cache: dict[Path, tuple[float, str]] = {}
+
+
+def _read(path: Path) -> str | None:
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return None
+    cached = _critical_cache.get(path)
+    if cached is None or cached[0] != mtime:
+        cached = (mtime, path.read_text(encoding='utf-8'))
+        _critical_cache[path] = cached
+    return cached[1]
+
+
+@register.simple_tag(takes_context=True)
+def site_css(context):
+    """
+    The page's critical CSS inline plus the pruned stylesheet loaded
+    without blocking rendering, once `manage.py build_css` has run;
+    until then the full stylesheet.
+    """
+    root = Path(settings.CSS_BUILD_ROOT)
+    origin = getattr(context.template, 'origin', None)
+    critical = None
+    if origin and origin.template_name and (root / 'style.min.css').exists():
+        critical = _read(root / 'critical'
+                         / critical_css_name(origin.template_name))
+    if critical is None:
+        return format_html('<link href="{}" rel="stylesheet">',
+                           static('css/style.css'))
+
+    href = static(f'{settings.CSS_BUILD_URL}style.min.css')
+    return format_html(
+        '<style>{}</style>\n'
+        '<link rel="preload" href="{}" as="style" '
+        'onload="this.onload=null;this.rel=\'stylesheet\'">\n'
+        '<noscript><link href="{}" rel="stylesheet"></noscript>',
+        # the CSS is ours, but must not be able to close the <style>
+        mark_safe(critical.replace('</', '<\\/')), href, href)
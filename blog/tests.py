@@ -1,11 +1,59 @@
+import asyncio
+import gzip
+import json
+import socketserver
+import tempfile
+import threading
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from config.database import (_pool_stats, database_settings, pool_metrics,
+                             replica_settings)
+from config.routers import PIN_COOKIE_NAME, ReplicaPinMiddleware
+from config.static import (ASGIStaticFilesHandler, StaticFiles,
+                           StaticFilesHandler)
 from django.contrib.auth import get_user_model
-from django.test import TestCase
-from django.urls import reverse
+from django.contrib.sessions.models import Session
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.cache import cache
+from django.core.mail import EmailMessage
+from django.core.management import CommandError, call_command
+from django.db import connection, connections
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path, resolve, reverse
+from django.utils import timezone
+from PIL import Image
+from users.models import Profile
 
-from .models import Post
+from . import async_views, views
+from .cssbuild import Usage, build
+from .images import load_manifest
+from .mail import deliver_batch
+from .management.commands.bench_site import compare
+from .models import Comments, OutgoingEmail, Post
+from .pagination import POST_COUNT_CACHE_KEY
+from .querybudget import (QueryBudgetExceeded, QueryBudgetTestMixin,
+                          query_budget)
+from .rendering import sanitize_html
+from .search import search_posts
+from .seeding import SEED_PASSWORD
 
 User = get_user_model()
 
+# ROOT_URLCONF for AsyncViewTests: the async read views ahead of the site
+urlpatterns = [
+    path('', async_views.home, name='home'),
+    path('all-blogs/', async_views.all_blogs, name='all_blogs'),
+    path('post/<int:post_id>/', async_views.show_post, name='show_post'),
+    path('about/', async_views.about_page, name='about_page'),
+    path('', include('config.urls')),
+]
+
 
 class BlogTests(TestCase):
 
@@ -56,3 +104,1696 @@ class BlogTests(TestCase):
         # Should redirect after successful registration
         self.assertEqual(response.status_code, 302)
         self.assertTrue(User.objects.filter(username='newuser').exists())
+
+
+class AllBlogsPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='pager', password='testpass')
+        start = timezone.now()
+        # two posts share each timestamp so the id tie-breaker matters
+        Post.objects.bulk_create([
+            Post(title=f'Post {i}', body='body', author=self.user,
+                 date=start - timedelta(minutes=i // 2))
+            for i in range(40)
+        ])
+        self.expected = list(
+            Post.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+    def test_cursor_walk_covers_every_post_once(self):
+        """Following next tokens visits all posts in order, then back."""
+        seen, token, pages = [], None, []
+        while True:
+            params = {'cursor': token} if token else {}
+            response = self.client.get(reverse('all_blogs'), params)
+            page = response.context['blogs']
+            pages.append(page)
+            seen.extend(post.id for post in page)
+            if not page.has_next:
+                break
+            token = page.next_token
+        self.assertEqual(seen, self.expected)
+        self.assertEqual(len(pages), 3)
+
+        response = self.client.get(
+            reverse('all_blogs'), {'cursor': pages[-1].previous_token})
+        self.assertEqual(
+            [post.id for post in response.context['blogs']],
+            [post.id for post in pages[-2]])
+
+    def test_cursor_page_does_not_count_or_offset(self):
+        """Deep cursor pages are a single range query with a cached total."""
+        first = self.client.get(reverse('all_blogs')).context['blogs']
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse('all_blogs'),
+                            {'cursor': first.next_token})
+        sql = ' '.join(q['sql'] for q in ctx.captured_queries).upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    def test_invalid_cursor_falls_back_to_first_page(self):
+        response = self.client.get(reverse('all_blogs'), {'cursor': '!!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [post.id for post in response.context['blogs']],
+            self.expected[:15])
+
+    def test_listings_never_select_the_body(self):
+        """home, all_blogs and search only load the listing columns."""
+        for url, params in ((reverse('home'), {}),
+                            (reverse('all_blogs'), {}),
+                            (reverse('all_blogs'), {'page': 2}),
+                            (reverse('search'), {'q': 'post'})):
+            cache.clear()
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 200)
+            sql = ' '.join(q['sql'] for q in ctx.captured_queries)
+            self.assertIn('"blog_post"."title"', sql)
+            self.assertNotIn('"blog_post"."body"', sql)
+            self.assertNotIn('"blog_post"."body_html"', sql)
+
+    def test_numbered_pages_still_work(self):
+        response = self.client.get(reverse('all_blogs'), {'page': 2})
+        self.assertEqual(response.context['current_page'], 2)
+        self.assertEqual(response.context['total_posts'], 40)
+        self.assertEqual(
+            [post.id for post in response.context['blogs']],
+            self.expected[15:30])
+
+
+class QueryBudgetTests(QueryBudgetTestMixin, TestCase):
+
+    def setUp(self):
+        cache.clear()
+        authors = User.objects.bulk_create(
+            [User(username=f'author{i}') for i in range(15)])
+        Post.objects.bulk_create([
+            Post(title=f'By {author.username}', body='body', author=author)
+            for author in authors
+        ])
+        self.post = Post.objects.first()
+        Comments.objects.bulk_create([
+            Comments(post=self.post, the_user=author, comment='hi')
+            for author in authors
+        ])
+        self.admin = User.objects.create_user(
+            username='boss', password='pw', is_staff=True)
+
+    def test_listing_views_within_budget(self):
+        self.assertWithinQueryBudget(reverse('home'))
+        self.assertWithinQueryBudget(reverse('all_blogs'))
+        self.assertWithinQueryBudget(reverse('all_blogs') + '?page=1')
+
+    def test_show_post_within_budget(self):
+        url = reverse('show_post', args=[self.post.id])
+        self.assertWithinQueryBudget(url)
+        self.client.force_login(self.admin)
+        self.assertWithinQueryBudget(url)
+
+    def test_budget_overrun_raises_in_strict_mode(self):
+        @query_budget(1)
+        def chatty(request):
+            list(User.objects.all())
+            list(Post.objects.all())
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        with override_settings(QUERY_BUDGET_STRICT=True):
+            with self.assertRaises(QueryBudgetExceeded):
+                chatty(request)
+        # outside strict mode an overrun is only logged
+        with self.assertLogs('blog.querybudget', 'WARNING'):
+            chatty(request)
+
+
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='reader', password='pw')
+        self.admin = User.objects.create_user(
+            username='editor', password='pw', is_staff=True)
+        self.post = Post.objects.create(
+            title='Cached', body='cached body', author=self.user)
+        self.other = Post.objects.create(
+            title='Other', body='other body', author=self.user,
+            date=timezone.now() - timedelta(days=1))
+
+    def test_second_anonymous_hit_is_served_from_cache(self):
+        url = reverse('show_post', args=[self.post.id])
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'miss')
+        # only the conditional GET lookup of updated_at reaches the database
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'login</a> to add a comment')
+
+    def test_cached_body_is_shared_with_per_user_fragments(self):
+        url = reverse('show_post', args=[self.post.id])
+        self.client.get(url)
+        self.client.force_login(self.admin)
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+        self.assertContains(response, 'Logout')
+        self.assertContains(response, 'Edit Post')
+        self.assertContains(response, 'Add Comment')
+        self.assertContains(response, 'csrfmiddlewaretoken')
+        self.assertNotContains(response, '<!--fragment:')
+
+    def test_comment_expires_its_post_page_and_listing(self):
+        post_url = reverse('show_post', args=[self.post.id])
+        other_url = reverse('show_post', args=[self.other.id])
+        for url in (post_url, other_url, reverse('all_blogs')):
+            self.client.get(url)
+        Comments.objects.create(
+            post=self.post, the_user=self.user, comment='fresh comment')
+        response = self.client.get(post_url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'fresh comment')
+        self.assertEqual(self.client.get(other_url)['X-Page-Cache'], 'hit')
+        # the listing shows the post's comment count
+        response = self.client.get(reverse('all_blogs'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, '1 comment')
+
+    def test_post_edit_expires_its_page_and_listings(self):
+        for url in (reverse('home'), reverse('all_blogs'),
+                    reverse('show_post', args=[self.other.id])):
+            self.client.get(url)
+        self.post.title = 'Renamed'
+        self.post.save()
+        for url in (reverse('home'), reverse('all_blogs')):
+            response = self.client.get(url)
+            self.assertEqual(response['X-Page-Cache'], 'miss')
+            self.assertContains(response, 'Renamed')
+        response = self.client.get(reverse('show_post', args=[self.other.id]))
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    def test_new_post_expires_listing_head(self):
+        self.client.get(reverse('home'))
+        Post.objects.create(title='Brand new', body='b', author=self.user)
+        self.assertContains(self.client.get(reverse('home')), 'Brand new')
+
+    def _rename_post_once(self, *args):
+        if self.post.title != 'Renamed':
+            self.post.title = 'Renamed'
+            self.post.save()
+
+    def test_edit_during_render_is_not_cached_as_current(self):
+        url = reverse('show_post', args=[self.post.id])
+        real = views._comments_page
+
+        def rename_then_page(*args):
+            # another request edits the post after this one has read it
+            self._rename_post_once()
+            return real(*args)
+
+        with mock.patch.object(views, '_comments_page', rename_then_page):
+            response = self.client.get(url)
+        self.assertContains(response, 'Cached')
+        response = self.client.get(url)
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Renamed')
+
+    def test_edit_before_late_tags_are_registered_skips_storing(self):
+        real = views.add_cache_tags
+
+        def rename_then_add(request, *tags):
+            if any(tag.startswith('listed:') for tag in tags):
+                self._rename_post_once()
+            real(request, *tags)
+
+        with mock.patch.object(views, 'add_cache_tags', rename_then_add):
+            self.assertNotContains(self.client.get(reverse('home')),
+                                   'Renamed')
+        response = self.client.get(reverse('home'))
+        self.assertEqual(response['X-Page-Cache'], 'miss')
+        self.assertContains(response, 'Renamed')
+
+
+class _SMTPStandInHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: records messages, can refuse some."""
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 stand-in ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode().strip().upper()
+            if command.startswith(('EHLO', 'HELO')):
+                self.reply('250 stand-in')
+            elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                data = []
+                while (chunk := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(chunk)
+                if server.refuse > 0:
+                    server.refuse -= 1
+                    self.reply('451 try again later')
+                else:
+                    server.messages.append(b''.join(data))
+                    self.reply('250 queued')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('502 not implemented')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _SMTPStandInHandler)
+        self.connections = 0
+        self.refuse = 0
+        self.messages = []
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+@override_settings(EMAIL_BACKEND='blog.mail.OutboxBackend')
+class OutboxTests(TestCase):
+
+    def setUp(self):
+        self.smtp = SMTPStandIn()
+        self.addCleanup(self.smtp.stop)
+        self.smtp_settings = override_settings(
+            OUTBOX_DELIVERY_BACKEND=(
+                'django.core.mail.backends.smtp.EmailBackend'),
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=self.smtp.server_address[1],
+            EMAIL_USE_TLS=False, EMAIL_USE_SSL=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='')
+        self.smtp_settings.enable()
+        self.addCleanup(self.smtp_settings.disable)
+        self.user = User.objects.create_user(
+            username='writer', password='pw', email='writer@example.com')
+
+    def test_contact_form_only_enqueues(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('contact_page'), {
+            'username': 'writer', 'email': 'writer@example.com',
+            'subject': 'Hello', 'message': 'Just saying hi'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.smtp.connections, 0)
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual(queued.subject, 'writer, Hello')
+        self.assertEqual(queued.to, ['writer@example.com'])
+        self.assertEqual(queued.status, OutgoingEmail.PENDING)
+
+    def test_password_reset_only_enqueues(self):
+        self.client.post(reverse('password_reset'),
+                         {'email': 'writer@example.com'})
+        self.assertEqual(self.smtp.connections, 0)
+        self.assertEqual(OutgoingEmail.objects.count(), 1)
+
+    def test_worker_sends_batch_over_one_connection(self):
+        for i in range(5):
+            EmailMessage(f'subject {i}', 'body', 'from@example.com',
+                         ['to@example.com']).send()
+        call_command('send_outbox', stdout=StringIO())
+        self.assertEqual(self.smtp.connections, 1)
+        self.assertEqual(len(self.smtp.messages), 5)
+        self.assertEqual(
+            OutgoingEmail.objects.filter(status=OutgoingEmail.SENT).count(), 5)
+
+    def test_failed_delivery_is_retried_with_backoff(self):
+        EmailMessage('retry me', 'body', 'from@example.com',
+                     ['to@example.com']).send()
+        self.smtp.refuse = 1
+        self.assertEqual(deliver_batch(), (0, 1))
+        queued = OutgoingEmail.objects.get()
+        self.assertEqual(queued.attempts, 1)
+        self.assertEqual(queued.status, OutgoingEmail.PENDING)
+        self.assertGreater(queued.next_attempt_at, timezone.now())
+        # not due yet, so nothing is sent
+        self.assertEqual(deliver_batch(), (0, 0))
+
+        OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+        self.assertEqual(deliver_batch(), (1, 0))
+        self.assertEqual(len(self.smtp.messages), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        EmailMessage('doomed', 'body', 'from@example.com',
+                     ['to@example.com']).send()
+        self.smtp.refuse = 10
+        with override_settings(OUTBOX_MAX_ATTEMPTS=2):
+            deliver_batch()
+            OutgoingEmail.objects.update(next_attempt_at=timezone.now())
+            deliver_batch()
+        self.assertEqual(OutgoingEmail.objects.get().status,
+                         OutgoingEmail.FAILED)
+
+
+class SearchTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='finder', password='pw')
+        self.in_title = Post.objects.create(
+            title='Tuning Postgres', subtitle='indexes',
+            body='<p>Notes on vacuum.</p>', author=self.user)
+        self.in_body = Post.objects.create(
+            title='Weekend notes', subtitle='misc',
+            body='<p>We moved the blog to postgres last week.</p>',
+            author=self.user)
+        Post.objects.create(title='Unrelated', body='<p>cats</p>',
+                            author=self.user)
+
+    def test_results_are_ranked_and_highlighted(self):
+        results = search_posts('postgres')
+        self.assertEqual([r.post for r in results],
+                         [self.in_title, self.in_body])
+        self.assertIn('<mark>Postgres</mark>', results[0].title_html)
+        self.assertIn('<mark>postgres</mark>', results[1].snippet_html)
+        self.assertNotIn('<p>', results[1].snippet_html)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.in_body.body = '<p>Nothing to see.</p>'
+        self.in_body.save()
+        self.assertEqual([r.post for r in search_posts('postgres')],
+                         [self.in_title])
+        self.in_title.delete()
+        self.assertEqual(search_posts('postgres'), [])
+        self.assertEqual([r.post for r in search_posts('see')],
+                         [self.in_body])
+
+    def test_search_endpoints(self):
+        response = self.client.get(reverse('search'), {'q': 'postgr'})
+        self.assertContains(response, 'Tuning')
+        self.assertContains(response, 'Weekend notes')
+        self.assertNotContains(response, 'Unrelated')
+
+        data = self.client.get(
+            reverse('search_api'), {'q': 'vacuum'}).json()
+        self.assertEqual([r['id'] for r in data['results']],
+                         [self.in_title.id])
+        self.assertFalse(data['has_next'])
+
+    def test_query_syntax_is_not_interpreted(self):
+        self.assertEqual(search_posts('"unbalanced AND ( NEAR'), [])
+
+    def test_markup_is_not_indexed(self):
+        bold = Post.objects.create(
+            title='Bold', body='<p class="lead"><strong>Loud</strong>&nbsp;'
+                               '<a href="/x">words</a></p>',
+            author=self.user)
+        coffee = Post.objects.create(
+            title='Coffee', body='<p>I like it strong.</p>', author=self.user)
+        self.assertEqual([r.post for r in search_posts('strong')], [coffee])
+        for word in ('href', 'nbsp', 'class', 'lead'):
+            self.assertEqual(search_posts(word), [], word)
+        self.assertEqual([r.post for r in search_posts('loud words')], [bold])
+        self.assertEqual(search_posts('   '), [])
+
+
+class ConditionalGetTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='cond', password='pw')
+        self.post = Post.objects.create(
+            title='Validated', body='body', author=self.user)
+        self.other = Post.objects.create(
+            title='Older', body='body', author=self.user,
+            date=timezone.now() - timedelta(days=1))
+
+    def _revalidate(self, url, response, **extra):
+        return self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag'],
+            HTTP_IF_MODIFIED_SINCE=response['Last-Modified'], **extra)
+
+    def test_unchanged_pages_answer_304_after_one_query(self):
+        for url in (reverse('home'), reverse('all_blogs'),
+                    reverse('show_post', args=[self.post.id])):
+            response = self.client.get(url)
+            self.assertIn('no-cache', response['Cache-Control'])
+            self.assertIn('Cookie', response['Vary'])
+            with self.assertNumQueries(1):
+                revalidated = self._revalidate(url, response)
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(revalidated.content, b'')
+
+    def test_edit_and_comments_change_the_validators(self):
+        url = reverse('show_post', args=[self.post.id])
+        response = self.client.get(url)
+        Comments.objects.create(
+            post=self.post, the_user=self.user, comment='news')
+        response = self._revalidate(url, response)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'news')
+
+        self.post.title = 'Retitled'
+        self.post.save(update_fields=['title'])
+        self.assertEqual(self._revalidate(url, response).status_code, 200)
+
+    def test_listing_changes_when_any_post_changes_or_goes(self):
+        url = reverse('all_blogs')
+        response = self.client.get(url)
+        other_page = self.client.get(
+            reverse('show_post', args=[self.post.id]))
+        self.other.delete()
+        self.assertEqual(self._revalidate(url, response).status_code, 200)
+        # deleting a different post leaves this post's page valid
+        self.assertEqual(self._revalidate(
+            reverse('show_post', args=[self.post.id]),
+            other_page).status_code, 304)
+
+    def test_etag_is_per_user(self):
+        url = reverse('show_post', args=[self.post.id])
+        response = self.client.get(url)
+        self.client.force_login(self.user)
+        self.assertEqual(self._revalidate(url, response).status_code, 200)
+
+    def test_pending_messages_force_a_full_page(self):
+        url = reverse('home')
+        response = self.client.get(url)
+        self.client.cookies['messages'] = 'pending'
+        revalidated = self._revalidate(url, response)
+        self.assertEqual(revalidated.status_code, 200)
+        self.assertFalse(revalidated.has_header('ETag'))
+
+
+@override_settings(ROOT_URLCONF='blog.tests', QUERY_BUDGET_STRICT=True)
+class AsyncViewTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='async', password='pw')
+        self.post = Post.objects.create(
+            title='Awaited', body='<p>async body</p>', author=self.user)
+        for i in range(16):
+            Post.objects.create(
+                title=f'Filler {i}', body='body', author=self.user,
+                date=timezone.now() - timedelta(days=i + 1))
+
+    async def test_read_pages_render_within_budget(self):
+        for url in (reverse('home'), reverse('all_blogs'),
+                    reverse('all_blogs') + '?page=2',
+                    reverse('show_post', args=[self.post.id]),
+                    reverse('about_page')):
+            self.assertTrue(asyncio.iscoroutinefunction(
+                resolve(url.split('?')[0]).func), url)
+            response = await self.async_client.get(url)
+            self.assertEqual(response.status_code, 200, url)
+        self.assertContains(response, 'About')
+
+        response = await self.async_client.get(
+            reverse('show_post', args=[self.post.id]))
+        self.assertContains(response, 'async body')
+        self.assertEqual(response['X-Page-Cache'], 'hit')
+
+    async def test_listing_walks_pages_by_cursor(self):
+        first = await self.async_client.get(reverse('all_blogs'))
+        self.assertContains(first, 'Awaited')
+        self.assertEqual(len(first.context['blogs']), 15)
+        second = await self.async_client.get(
+            reverse('all_blogs'),
+            {'cursor': first.context['blogs'].next_token})
+        self.assertNotContains(second, 'Awaited')
+        self.assertContains(second, 'Filler 15')
+
+    async def test_unchanged_post_answers_304(self):
+        url = reverse('show_post', args=[self.post.id])
+        response = await self.async_client.get(url)
+        revalidated = await self.async_client.get(
+            url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+        await Post.objects.filter(pk=self.post.pk).aupdate(
+            updated_at=timezone.now() + timedelta(seconds=1))
+        revalidated = await self.async_client.get(
+            url, headers={'If-None-Match': response['ETag']})
+        self.assertEqual(revalidated.status_code, 200)
+
+    async def test_comment_is_saved_and_redirects(self):
+        url = reverse('show_post', args=[self.post.id])
+        response = await self.async_client.post(url, {'comment': 'hi'})
+        self.assertRedirects(
+            response, reverse('login'), fetch_redirect_response=False)
+
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.post(url, {'comment': 'hi'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response['Location'].endswith('#comments'))
+        self.assertTrue(await Comments.objects.filter(
+            post=self.post, the_user=self.user, comment='hi').aexists())
+
+    async def test_budget_counts_async_queries(self):
+        @query_budget(1)
+        async def greedy(request):
+            await Post.objects.acount()
+            await Post.objects.acount()
+            return HttpResponse()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            await greedy(RequestFactory().get('/'))
+
+
+class DatabaseSettingsTests(TestCase):
+
+    def test_pool_mode_is_the_default(self):
+        settings = database_settings(
+            {'DB_NAME': 'blog', 'DB_POOL_MAX_SIZE': '8'})
+        self.assertEqual(settings['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(settings['CONN_MAX_AGE'], 0)
+        self.assertTrue(settings['CONN_HEALTH_CHECKS'])
+        self.assertEqual(settings['OPTIONS']['pool']['max_size'], 8)
+
+    def test_persistent_and_off_modes(self):
+        persistent = database_settings(
+            {'DB_POOL': 'persistent', 'DB_CONN_MAX_AGE': '120'})
+        self.assertEqual(persistent['CONN_MAX_AGE'], 120)
+        self.assertNotIn('pool', persistent['OPTIONS'])
+        off = database_settings({'DB_POOL': 'off'})
+        self.assertEqual(off['CONN_MAX_AGE'], 0)
+        with self.assertRaises(ValueError):
+            database_settings({'DB_POOL': 'bouncer'})
+
+    def test_pool_stats_report_checkouts_and_wait_time(self):
+        class Pool:
+            def get_stats(self):
+                return {'pool_size': 4, 'pool_available': 1, 'pool_min': 1,
+                        'pool_max': 4, 'requests_num': 8,
+                        'requests_wait_ms': 20, 'requests_errors': 1}
+
+        stats = _pool_stats(Pool())
+        self.assertEqual(stats['checkouts'], 8)
+        self.assertEqual(stats['wait_ms_avg'], 2.5)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['connections_lost'], 0)
+
+    def test_metrics_endpoint_is_for_admins(self):
+        url = reverse('db_pool_metrics')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.client.force_login(User.objects.create_user(
+            username='ops', password='pw', is_staff=True))
+        databases = self.client.get(url).json()['databases']
+        self.assertEqual(databases, pool_metrics())
+        self.assertEqual(databases['default']['mode'], 'off')
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRouterTests(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # 'replica' is a TEST MIRROR of default sharing its connection (and
+        # so the test transaction); the alias a row was read through shows
+        # where the router sent the query. Registered only around this
+        # class so no other run creates or checks a second database.
+        primary = connections['default'].settings_dict
+        connections.settings['replica'] = {
+            **primary, 'TEST': {**primary['TEST'], 'MIRROR': 'default'}}
+        connections['replica'] = connections['default']
+
+    @classmethod
+    def tearDownClass(cls):
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pw')
+        self.post = Post.objects.create(
+            title='Post', body='body', author=self.user)
+        self.url = reverse('show_post', args=[self.post.pk])
+
+    def _read_alias(self, cookies=None) -> tuple[str, bool]:
+        """The alias a request reads a post from, and read_from_primary."""
+        request = RequestFactory().get('/')
+        request.COOKIES.update(cookies or {})
+        middleware = ReplicaPinMiddleware(lambda request: HttpResponse(
+            Post.objects.get(pk=self.post.pk)._state.db))
+        response = middleware(request)
+        return response.content.decode(), request.read_from_primary
+
+    def test_request_reads_use_the_replica(self):
+        self.assertEqual(self._read_alias(), ('replica', False))
+        # outside a request everything stays on the primary
+        self.assertEqual(Post.objects.get(pk=self.post.pk)._state.db,
+                         'default')
+
+    def test_writer_is_pinned_to_the_primary(self):
+        self.client.force_login(self.user)
+        response = self.client.post(self.url, {'comment': 'mine'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(Comments.objects.filter(comment='mine').exists())
+        pin = response.cookies[PIN_COOKIE_NAME].value
+        self.assertEqual(self._read_alias({PIN_COOKIE_NAME: pin}),
+                         ('default', True))
+        self.assertContains(self.client.get(self.url), 'mine')
+
+    def test_forged_or_overlong_pins_are_ignored(self):
+        # unsigned: a client cannot opt out of the replicas and page cache
+        self.assertEqual(
+            self._read_alias({PIN_COOKIE_NAME: '9999999999'}),
+            ('replica', False))
+        signed = HttpResponse()
+        signed.set_signed_cookie(PIN_COOKIE_NAME, '9999999999')
+        self.assertEqual(
+            self._read_alias(
+                {PIN_COOKIE_NAME: signed.cookies[PIN_COOKIE_NAME].value}),
+            ('replica', False))
+
+    def test_no_pin_without_replicas(self):
+        self.client.force_login(self.user)
+        with override_settings(DATABASE_REPLICAS=[]):
+            response = self.client.post(self.url, {'comment': 'mine'})
+        self.assertNotIn(PIN_COOKIE_NAME, response.cookies)
+
+    def test_replicas_from_environment(self):
+        primary = database_settings({'DB_NAME': 'blog'})
+        replicas = replica_settings(
+            primary, {'DB_REPLICA_HOSTS': 'r1, r2:6432'})
+        self.assertEqual(list(replicas), ['replica1', 'replica2'])
+        self.assertEqual(replicas['replica1']['PORT'], '5432')
+        self.assertEqual(replicas['replica2']['HOST'], 'r2')
+        self.assertEqual(replicas['replica2']['PORT'], '6432')
+        self.assertEqual(replicas['replica2']['NAME'], 'blog')
+        self.assertIsNot(replicas['replica1']['OPTIONS'], primary['OPTIONS'])
+
+
+class SessionModeTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='sess', password='pw')
+        self.post = Post.objects.create(
+            title='Session', body='body', author=self.user)
+
+    def test_anonymous_visitors_get_no_session_row(self):
+        for url in (reverse('home'), reverse('all_blogs'),
+                    reverse('show_post', args=[self.post.id])):
+            self.client.get(url)
+        # the flash message goes out in a cookie, not the session
+        response = self.client.post(
+            reverse('show_post', args=[self.post.id]), {'comment': 'x'})
+        self.assertIn('messages', response.cookies)
+        self.assertEqual(Session.objects.count(), 0)
+
+    def test_signed_cookie_sessions_skip_the_session_query(self):
+        url = reverse('home')
+        counts = {}
+        for mode in ('db', 'signed_cookies'):
+            with override_settings(
+                    SESSION_ENGINE=f'django.contrib.sessions.backends.{mode}'):
+                client = self.client_class()
+                client.force_login(self.user)
+                client.get(url)
+                with CaptureQueriesContext(connection) as captured:
+                    response = client.get(url)
+                self.assertContains(response, 'Logout')
+                counts[mode] = len(captured)
+        self.assertEqual(counts['signed_cookies'], counts['db'] - 1)
+
+    def test_prune_sessions_deletes_only_expired_rows(self):
+        now = timezone.now()
+        for i in range(5):
+            Session.objects.create(
+                session_key=f'old{i}', session_data='',
+                expire_date=now - timedelta(days=1))
+        Session.objects.create(session_key='live', session_data='',
+                               expire_date=now + timedelta(days=1))
+        out = StringIO()
+        call_command('prune_sessions', batch_size=2, stdout=out)
+        self.assertIn('Pruned 5', out.getvalue())
+        self.assertEqual(
+            list(Session.objects.values_list('session_key', flat=True)),
+            ['live'])
+
+
+class RenderingTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='writer', password='pw')
+
+    def test_sanitize_keeps_formatting_and_drops_scripts(self):
+        html = sanitize_html(
+            '<p onclick="x()">Hi <b>there</b><script>alert(1)</script>'
+            '<a href="javascript:alert(1)">x</a>'
+            '<a href="https://example.com/?a=1&amp;b=2">ok</a>'
+            '<img src="/a.png" onerror="x()"><i>open')
+        self.assertEqual(
+            html,
+            '<p>Hi <b>there</b><a rel="nofollow noopener">x</a>'
+            '<a href="https://example.com/?a=1&amp;b=2" '
+            'rel="nofollow noopener">ok</a>'
+            '<img src="/a.png"><i>open</i></p>')
+
+    def test_save_computes_derived_columns(self):
+        body = '<p>' + ' '.join(['word'] * 450) + '</p><p>&lt;tail&gt;</p>'
+        post = Post.objects.create(title='Long', body=body, author=self.user)
+        post.refresh_from_db()
+        self.assertEqual(post.word_count, 451)
+        self.assertEqual(post.reading_time, 3)
+        self.assertTrue(post.excerpt.endswith('word…'))
+        self.assertIn('&lt;tail&gt;', post.body_html)
+
+        post.body = '<p>short</p>'
+        post.save(update_fields=['body'])
+        post.refresh_from_db()
+        self.assertEqual((post.excerpt, post.word_count), ('short', 1))
+
+    def test_post_page_renders_sanitized_html(self):
+        post = Post.objects.create(
+            title='XSS', author=self.user,
+            body='<p>safe</p><script>alert("boom")</script>')
+        response = self.client.get(reverse('show_post', args=[post.id]))
+        self.assertContains(response, '<p>safe</p>')
+        self.assertNotContains(response, 'boom')
+
+    def test_render_posts_backfills_in_a_process_pool(self):
+        Post.objects.bulk_create([
+            Post(title=str(i), body=f'<p>body {i}</p>', author=self.user)
+            for i in range(5)])
+        out = StringIO()
+        call_command('render_posts', batch_size=2, workers=2, stdout=out)
+        self.assertIn('Rendered 5 posts.', out.getvalue())
+        self.assertFalse(Post.objects.filter(body_html='').exists())
+        self.assertEqual(
+            Post.objects.get(title='3').excerpt, 'body 3')
+
+    def test_render_posts_does_not_redo_bodies_that_render_empty(self):
+        Post.objects.bulk_create([
+            Post(title='empty', body='<script>x()</script>', author=self.user)])
+        out = StringIO()
+        call_command('render_posts', workers=0, stdout=out)
+        self.assertIn('Rendered 1 posts.', out.getvalue())
+        self.assertEqual(Post.objects.get(title='empty').body_html, '')
+
+        out = StringIO()
+        call_command('render_posts', workers=0, stdout=out)
+        self.assertIn('Rendered 0 posts.', out.getvalue())
+
+
+class ImagePipelineTests(TestCase):
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.static_dir = Path(tmp.name) / 'static'
+        (self.static_dir / 'img').mkdir(parents=True)
+        Image.new('RGB', (1200, 600), 'teal').save(
+            self.static_dir / 'img' / 'hero.jpg')
+        settings = override_settings(
+            STATICFILES_DIRS=[str(self.static_dir)],
+            MEDIA_ROOT=str(Path(tmp.name) / 'media'),
+            IMAGE_DERIVATIVES_ROOT=str(self.static_dir / 'derived'),
+            IMAGE_DERIVATIVE_WIDTHS=(480, 960, 1920))
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_build_skips_unchanged_images(self):
+        out = StringIO()
+        call_command('build_images', workers=2, stdout=out)
+        self.assertIn('Built 1 images, 0 unchanged.', out.getvalue())
+        entry = load_manifest()['/static/img/hero.jpg']
+        # 1920 is wider than the source, so the original width is used
+        self.assertEqual(
+            [width for width, _name in entry['variants']['webp']],
+            [480, 960, 1200])
+        self.assertTrue(entry['placeholder'].startswith(
+            'data:image/jpeg;base64,'))
+        derived = sorted(p.name for p in (self.static_dir / 'derived').iterdir())
+        self.assertEqual(len(derived), 7)
+
+        out = StringIO()
+        call_command('build_images', workers=0, stdout=out)
+        self.assertIn('Built 0 images, 1 unchanged.', out.getvalue())
+
+        Image.new('RGB', (800, 400), 'navy').save(
+            self.static_dir / 'img' / 'hero.jpg')
+        call_command('build_images', workers=0, stdout=StringIO())
+        self.assertEqual(
+            len(list((self.static_dir / 'derived').iterdir())), 5)
+
+    def test_tags_emit_srcset_and_placeholder(self):
+        call_command('build_images', workers=0, stdout=StringIO())
+        template = Template(
+            '{% load images %}<header style="{% background_style url %}">'
+            '{% responsive_picture url priority=True %}</header>')
+        html = template.render(Context({'url': '/static/img/hero.jpg'}))
+        self.assertIn("background-image: url('data:image/jpeg;base64,", html)
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('.960.webp 960w', html)
+        self.assertIn('fetchpriority="high"', html)
+
+        html = template.render(Context({'url': 'https://cdn.test/x.jpg'}))
+        self.assertEqual(
+            html, '<header style="background-image: '
+                  'url(\'https://cdn.test/x.jpg\')"></header>')
+
+    def test_static_names_find_derivatives_behind_hashed_urls(self):
+        call_command('build_images', workers=0, stdout=StringIO())
+        root = self.static_dir.parent / 'collected'
+        with override_settings(
+                DEBUG=False, STATIC_ROOT=str(root),
+                STATICFILES_FINDERS=[
+                    'django.contrib.staticfiles.finders.FileSystemFinder'],
+                STORAGES={
+                    'default': {'BACKEND':
+                                'django.core.files.storage.FileSystemStorage'},
+                    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.'
+                                    'storage.ManifestStaticFilesStorage'},
+                }):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            html = Template(
+                '{% load images %}'
+                '<header style="{% background_style \'img/hero.jpg\' %}">'
+                '{% responsive_picture \'img/hero.jpg\' %}</header>'
+            ).render(Context())
+            self.assertNotEqual(staticfiles_storage.url('img/hero.jpg'),
+                                '/static/img/hero.jpg')
+        self.assertIn("background-image: url('data:image/jpeg;base64,", html)
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('.webp 960w', html)
+
+
+class StaticFilesTests(TestCase):
+
+    CSS = b'body { color: #212529; }\n' * 200
+
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        source = Path(tmp.name) / 'src'
+        (source / 'css').mkdir(parents=True)
+        (source / 'css' / 'site.css').write_bytes(self.CSS)
+        self.root = Path(tmp.name) / 'out'
+        with override_settings(
+                STATICFILES_DIRS=[str(source)], STATIC_ROOT=str(self.root),
+                STATICFILES_FINDERS=[
+                    'django.contrib.staticfiles.finders.FileSystemFinder'],
+                STORAGES={
+                    'default': {'BACKEND':
+                                'django.core.files.storage.FileSystemStorage'},
+                    'staticfiles': {'BACKEND': 'config.static.'
+                                    'CompressedManifestStaticFilesStorage'},
+                }):
+            call_command('collectstatic', interactive=False, verbosity=0)
+            self.hashed = staticfiles_storage.stored_name('css/site.css')
+        self.static_files = StaticFiles(str(self.root), '/static/')
+
+    def _get(self, path, **environ):
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/html')])
+            return [b'django']
+
+        captured = {}
+
+        def start_response(status, headers):
+            captured['status'] = status
+            captured['headers'] = dict(headers)
+
+        handler = StaticFilesHandler(app, self.static_files)
+        body = b''.join(handler(
+            {'PATH_INFO': path, 'REQUEST_METHOD': 'GET', **environ},
+            start_response))
+        return captured['status'], captured['headers'], body
+
+    def test_collectstatic_writes_compressed_siblings(self):
+        hashed = self.root / self.hashed
+        self.assertNotEqual(self.hashed, 'css/site.css')
+        self.assertEqual(gzip.decompress(
+            (self.root / (self.hashed + '.gz')).read_bytes()), self.CSS)
+        self.assertTrue(hashed.with_name(hashed.name + '.br').exists())
+
+    def test_hashed_files_negotiate_encoding_and_are_immutable(self):
+        status, headers, body = self._get(
+            f'/static/{self.hashed}', HTTP_ACCEPT_ENCODING='gzip, br;q=0')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertIn('immutable', headers['Cache-Control'])
+        self.assertEqual(int(headers['Content-Length']), len(body))
+        self.assertEqual(gzip.decompress(body), self.CSS)
+
+        status, headers, body = self._get(
+            f'/static/{self.hashed}', HTTP_IF_NONE_MATCH=headers['ETag'],
+            HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual((status, body), ('304 Not Modified', b''))
+
+        status, headers, body = self._get('/static/css/site.css')
+        self.assertNotIn('Content-Encoding', headers)
+        self.assertNotIn('immutable', headers['Cache-Control'])
+        self.assertEqual(body, self.CSS)
+
+    def test_other_paths_reach_django(self):
+        self.assertEqual(self._get('/post/1/')[2], b'django')
+        self.assertEqual(self._get('/static/missing.css')[2], b'django')
+
+    def test_asgi_handler_streams_from_a_memory_map(self):
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        handler = ASGIStaticFilesHandler(None, self.static_files)
+        asyncio.run(handler(
+            {'type': 'http', 'method': 'GET',
+             'path': f'/static/{self.hashed}',
+             'headers': [(b'accept-encoding', b'br')]}, None, send))
+        headers = dict(messages[0]['headers'])
+        self.assertEqual(headers[b'content-encoding'], b'br')
+        body = b''.join(m['body'] for m in messages[1:])
+        self.assertEqual(len(body), int(headers[b'content-length']))
+
+
+class CssBuildTests(TestCase):
+
+    CSS = """
+    /* theme */
+    .used, .unused { color: red ; }
+    a.used:hover > span::before { content: " : " }
+    #nav .gone { margin : 0 }
+    @media (min-width: 768px) {
+        .unused { display: none }
+        .used { padding: 1px  2px !important; }
+    }
+    @keyframes spin { from { transform: rotate(0) } to { opacity: 1 } }
+    @keyframes fade { from { opacity: 0 } }
+    .spinner { animation: spin 1s }
+    """
+
+    def test_prunes_unused_rules_and_minifies(self):
+        usage = Usage()
+        usage.add('<a class="used spinner"><span>x</span></a><div id="nav">')
+        self.assertEqual(
+            build(self.CSS, usage),
+            '.used{color:red}a.used:hover>span::before{content:" : "}'
+            '@media (min-width:768px){.used{padding:1px 2px!important}}'
+            '@keyframes spin{from{transform:rotate(0)}to{opacity:1}}'
+            '.spinner{animation:spin 1s}')
+
+    def test_base_inlines_critical_css_once_built(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        with override_settings(CSS_BUILD_ROOT=tmp.name):
+            response = self.client.get(reverse('about_page'))
+            self.assertContains(response, 'css/style.css" rel="stylesheet"')
+
+            out = StringIO()
+            call_command('build_css', stdout=out)
+            self.assertRegex(out.getvalue(), r'style\.min\.css +[\d,]+ B')
+            response = self.client.get(reverse('about_page'))
+        self.assertContains(response, '<style>')
+        self.assertContains(response, 'rel="preload" href="/static/'
+                                      'css/build/style.min.css" as="style"')
+        self.assertNotContains(response, 'css/style.css')
+
+
+class CommentPaginationTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='talker', password='pw')
+        self.post = Post.objects.create(
+            title='Popular', body='body', author=self.user)
+        start = timezone.now() - timedelta(hours=1)
+        Comments.objects.bulk_create([
+            Comments(post=self.post, the_user=self.user,
+                     comment=f'comment {i}', date=start + timedelta(
+                         seconds=i // 3))
+            for i in range(45)
+        ])
+        self.newest_first = list(Comments.objects.filter(
+            post=self.post).order_by('-date', '-id').values_list(
+                'id', flat=True))
+
+    def test_post_page_renders_first_page_only(self):
+        response = self.client.get(
+            reverse('show_post', args=[self.post.id]))
+        page = response.context['comments']
+        self.assertEqual([c.id for c in page], self.newest_first[:20])
+        self.assertContains(response, 'load-more-comments')
+        # only the page is newest first; the model keeps oldest first
+        dates = list(self.post.comments.values_list('date', flat=True))
+        self.assertEqual(dates, sorted(dates))
+
+    def test_load_more_walks_remaining_comments(self):
+        first = self.client.get(
+            reverse('show_post', args=[self.post.id])).context['comments']
+        seen, cursor = [c.id for c in first], first.next_token
+        while cursor:
+            data = self.client.get(
+                reverse('post_comments', args=[self.post.id]),
+                {'cursor': cursor}).json()
+            seen.extend(c['id'] for c in data['comments'])
+            self.assertEqual(data['html'].count('<li'), len(data['comments']))
+            cursor = data['next_cursor']
+        self.assertEqual(seen, self.newest_first)
+
+    def test_comment_post_redirects(self):
+        self.client.force_login(self.user)
+        url = reverse('show_post', args=[self.post.id])
+        response = self.client.post(url, {'comment': 'new one'})
+        self.assertRedirects(response, f'{url}#comments',
+                             fetch_redirect_response=False)
+        response = self.client.get(url)
+        self.assertEqual(response.context['comments'].object_list[0].comment,
+                         'new one')
+        self.assertContains(response, 'Comment added!')
+
+    def test_invalid_comment_rerenders_form_errors(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse('show_post', args=[self.post.id]), {'comment': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'This field is required.')
+
+
+class CommentStatsTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='stats', password='pw')
+        self.post = Post.objects.create(
+            title='Counted', body='body', author=self.user)
+
+    def test_counters_follow_comment_create_and_delete(self):
+        first = Comments.objects.create(
+            post=self.post, the_user=self.user, comment='a',
+            date=timezone.now() - timedelta(hours=1))
+        second = Comments.objects.create(
+            post=self.post, the_user=self.user, comment='b')
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(self.post.last_commented_at, second.date)
+
+        second.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.last_commented_at, first.date)
+
+    def _delete_post_queries(self, comments: int) -> list[str]:
+        post = Post.objects.create(title='Busy', body='x', author=self.user)
+        Comments.objects.bulk_create([
+            Comments(post=post, comment=str(i)) for i in range(comments)])
+        with CaptureQueriesContext(connection) as captured:
+            post.delete()
+        self.assertFalse(Comments.objects.filter(post_id=post.pk).exists())
+        return [q['sql'] for q in captured.captured_queries]
+
+    def test_deleting_a_post_skips_per_comment_upkeep(self):
+        few = self._delete_post_queries(3)
+        many = self._delete_post_queries(60)
+        # the cascade neither recounts the doomed post once per comment
+        # nor grows with the thread
+        self.assertEqual(len(many), len(few))
+        self.assertFalse([sql for sql in many
+                          if sql.startswith('UPDATE "blog_post"')])
+
+    def test_deleting_an_author_cascades_without_recounting(self):
+        Comments.objects.bulk_create([
+            Comments(post=self.post, comment=str(i)) for i in range(5)])
+        with CaptureQueriesContext(connection) as captured:
+            self.user.delete()
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse([q for q in captured.captured_queries
+                          if q['sql'].startswith('UPDATE "blog_post"')])
+
+    def test_post_save_does_not_overwrite_counters(self):
+        stale = Post.objects.get(pk=self.post.pk)
+        Comments.objects.create(post=self.post, comment='c')
+        stale.title = 'Edited'
+        stale.save()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.title, 'Edited')
+        self.assertEqual(self.post.comment_count, 1)
+
+    def test_saving_a_partly_loaded_post_leaves_deferred_fields(self):
+        partial = Post.objects.only('title', 'date').get(pk=self.post.pk)
+        partial.title = 'Partial'
+        with CaptureQueriesContext(connection) as captured:
+            partial.save()
+        # no refresh of the deferred columns before the UPDATE
+        self.assertFalse([q for q in captured.captured_queries
+                          if '"blog_post"."body"' in q['sql']])
+        self.post.refresh_from_db()
+        self.assertEqual(
+            (self.post.title, self.post.body, self.post.body_html),
+            ('Partial', 'body', 'body'))
+
+    def test_reconcile_fixes_drift(self):
+        Comments.objects.bulk_create([
+            Comments(post=self.post, comment=str(i)) for i in range(3)])
+        Post.objects.filter(pk=self.post.pk).update(comment_count=42)
+        out = StringIO()
+        call_command('reconcile_post_stats', batch_size=1, stdout=out)
+        self.assertIn('fixed 1', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 3)
+        self.assertIsNotNone(self.post.last_commented_at)
+
+
+class ApiTests(TestCase):
+
+    def setUp(self):
+        authors = User.objects.bulk_create(
+            [User(username=f'api{i}') for i in range(5)])
+        start = timezone.now()
+        Post.objects.bulk_create([
+            Post(title=f'API post {i}', body='x' * 1000,
+                 author=authors[i % 5], date=start - timedelta(minutes=i))
+            for i in range(30)
+        ])
+        self.post = Post.objects.first()
+        Comments.objects.bulk_create([
+            Comments(post=self.post, the_user=authors[i % 5],
+                     comment=f'api comment {i}')
+            for i in range(12)
+        ])
+
+    def test_list_walks_cursor_pages(self):
+        url = reverse('api-post-list') + '?page_size=10'
+        titles = []
+        while url:
+            data = self.client.get(url).json()
+            titles.extend(post['title'] for post in data['results'])
+            url = data['next']
+        self.assertEqual(titles, [f'API post {i}' for i in range(30)])
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        for size in (5, 50):
+            with self.assertNumQueries(1):
+                self.client.get(
+                    reverse('api-post-list'), {'page_size': size})
+        with self.assertNumQueries(1):
+            self.client.get(
+                reverse('api-post-comments', args=[self.post.id]))
+
+    def test_sparse_fields_skip_body(self):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(
+                reverse('api-post-list'), {'fields': 'id,title,author'}
+            ).json()
+        self.assertEqual(set(data['results'][0]), {'id', 'title', 'author'})
+        # body only feeds the ETag fingerprint, it is never a result column
+        self.assertNotIn('"blog_post"."body",',
+                         ctx.captured_queries[0]['sql'])
+
+    def test_sparse_fields_page_is_one_query_without_joins(self):
+        url = reverse('api-post-list')
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(
+                url, {'fields': 'title', 'page_size': 10}).json()
+        # the cursor key columns are loaded with the page, never refetched
+        self.assertEqual(len(ctx), 1)
+        self.assertNotIn('users_user', ctx.captured_queries[0]['sql'])
+        with self.assertNumQueries(1):
+            self.client.get(data['next'])
+
+    def test_etag_returns_304_until_resource_changes(self):
+        url = reverse('api-post-detail', args=[self.post.id])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertEqual(response.json()['comment_count'], 0)
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.post.body = 'edited'
+        self.post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_differs_per_field_selection(self):
+        url = reverse('api-post-list')
+        full = self.client.get(url)['ETag']
+        sparse = self.client.get(url, {'fields': 'title'})['ETag']
+        self.assertNotEqual(full, sparse)
+        response = self.client.get(
+            url, {'fields': 'title'}, HTTP_IF_NONE_MATCH=sparse)
+        self.assertEqual(response.status_code, 304)
+
+    def test_body_is_the_sanitized_html(self):
+        post = Post.objects.create(
+            title='Scripted', author=self.post.author,
+            body='<p><strong>Hi</strong></p><script>alert(1)</script>')
+        data = self.client.get(
+            reverse('api-post-detail', args=[post.id])).json()
+        self.assertIn('<strong>Hi</strong>', data['body'])
+        self.assertNotIn('script', data['body'])
+        listed = self.client.get(
+            reverse('api-post-list'), {'fields': 'id,body'}).json()
+        self.assertNotIn('<script>', json.dumps(listed))
+
+
+class AdminChangelistTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='root', email='root@example.com', password='pw')
+        self.client.force_login(self.admin)
+
+    def _add_rows(self, count):
+        start = User.objects.count()
+        authors = User.objects.bulk_create([
+            User(username=f'staff{start + i}', email=f's{start + i}@x.com')
+            for i in range(count)])
+        posts = Post.objects.bulk_create([
+            Post(title=f'Admin post {start + i}', body='x' * 1000,
+                 author=authors[i]) for i in range(count)])
+        Comments.objects.bulk_create([
+            Comments(post=posts[i], the_user=authors[i], comment='c')
+            for i in range(count)])
+
+    def _changelist_queries(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return captured
+
+    def test_query_count_does_not_grow_with_rows(self):
+        urls = [reverse(f'admin:{name}_changelist')
+                for name in ('blog_post', 'blog_comments', 'users_user')]
+        self._add_rows(2)
+        few = {url: len(self._changelist_queries(url)) for url in urls}
+        self._add_rows(40)
+        for url in urls:
+            captured = self._changelist_queries(url)
+            self.assertEqual(len(captured), few[url], url)
+            self.assertLessEqual(len(captured), 8, url)
+            # the page count comes from the estimate, not a full COUNT(*)
+            # next to the filtered one
+            counts = [q for q in captured.captured_queries
+                      if 'COUNT(*)' in q['sql']]
+            self.assertLessEqual(len(counts), 1, url)
+
+    def test_comment_change_page_joins_user_and_post(self):
+        self._add_rows(1)
+        comment = Comments.objects.get()
+        url = reverse('admin:blog_comments_change', args=[comment.pk])
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(url)
+        self.assertContains(response, f'Comment by {comment.the_user} on '
+                                      f'{comment.post.title}')
+        # the object is read with both relations, not one lazy load each
+        self.assertFalse([q for q in captured.captured_queries
+                          if 'FROM "blog_post"' in q['sql']
+                          and 'blog_comments' not in q['sql']
+                          and 'LIMIT 21' in q['sql']])
+
+    def test_changelists_skip_rendered_bodies(self):
+        self._add_rows(3)
+        for name in ('blog_post', 'blog_comments'):
+            captured = self._changelist_queries(
+                reverse(f'admin:{name}_changelist'))
+            sql = ' '.join(q['sql'] for q in captured.captured_queries)
+            self.assertNotIn('"blog_post"."body_html"', sql, name)
+
+    def test_foreign_keys_use_autocomplete(self):
+        self._add_rows(3)
+        comment = Comments.objects.first()
+        for url in (reverse('admin:blog_comments_change', args=[comment.pk]),
+                    reverse('admin:blog_post_add')):
+            response = self.client.get(url)
+            self.assertContains(response, 'admin-autocomplete')
+            # only the selected user is rendered, not every user as <option>
+            self.assertNotContains(response, 'staff2</option>')
+
+
+class AdminActionTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='root', email='root@example.com', password='pw')
+        self.client.force_login(self.admin)
+        self.users = User.objects.bulk_create([
+            User(username=f'member{i}', email=f'm{i}@example.com')
+            for i in range(2)])
+
+    def _act(self, model, action, pks):
+        return self.client.post(
+            reverse(f'admin:{model}_changelist'),
+            {'action': action, '_selected_action': [str(pk) for pk in pks]})
+
+    def test_jsonl_export_includes_related_columns(self):
+        post = Post.objects.create(
+            title='Exported, "quoted"', body='body', author=self.users[0])
+        Comments.objects.create(post=post, the_user=self.users[1],
+                                comment='hi')
+        response = self._act('blog_post', 'export_jsonl', [post.pk])
+        rows = [json.loads(line) for line in
+                b''.join(response.streaming_content).splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['title'], 'Exported, "quoted"')
+        self.assertEqual(rows[0]['author__username'], 'member0')
+
+        response = self._act('blog_comments', 'export_csv',
+                             Comments.objects.values_list('pk', flat=True))
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('"Exported, ""quoted""",member1,hi', content)
+
+
+class SeedAndBenchmarkTests(TestCase):
+
+    def test_seed_blog_writes_consistent_rows(self):
+        out = StringIO()
+        call_command('seed_blog', users=5, posts=30, comments=200, seed=1,
+                     batch_size=16, stdout=out)
+        self.assertIn('Created 5 users, 30 posts and 200 comments',
+                      out.getvalue())
+        self.assertEqual(Profile.objects.count(), 5)
+        self.assertFalse(Post.objects.filter(body_html=''))
+        # the counters match what the comment signals would have kept
+        out = StringIO()
+        call_command('reconcile_post_stats', dry_run=True, stdout=out)
+        self.assertIn('would fix 0', out.getvalue())
+        # a few posts carry most of the comments
+        counts = sorted(Post.objects.values_list('comment_count', flat=True))
+        self.assertGreater(counts[-1], 200 / 30 * 3)
+        self.assertTrue(self.client.login(
+            username='seed0', password=SEED_PASSWORD))
+
+    def test_seed_numbers_users_after_the_highest_seed_name(self):
+        call_command('seed_blog', users=3, posts=0, comments=0,
+                     stdout=StringIO())
+        User.objects.filter(username='seed0').delete()
+        call_command('seed_blog', users=2, posts=0, comments=0,
+                     stdout=StringIO())
+        self.assertEqual(
+            sorted(User.objects.values_list('username', flat=True)),
+            ['seed1', 'seed2', 'seed3', 'seed4'])
+
+    def test_bench_site_records_and_compares_a_baseline(self):
+        baseline = Path(tempfile.mkdtemp()) / 'baseline.json'
+        options = {'users': 3, 'posts': 20, 'comments': 40, 'requests': 2,
+                   'baseline': str(baseline), 'stdout': StringIO()}
+        # configured replicas are left out: they cannot see the seed rows
+        with override_settings(DATABASE_REPLICAS=['replica1']):
+            call_command('bench_site', update_baseline=True, **options)
+        recorded = json.loads(baseline.read_text())
+        self.assertEqual(
+            set(recorded['scenarios']),
+            {'home', 'all_blogs_first', 'all_blogs_deep', 'all_blogs_cursor',
+             'show_post_small', 'show_post_huge', 'add_post', 'login'})
+        self.assertEqual(recorded['scenarios']['home']['queries'], 2)
+        # the seeded rows were rolled back
+        self.assertFalse(Post.objects.exists())
+
+        slower = json.loads(baseline.read_text())
+        slower['scenarios']['home'].update(p50_ms=1000.0, queries=9)
+        faster = json.loads(baseline.read_text())
+        faster['scenarios']['home'].update(p50_ms=0.001, queries=1)
+        self.assertEqual(compare(slower, recorded, 0.25), [
+            'home: 9 queries per request, baseline 2',
+            f'home: p50_ms 1000.00, baseline '
+            f'{recorded["scenarios"]["home"]["p50_ms"]:.2f} (+'
+            f'{1000 / recorded["scenarios"]["home"]["p50_ms"] - 1:.0%})'])
+        self.assertEqual(compare(recorded, slower, 0.25), [])
+        self.assertEqual(len(compare(recorded, faster, 0.25)), 2)
+
+        options['comments'] = 41
+        with self.assertRaisesMessage(CommandError, 'rerun with the same'):
+            call_command('bench_site', **options)
+
+
+class ImportPostsTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='writer')
+        User.objects.create_user(username='reader')
+        self.dir = Path(tempfile.mkdtemp())
+
+    def _jsonl(self, name, lines):
+        path = self.dir / name
+        opener = gzip.open if name.endswith('.gz') else open
+        with opener(path, 'wt', encoding='utf-8') as fh:
+            fh.writelines(line + '\n' for line in lines)
+        return path
+
+    def _post(self, i, **fields):
+        return json.dumps({
+            'title': f'Imported {i}', 'body': f'<p>Body {i}</p>',
+            'author': 'writer', 'date': f'2024-01-{i + 1:02d}T10:00:00Z',
+            **fields})
+
+    def test_imports_posts_and_comments_in_batches(self):
+        lines = [self._post(i) for i in range(5)]
+        lines[1] = self._post(1, comments=[
+            {'user': 'reader', 'comment': 'first',
+             'date': '2024-02-01T00:00:00Z'},
+            {'user': 'ghost', 'comment': 'second'}])
+        lines.append(json.dumps({'title': 'Lost', 'body': 'x',
+                                 'author__username': 'nobody'}))
+        path = self._jsonl('posts.jsonl.gz', lines)
+        cache.set(POST_COUNT_CACHE_KEY, 0)
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as captured:
+            call_command('import_posts', str(path), batch_size=2, stdout=out)
+        self.assertIn('Imported 5 posts and 2 comments in', out.getvalue())
+        self.assertIn('Skipped 1 posts by unknown authors (nobody)',
+                      out.getvalue())
+        # one lookup for the first batch's names, none for the second
+        # (all known by then) and one for 'nobody' in the third
+        lookups = [q for q in captured.captured_queries
+                   if q['sql'].startswith('SELECT')
+                   and 'FROM "users_user"' in q['sql']]
+        self.assertEqual(len(lookups), 2)
+        self.assertIsNone(cache.get(POST_COUNT_CACHE_KEY))
+
+        post = Post.objects.get(title='Imported 1')
+        self.assertEqual(post.body_html, '<p>Body 1</p>')
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(post.last_commented_at.isoformat(),
+                         '2024-02-01T00:00:00+00:00')
+        self.assertEqual(
+            sorted(str(c.the_user) for c in post.comments.all()),
+            ['None', 'reader'])
+        self.assertFalse(path.with_name(path.name + '.checkpoint').exists())
+
+    def test_resumes_after_a_bad_record(self):
+        lines = [self._post(i) for i in range(4)] + ['{not json']
+        lines += [self._post(i) for i in range(4, 6)]
+        path = self._jsonl('posts.jsonl', lines)
+        with self.assertRaisesMessage(CommandError, 'posts.jsonl:5'):
+            call_command('import_posts', str(path), batch_size=2,
+                         stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 4)
+        checkpoint = path.with_name('posts.jsonl.checkpoint')
+        self.assertEqual(json.loads(checkpoint.read_text())['records'], 4)
+        with self.assertRaisesMessage(CommandError, '--resume'):
+            call_command('import_posts', str(path), stdout=StringIO())
+
+        lines[4] = self._post(9)
+        self._jsonl('posts.jsonl', lines)
+        call_command('import_posts', str(path), resume=True,
+                     stdout=StringIO())
+        self.assertEqual(Post.objects.count(), 7)
+        self.assertEqual(Post.objects.filter(title='Imported 0').count(), 1)
+
+    def test_markdown_directory_with_front_matter(self):
+        (self.dir / 'b-second.md').write_text(
+            '---\ntitle: "Second: part two"\nauthor: newcomer\n'
+            'date: 2024-03-01 08:00\n---\n# Heading\n\nSome *text*\n'
+            'across lines.\n')
+        (self.dir / 'a-first.md').write_text('Just a body.\n')
+        out = StringIO()
+        call_command('import_posts', str(self.dir), create_authors=True,
+                     stdout=out)
+        # a-first.md has no author
+        self.assertIn('Imported 1 posts', out.getvalue())
+        post = Post.objects.get()
+        self.assertEqual(post.title, 'Second: part two')
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertIn('<h1>Heading</h1>', post.body_html)
+        self.assertIn('across lines.', post.excerpt)
+
+
+class SiteBackupTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.dir = Path(tempfile.mkdtemp())
+        self.author = User.objects.create_user(
+            username='writer', email='w@example.com', password='pw-12345')
+        self.author.profile.bio = 'Writes things'
+        self.author.profile.save()
+        self.reader = User.objects.create_user(username='reader')
+        self.post = Post.objects.create(
+            title='Kept', body='<p>Body</p>', author=self.author)
+        Comments.objects.create(
+            post=self.post, the_user=self.reader, comment='Nice')
+        Comments.objects.create(post=self.post, comment='Anonymous')
+
+    def _records(self, data):
+        return [json.loads(line) for line in
+                gzip.decompress(data).decode().splitlines()]
+
+    def test_export_and_restore_round_trip(self):
+        media = self.dir / 'media'
+        (media / 'posts').mkdir(parents=True)
+        (media / 'posts' / 'a.webp').write_bytes(b'image')
+        path = self.dir / 'backup.jsonl.gz'
+        out = StringIO()
+        with override_settings(MEDIA_ROOT=media):
+            call_command('export_site', str(path), stdout=out)
+        self.assertIn('2 users, 1 posts, 2 comments, 1 media files',
+                      out.getvalue())
+        records = self._records(path.read_bytes())
+        self.assertEqual([r['model'] for r in records],
+                         ['meta', 'user', 'user', 'post', 'comment',
+                          'comment', 'media'])
+        self.assertEqual(records[-1]['path'], 'posts/a.webp')
+        self.assertEqual(records[-1]['size'], 5)
+
+        post_id = self.post.pk
+        User.objects.all().delete()
+        call_command('import_posts', str(path), batch_size=3,
+                     stdout=StringIO())
+        writer = User.objects.get(username='writer')
+        self.assertTrue(writer.check_password('pw-12345'))
+        self.assertEqual(writer.profile.bio, 'Writes things')
+        post = Post.objects.get()
+        self.assertEqual((post.pk, post.author, post.comment_count),
+                         (post_id, writer, 2))
+        self.assertEqual(post.body_html, '<p>Body</p>')
+        self.assertEqual(
+            sorted(str(c.the_user) for c in post.comments.all()),
+            ['None', 'reader'])
+        # new rows are numbered after the restored ones
+        self.assertGreater(Post.objects.create(
+            title='New', body='x', author=writer).pk, post_id)
+
+    def _cut_off(self):
+        """A since time that everything written so far predates."""
+        old = timezone.now() - timedelta(days=1)
+        for model in (User, Profile, Post, Comments):
+            model.objects.update(updated_at=old)
+        User.objects.update(last_login=None)
+        return timezone.now() - timedelta(minutes=1)
+
+    def _export_since(self, since):
+        path = self.dir / 'since.jsonl.gz'
+        call_command('export_site', str(path), since=since.isoformat(),
+                     stdout=StringIO())
+        return path
+
+    def test_incremental_export_picks_up_edits(self):
+        since = self._cut_off()
+        profile = self.reader.profile
+        profile.bio = 'Edited'
+        profile.save()
+        comment = Comments.objects.get(comment='Nice')
+        comment.comment = 'Nicer'
+        comment.save()
+        self.post.title = 'Renamed'
+        self.post.save()
+        path = self._export_since(since)
+
+        records = self._records(path.read_bytes())
+        # the encoder keeps milliseconds
+        self.assertEqual(records[0]['since'][:23], since.isoformat()[:23])
+        self.assertEqual(
+            [(r['model'], r.get('username') or r.get('title')
+              or r.get('comment')) for r in records[1:]],
+            [('user', 'reader'), ('post', 'Renamed'), ('comment', 'Nicer')])
+
+        Profile.objects.update(bio='')
+        Post.objects.update(title='Kept')
+        Comments.objects.filter(pk=comment.pk).update(comment='Nice')
+        call_command('import_posts', str(path), stdout=StringIO())
+        self.assertEqual(Profile.objects.get(user=self.reader).bio, 'Edited')
+        self.assertEqual(Post.objects.get(pk=self.post.pk).title, 'Renamed')
+        self.assertEqual(Comments.objects.get(pk=comment.pk).comment, 'Nicer')
+        self.assertEqual(Post.objects.count(), 1)
+        self.assertEqual(Comments.objects.count(), 2)
+
+    def test_role_changes_from_admin_actions_are_exported(self):
+        since = self._cut_off()
+        admin = User.objects.create_superuser(username='root')
+        self.client.force_login(admin)
+        self.client.post(reverse('admin:users_user_changelist'), {
+            'action': 'make_admin', '_selected_action': [self.reader.pk]})
+        records = self._records(self._export_since(since).read_bytes())
+        users = {r['username']: r for r in records if r['model'] == 'user'}
+        self.assertEqual(users['reader']['role'], 'admin')
+        self.assertNotIn('writer', users)
+
+    def test_incremental_restore_needs_the_parent_posts(self):
+        since = self._cut_off()
+        comment = Comments.objects.get(comment='Nice')
+        comment.comment = 'Nicer'
+        comment.save()
+        path = self._export_since(since)
+        self.post.delete()
+        with self.assertRaisesMessage(CommandError,
+                                      'restore the full backup'):
+            call_command('import_posts', str(path), stdout=StringIO())
+        self.assertFalse(Comments.objects.exists())
+
+    def test_resume_still_skips_comments_on_skipped_posts(self):
+        path = self.dir / 'backup.jsonl.gz'
+        call_command('export_site', str(path), stdout=StringIO())
+        records = self._records(path.read_bytes())
+        post = next(r for r in records if r['model'] == 'post')
+        comment = next(r for r in records if r['model'] == 'comment')
+        lines = [json.dumps({**post, 'id': 999, 'author': 'ghost'}),
+                 '{not json',
+                 json.dumps({**comment, 'id': 999, 'post': 999})]
+        source = self.dir / 'ghost.jsonl'
+        source.write_text('\n'.join(lines) + '\n')
+        with self.assertRaisesMessage(CommandError, '--resume'):
+            call_command('import_posts', str(source), batch_size=1,
+                         stdout=StringIO())
+
+        lines[1] = json.dumps({**comment, 'id': 998, 'comment': 'Fixed'})
+        source.write_text('\n'.join(lines) + '\n')
+        out = StringIO()
+        call_command('import_posts', str(source), batch_size=1, resume=True,
+                     stdout=out)
+        self.assertIn('Imported 0 posts and 1 comments', out.getvalue())
+        self.assertFalse(Post.objects.filter(pk=999).exists())
+        self.assertEqual(
+            list(Comments.objects.filter(pk__gt=900).values_list(
+                'pk', flat=True)), [998])
+
+    def test_endpoint_is_for_admins_and_streams_gzip(self):
+        url = reverse('site_backup')
+        self.client.force_login(self.author)
+        self.assertEqual(self.client.get(url).status_code, 302)
+
+        staff = User.objects.create_user(username='staff', is_staff=True)
+        self.client.force_login(staff)
+        self.assertEqual(
+            self.client.get(url, {'since': 'yesterday'}).status_code, 400)
+        response = self.client.get(url)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.jsonl.gz', response['Content-Disposition'])
+        users = [r for r in self._records(b''.join(response.streaming_content))
+                 if r['model'] == 'user']
+        self.assertEqual(len(users), 3)
+        self.assertNotIn('password', users[0])
+
+        admin = User.objects.create_superuser(username='root')
+        self.client.force_login(admin)
+        users = [r for r in self._records(
+                     b''.join(self.client.get(url).streaming_content))
+                 if r['model'] == 'user']
+        self.assertTrue(users[0]['password'].startswith('pbkdf2_'))
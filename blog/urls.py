@@ -1,15 +1,32 @@
-from django.urls import path
+from django.conf import settings
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
 
-from . import views
+from . import api, async_views, views
+
+# the read paths have async twins for the ASGI deployment profile
+pages = async_views if settings.ASYNC_VIEWS else views
+
+api_router = SimpleRouter()
+api_router.register('posts', api.PostViewSet, basename='api-post')
+api_router.register('comments', api.CommentViewSet, basename='api-comment')
 
 # Only expose blog-related views here. Registration/login/logout live in users.urls.
 urlpatterns = [
-    path('', views.home, name='home'),
-    path('all-blogs/', views.all_blogs, name='all_blogs'),
-    path('post/<int:post_id>/', views.show_post, name='show_post'),
+    path('', pages.home, name='home'),
+    path('all-blogs/', pages.all_blogs, name='all_blogs'),
+    path('post/<int:post_id>/', pages.show_post, name='show_post'),
+    path('post/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('add-post/', views.add_post, name='add_post'),
     path('edit-post/<int:post_id>/', views.edit_post, name='edit_post'),
     path('delete-post/<int:post_id>/', views.delete_post, name='delete_post'),
-    path('about/', views.about_page, name='about_page'),
+    path('search/', views.search, name='search'),
+    path('api/search/', views.search_api, name='search_api'),
+    path('api/v1/', include(api_router.urls)),
+    path('api/v1/posts/<int:post_pk>/comments/',
+         api.CommentViewSet.as_view({'get': 'list'}),
+         name='api-post-comments'),
+    path('about/', pages.about_page, name='about_page'),
     path('contact/', views.contact_page, name='contact_page'),
 ]
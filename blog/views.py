@@ -1,25 +1,41 @@
-import smtplib
-from email.message import EmailMessage
 from os import environ
 
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.core.mail import EmailMessage
 from django.db import IntegrityError
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.template.loader import render_to_string
 from django.utils import timezone
 from users.decorators import admins_only
+from users.throttling import signed_in_user, throttle
 from dotenv import load_dotenv
 
+from .conditional import (conditional_page, listing_last_modified,
+                          post_last_modified)
 from .forms import CreatePost, UsersComments
 from .models import Comments, Post
+from .pagecache import add_cache_tags, cached_page
+from .pagination import (BLOGS_PER_PAGE, POST_COUNT_CACHE_KEY,
+                         CachedCountPaginator, InvalidCursor, KeysetPaginator)
+from .querybudget import query_budget
+from .search import search_posts
+
+SEARCH_RESULTS_PER_PAGE: int = 20
+COMMENTS_PER_PAGE: int = 20
 
 load_dotenv()
 
 
+@query_budget(4)
+@conditional_page(listing_last_modified)
+@cached_page
 def home(request):
     """Render the home page with latest blog posts."""
-    blog_data = Post.objects.order_by('-date')[:3]
+    add_cache_tags(request, 'listing')
+    blog_data = Post.objects.for_listing()[:3]
+    add_cache_tags(request, *(f'listed:{post.id}' for post in blog_data))
     return render(request, 'index.html', {
         'slice_blog_data': blog_data,
         'year': timezone.now().year,
@@ -30,15 +46,39 @@ def home(request):
     })
 
 
+@query_budget(5)
+@conditional_page(listing_last_modified)
+@cached_page
 def all_blogs(request):
-    """Render paginated list of all blog posts."""
-    page = request.GET.get('page', 1)
-    blogs_per_page = Post.objects.all().order_by('-date')
-    paginator = Paginator(blogs_per_page, 15)
-    blogs = paginator.get_page(page)
+    """
+    Render the list of all blog posts.
+
+    Browsing uses keyset pagination on (date, id) through the opaque
+    ``cursor`` parameter; the legacy ``page`` parameter still works for the
+    numbered links, whose total comes from a cached/estimated count.
+    """
+    posts = Post.objects.for_listing()
+    add_cache_tags(request, 'listing')
+
+    if 'page' in request.GET:
+        # offsets shift whenever a post is added or removed
+        add_cache_tags(request, 'listing:numbered')
+        paginator = CachedCountPaginator(
+            posts, BLOGS_PER_PAGE, cache_key=POST_COUNT_CACHE_KEY)
+        blogs = paginator.get_page(request.GET.get('page'))
+        current_page = blogs.number
+    else:
+        keyset = KeysetPaginator(posts, BLOGS_PER_PAGE)
+        try:
+            blogs = keyset.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            blogs = keyset.page()
+        current_page = None
+    add_cache_tags(request, *(f'listed:{post.id}' for post in blogs))
 
     return render(request, 'allBlogs.html', {
         'blogs': blogs,
+        'current_page': current_page,
         'year': timezone.now().year,
         'current_user': request.user,
         'whatsapp': environ.get('WHATSAPP'),
@@ -47,9 +87,27 @@ def all_blogs(request):
     })
 
 
+def _comments_page(post_id, cursor=None):
+    """A keyset page of a post's comments, newest first."""
+    paginator = KeysetPaginator(
+        Comments.objects.filter(post_id=post_id).select_related('the_user'),
+        COMMENTS_PER_PAGE, ordering=('-date', '-id'))
+    try:
+        return paginator.page(cursor)
+    except InvalidCursor:
+        return paginator.page()
+
+
+@query_budget(6)
+@conditional_page(post_last_modified)
+@cached_page
 def show_post(request, post_id):
     """Display a single blog post and handle comments."""
-    post_to_disp = get_object_or_404(Post, id=post_id)
+    add_cache_tags(request, f'post:{post_id}', f'comments:{post_id}')
+    # the page renders the precomputed body_html, never the raw body
+    post_to_disp = get_object_or_404(
+        Post.objects.select_related('author').defer('body', 'body_text'),
+        id=post_id)
     comments_form = UsersComments()
 
     if request.method == 'POST':
@@ -65,8 +123,13 @@ def show_post(request, post_id):
                 post=post_to_disp
             )
             user_comment.save()
+            messages.success(request, 'Comment added!')
+            # post/redirect/get: the GET is served from the page cache
+            return redirect(f'{post_to_disp.get_absolute_url()}#comments')
+        # hand the bound form (and its errors) to the comment_form fragment
+        request.fragment_context = {'form': comments_form}
 
-    comments = Comments.objects.filter(post_id=post_id)
+    comments = _comments_page(post_id)
 
     return render(request, 'post.html', {
         'post': post_to_disp,
@@ -81,6 +144,81 @@ def show_post(request, post_id):
     })
 
 
+@query_budget(2)
+@cached_page
+def post_comments(request, post_id):
+    """
+    Return the next page of a post's comments for "load more": the
+    rendered list items plus the cursor of the page after them.
+    """
+    add_cache_tags(request, f'comments:{post_id}')
+    comments = _comments_page(post_id, request.GET.get('cursor'))
+    return JsonResponse({
+        'html': render_to_string('comment_items.html',
+                                 {'comments': comments}),
+        'next_cursor': comments.next_token,
+        'comments': [{
+            'id': comment.id,
+            'user': comment.the_user.username if comment.the_user else None,
+            'comment': comment.comment,
+            'date': comment.date.isoformat(),
+        } for comment in comments],
+    })
+
+
+def _search_page(request):
+    """Parse ?q= and ?page= for the search views."""
+    text = request.GET.get('q', '')[:200]
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
+    results = search_posts(
+        text, limit=SEARCH_RESULTS_PER_PAGE + 1,
+        offset=(page - 1) * SEARCH_RESULTS_PER_PAGE)
+    has_next = len(results) > SEARCH_RESULTS_PER_PAGE
+    return text, page, results[:SEARCH_RESULTS_PER_PAGE], has_next
+
+
+@query_budget(4)
+def search(request):
+    """Render ranked, highlighted full-text search results."""
+    text, page, results, has_next = _search_page(request)
+    return render(request, 'search.html', {
+        'query': text,
+        'results': results,
+        'page': page,
+        'has_next': has_next,
+        'year': timezone.now().year,
+        'current_user': request.user,
+        'whatsapp': environ.get('WHATSAPP'),
+        'github': environ.get('GITHUB'),
+        'linkedin': environ.get('LINKEDIN'),
+    })
+
+
+@query_budget(2)
+def search_api(request):
+    """JSON version of search for scripts and the front end."""
+    text, page, results, has_next = _search_page(request)
+    return JsonResponse({
+        'query': text,
+        'page': page,
+        'has_next': has_next,
+        'results': [{
+            'id': result.post.id,
+            'url': result.post.get_absolute_url(),
+            'title': result.post.title,
+            'subtitle': result.post.subtitle,
+            'author': result.post.author.username,
+            'date': result.post.date.isoformat(),
+            'rank': result.rank,
+            'title_html': result.title_html,
+            'snippet_html': result.snippet_html,
+        } for result in results],
+    })
+
+
 @login_required
 def add_post(request):
     """
@@ -183,6 +321,7 @@ def about_page(request):
 
 
 @login_required
+@throttle('contact', account=signed_in_user)
 def contact_page(request):
     """Handle contact form submissions."""
     if request.method == 'POST':
@@ -191,17 +330,14 @@ def contact_page(request):
         subject: str = request.POST.get('subject')
         message: str = request.POST.get('message')
 
-        with smtplib.SMTP_SSL('smtp.gmail.com') as mail_server:
-            mail_server.login(
-                user=environ.get('MAIL'),
-                password=environ.get('PASSWORD')
-            )
-            mail = EmailMessage()
-            mail['From'] = environ.get('MAIL')
-            mail['To'] = email
-            mail['Subject'] = f'{username}, {subject}'
-            mail.set_content(message)
-            mail_server.send_message(mail)
+        # EMAIL_BACKEND is the outbox: this only queues the message and
+        # the send_outbox worker delivers it outside the request
+        EmailMessage(
+            subject=f'{username}, {subject}',
+            body=message,
+            from_email=environ.get('MAIL'),
+            to=[email],
+        ).send()
 
         return render(request, 'contact.html', {
             'year': timezone.now().year,
@@ -1,8 +1,12 @@
 from os import environ
 
+from django.conf import settings
 from django.core.asgi import get_asgi_application
 
-environ.setdefault('DJANGO_SETTINGS_MODULE',
-                   'blog_webapp_django.config.settings')
+from config.static import ASGIStaticFilesHandler
+
+environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.dev')
 
 application = get_asgi_application()
+if settings.SERVE_STATIC_FILES:
+    application = ASGIStaticFilesHandler(application)
@@ -0,0 +1,138 @@
+"""
+Production database connection settings and connection pool metrics.
+
+database_settings() builds ``DATABASES['default']`` for PostgreSQL from
+the environment. DB_POOL picks how connections are reused:
+
+* ``pool`` (default): Django's native psycopg 3 pool, one per worker
+  process, holding DB_POOL_MIN_SIZE..DB_POOL_MAX_SIZE connections. A
+  request waits up to DB_POOL_TIMEOUT seconds for a free connection
+  instead of opening a new one, so the server never needs more than
+  workers x DB_POOL_MAX_SIZE connections.
+* ``persistent``: one connection per thread kept for DB_CONN_MAX_AGE
+  seconds (for psycopg2 or a pgbouncer in front of the database).
+* ``off``: a new connection for every request.
+
+replica_settings() adds one alias per read replica in DB_REPLICA_HOSTS
+(``host[:port],...``) with the primary's credentials and pooling; see
+config.routers for how reads are spread over them.
+
+CONN_HEALTH_CHECKS is on in every mode, so a connection the server or a
+proxy dropped is replaced instead of failing the request.
+
+pool_metrics() reports checkouts and wait times for the process it runs
+in (served to admins by config.views.db_pool_metrics).
+"""
+import copy
+from collections import Counter
+from os import environ as os_environ
+from typing import Mapping
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+POOL_MODES = ('pool', 'persistent', 'off')
+
+# connects per alias in this process (checkouts when pooled)
+_connections_opened: Counter = Counter()
+
+
+@receiver(connection_created)
+def _count_connection(sender, connection, **kwargs) -> None:
+    _connections_opened[connection.alias] += 1
+
+
+def database_settings(environ: Mapping[str, str] = os_environ) -> dict:
+    """DATABASES['default'] for PostgreSQL as configured by environ."""
+    mode = environ.get('DB_POOL', 'pool')
+    if mode not in POOL_MODES:
+        raise ValueError(
+            f'DB_POOL must be one of {", ".join(POOL_MODES)}, not {mode!r}')
+
+    options = {
+        'connect_timeout': int(environ.get('DB_CONNECT_TIMEOUT', '5')),
+    }
+    if mode == 'pool':
+        options['pool'] = {
+            'min_size': int(environ.get('DB_POOL_MIN_SIZE', '1')),
+            'max_size': int(environ.get('DB_POOL_MAX_SIZE', '4')),
+            # seconds a request waits for a free connection before failing
+            'timeout': float(environ.get('DB_POOL_TIMEOUT', '10')),
+            # idle connections above min_size are closed after this long
+            'max_idle': float(environ.get('DB_POOL_MAX_IDLE', '300')),
+            # and every connection is replaced after this long
+            'max_lifetime': float(environ.get('DB_POOL_MAX_LIFETIME', '3600')),
+        }
+
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': environ.get('DB_NAME'),
+        'USER': environ.get('DB_USER'),
+        'PASSWORD': environ.get('DB_PASSWORD'),
+        'HOST': environ.get('DB_HOST', 'localhost'),
+        'PORT': environ.get('DB_PORT', '5432'),
+        # the pool manages connection lifetimes itself
+        'CONN_MAX_AGE': (int(environ.get('DB_CONN_MAX_AGE', '60'))
+                         if mode == 'persistent' else 0),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': options,
+    }
+
+
+def replica_settings(primary: dict,
+                     environ: Mapping[str, str] = os_environ
+                     ) -> dict[str, dict]:
+    """Aliases replica1, replica2, ... for the hosts in DB_REPLICA_HOSTS."""
+    replicas = {}
+    hosts = [h.strip() for h in environ.get('DB_REPLICA_HOSTS', '').split(',')]
+    for number, address in enumerate(filter(None, hosts), start=1):
+        host, _, port = address.partition(':')
+        replica = copy.deepcopy(primary)
+        replica.update(HOST=host, PORT=port or primary['PORT'])
+        # tests read the rows they wrote through the primary's connection
+        replica['TEST'] = {'MIRROR': 'default'}
+        replicas[f'replica{number}'] = replica
+    return replicas
+
+
+def _pool_stats(pool) -> dict:
+    # psycopg_pool only reports counters that have been incremented
+    stats = pool.get_stats()
+    checkouts = stats.get('requests_num', 0)
+    wait_ms = stats.get('requests_wait_ms', 0)
+    return {
+        'size': stats.get('pool_size', 0),
+        'available': stats.get('pool_available', 0),
+        'min_size': stats.get('pool_min', 0),
+        'max_size': stats.get('pool_max', 0),
+        'checkouts': checkouts,
+        'waiting': stats.get('requests_waiting', 0),
+        'queued': stats.get('requests_queued', 0),
+        'wait_ms_total': wait_ms,
+        'wait_ms_avg': round(wait_ms / checkouts, 2) if checkouts else 0.0,
+        'timeouts': stats.get('requests_errors', 0),
+        'usage_ms_total': stats.get('usage_ms', 0),
+        'connections_opened': stats.get('connections_num', 0),
+        # found broken by the health check and replaced
+        'connections_lost': stats.get('connections_lost', 0),
+    }
+
+
+def pool_metrics() -> dict[str, dict]:
+    """Connection reuse statistics of this process, per database alias."""
+    metrics = {}
+    for alias in connections:
+        conn = connections[alias]
+        pool = getattr(conn, 'pool', None)
+        entry = {
+            'mode': ('pool' if pool is not None
+                     else 'persistent' if conn.settings_dict['CONN_MAX_AGE']
+                     else 'off'),
+            'connections_opened': _connections_opened[alias],
+        }
+        if pool is not None:
+            entry.update(_pool_stats(pool))
+        metrics[alias] = entry
+    return metrics
+
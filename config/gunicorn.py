@@ -0,0 +1,47 @@
+"""
+Gunicorn configuration, read from the environment:
+
+    gunicorn -c config/gunicorn.py
+
+GUNICORN_WORKER_CLASS picks the serving profile:
+
+* ``sync`` (default) or ``gthread``: WSGI through config.wsgi, one
+  request per worker thread.
+* ``uvicorn``: ASGI through config.asgi with the async read views
+  (ASYNC_VIEWS), so one worker multiplexes many slow clients.
+
+Any other value is passed to gunicorn as a worker class path.
+"""
+import multiprocessing
+from os import environ
+
+UVICORN_WORKER = 'uvicorn_worker.UvicornWorker'
+
+_worker_class = environ.get('GUNICORN_WORKER_CLASS', 'sync')
+asgi = _worker_class in ('uvicorn', 'asgi', UVICORN_WORKER)
+
+if asgi:
+    worker_class = UVICORN_WORKER
+    wsgi_app = 'config.asgi:application'
+    # read by the settings before the application is loaded
+    environ.setdefault('ASYNC_VIEWS', 'True')
+else:
+    worker_class = _worker_class
+    wsgi_app = 'config.wsgi:application'
+
+# an event loop keeps a core busy; sync workers spend their time waiting
+_cores = multiprocessing.cpu_count()
+workers = int(environ.get(
+    'WEB_CONCURRENCY', _cores if asgi else 2 * _cores + 1))
+threads = int(environ.get('GUNICORN_THREADS', '1'))
+
+bind = environ.get('GUNICORN_BIND', f"0.0.0.0:{environ.get('PORT', '8000')}")
+timeout = int(environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(environ.get('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(environ.get('GUNICORN_KEEPALIVE', '5'))
+# recycle workers now and then to bound slow memory growth
+max_requests = int(environ.get('GUNICORN_MAX_REQUESTS', '1000'))
+max_requests_jitter = int(environ.get('GUNICORN_MAX_REQUESTS_JITTER', '100'))
+
+accesslog = environ.get('GUNICORN_ACCESS_LOG', '-') or None
+errorlog = '-'
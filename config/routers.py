@@ -0,0 +1,129 @@
+"""
+Primary/replica database routing with read-your-writes stickiness.
+
+PrimaryReplicaRouter sends reads of the blog and users models made while
+handling a request to one of DATABASE_REPLICAS, and every write to the
+primary (``default``). Reads outside a request (management commands,
+workers, the shell) stay on the primary.
+
+Replicas lag behind the primary, so a client that has just written must
+not be sent to one. The router notes each write on the request's
+PinState; ReplicaPinMiddleware then sets a cookie that keeps that client
+on the primary for REPLICA_PIN_SECONDS, and every later read in the same
+request goes to the primary as well. The cookie is signed and nothing is
+pinned when there are no replicas. Pinned requests are flagged with
+``request.read_from_primary`` so the page cache renders them afresh
+instead of serving a page built from a lagging replica.
+"""
+import random
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+from django.http import HttpRequest, HttpResponse
+
+REPLICATED_APPS = ('blog', 'users')
+PIN_COOKIE_NAME = 'db_pin'
+
+
+@dataclass
+class PinState:
+    """Whether the current request must read from the primary."""
+    pinned: bool = False
+    wrote: bool = False
+
+
+# set by ReplicaPinMiddleware for the duration of a request; the object is
+# shared with the threads the async ORM runs queries in
+_pin_state: ContextVar[PinState | None] = ContextVar('db_pin', default=None)
+
+
+class PrimaryReplicaRouter:
+
+    def _replicated(self, model) -> bool:
+        return model._meta.app_label in REPLICATED_APPS
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        state = _pin_state.get()
+        if (not replicas or state is None or state.pinned
+                or not self._replicated(model)):
+            return None
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            return instance._state.db
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = _pin_state.get()
+        if state is not None and self._replicated(model):
+            state.pinned = state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+def _pinned(request: HttpRequest) -> bool:
+    if not settings.DATABASE_REPLICAS:
+        return False
+    # signed, so a client cannot pin itself (and skip the page cache)
+    # at will; a pin never reaches further than REPLICA_PIN_SECONDS
+    until = request.get_signed_cookie(PIN_COOKIE_NAME, default='0')
+    try:
+        until = float(until)
+    except ValueError:
+        return False
+    now = time.time()
+    return now < until <= now + settings.REPLICA_PIN_SECONDS
+
+
+def _pin(state: PinState, response: HttpResponse) -> HttpResponse:
+    if state.wrote and settings.DATABASE_REPLICAS:
+        seconds = settings.REPLICA_PIN_SECONDS
+        response.set_signed_cookie(
+            PIN_COOKIE_NAME, str(int(time.time()) + seconds), max_age=seconds,
+            httponly=True, samesite='Lax',
+            secure=settings.SESSION_COOKIE_SECURE)
+    return response
+
+
+class ReplicaPinMiddleware:
+    """Keep clients that just wrote on the primary database."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state = PinState(pinned=_pinned(request))
+        request.read_from_primary = state.pinned
+        token = _pin_state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _pin_state.reset(token)
+        return _pin(state, response)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        state = PinState(pinned=_pinned(request))
+        request.read_from_primary = state.pinned
+        token = _pin_state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _pin_state.reset(token)
+        return _pin(state, response)
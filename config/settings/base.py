@@ -23,17 +23,20 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'rest_framework',
     'blog',
     'users',
 ]
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'config.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'blog.pagecache.FragmentMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -65,6 +68,21 @@ DATABASES = {
     }
 }
 
+# reads of the blog and users models go to these aliases (config.routers);
+# prod.py fills it from DB_REPLICA_HOSTS
+DATABASE_ROUTERS = ['config.routers.PrimaryReplicaRouter']
+DATABASE_REPLICAS = []
+# seconds a client that wrote keeps reading from the primary
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', '10'))
+
+# sessions: 'db', 'cached_db' (cache with database fallback; needs a cache
+# shared by every worker), 'cache' or 'signed_cookies' (nothing stored
+# server side). No backend stores a session for anonymous visitors.
+SESSION_MODE = os.getenv('SESSION_MODE', 'db')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{SESSION_MODE}'
+# flash messages travel in a cookie and never touch the session
+MESSAGE_STORAGE = 'django.contrib.messages.storage.cookie.CookieStorage'
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -96,9 +114,68 @@ USE_TZ = True
 STATIC_URL = '/static/'
 STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 
+# serve STATIC_ROOT from the WSGI/ASGI application (config.static)
+SERVE_STATIC_FILES = os.getenv('SERVE_STATIC_FILES', 'False') == 'True'
+
+# responsive image derivatives written by `manage.py build_images`,
+# served as static files under STATIC_URL + IMAGE_DERIVATIVES_URL
+IMAGE_DERIVATIVES_ROOT = os.path.join(BASE_DIR, 'static', 'derived')
+IMAGE_DERIVATIVES_URL = 'derived/'
+IMAGE_DERIVATIVE_WIDTHS = (480, 960, 1440, 1920)
+
+# pruned/minified stylesheet and critical CSS written by
+# `manage.py build_css`, served under STATIC_URL + CSS_BUILD_URL
+CSS_BUILD_ROOT = os.path.join(BASE_DIR, 'static', 'css', 'build')
+CSS_BUILD_URL = 'css/build/'
+
 # media files (User uploaded content)
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 # default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# the public API is read-only
+REST_FRAMEWORK = {
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.AllowAny',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# outbox delivery retries: base * 2**(attempt - 1) seconds, capped
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '5'))
+OUTBOX_BACKOFF_SECONDS = int(os.getenv('OUTBOX_BACKOFF_SECONDS', '30'))
+OUTBOX_BACKOFF_MAX_SECONDS = int(
+    os.getenv('OUTBOX_BACKOFF_MAX_SECONDS', '3600'))
+
+# token buckets (users.throttling) for the views that hash passwords or
+# queue email: 'capacity/period' per client IP and per account, period in
+# s, m, h or d. Kept in the default cache, which must be shared by every
+# worker (REDIS_URL in production) for the limits to hold.
+THROTTLE_RATES = {
+    'login': {'ip': os.getenv('THROTTLE_LOGIN_IP', '30/m'),
+              'account': os.getenv('THROTTLE_LOGIN_ACCOUNT', '10/m')},
+    'register': {'ip': os.getenv('THROTTLE_REGISTER_IP', '10/h')},
+    'password_reset': {
+        'ip': os.getenv('THROTTLE_PASSWORD_RESET_IP', '10/h'),
+        'account': os.getenv('THROTTLE_PASSWORD_RESET_ACCOUNT', '3/h')},
+    'contact': {'ip': os.getenv('THROTTLE_CONTACT_IP', '20/h'),
+                'account': os.getenv('THROTTLE_CONTACT_ACCOUNT', '5/h')},
+}
+# reverse proxies in front of the application that append the client
+# address to X-Forwarded-For (0 trusts REMOTE_ADDR)
+THROTTLE_PROXY_COUNT = int(os.getenv('THROTTLE_PROXY_COUNT', '0'))
+
+# seconds a rendered page stays in the page cache (0 disables it)
+PAGE_CACHE_TIMEOUT = int(os.getenv('PAGE_CACHE_TIMEOUT', '300'))
+
+# route the read views to blog.async_views (set by config/gunicorn.py for
+# the uvicorn worker)
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', 'False') == 'True'
+
+# raise instead of logging when a view exceeds its @query_budget
+QUERY_BUDGET_STRICT = os.getenv('QUERY_BUDGET_STRICT', 'False') == 'True'
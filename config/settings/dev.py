@@ -25,6 +25,7 @@ INSTALLED_APPS: list[str] = [
     'django.contrib.staticfiles',
     # third party
     'ckeditor',
+    'rest_framework',
     # local apps
     'users.apps.UsersConfig',
     'blog.apps.BlogConfig',
@@ -32,11 +33,13 @@ INSTALLED_APPS: list[str] = [
 
 MIDDLEWARE: list[str] = [
     'django.middleware.security.SecurityMiddleware',
+    'config.routers.ReplicaPinMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'blog.pagecache.FragmentMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -65,8 +68,12 @@ DATABASES: dict[str, dict[str, str]] = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
 }
+# W040 is SQLite not supporting Index(include=...): blog.Post's listing
+# index then holds (date, id) only, which is all development needs. Only
+# silenced here, with SQLite; PostgreSQL in production builds the INCLUDE.
+SILENCED_SYSTEM_CHECKS: list[str] = ['models.W040']
 
 # password validation (keep defaults)
 AUTH_PASSWORD_VALIDATORS: list[dict] = [
@@ -91,8 +98,10 @@ DEFAULT_AUTO_FIEL: str = 'django.db.models.BigAutoField'
 # custom user model
 AUTH_USER_MODEL: str = environ.get('AUTH_USER_MODEL', 'users.User')
 
-# development email backend
-EMAIL_BACKEND: str = environ.get(
+# email is queued in the outbox and delivered by `manage.py send_outbox`
+# through OUTBOX_DELIVERY_BACKEND (the console in development)
+EMAIL_BACKEND: str = 'blog.mail.OutboxBackend'
+OUTBOX_DELIVERY_BACKEND: str = environ.get(
     'EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
 
 # redirect users to home after login/logout when no "next" provided
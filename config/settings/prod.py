@@ -1,6 +1,9 @@
 from os import environ, path
 from pathlib import Path
 
+from config.database import database_settings, replica_settings
+from django.core.exceptions import ImproperlyConfigured
+
 from .base import *
 
 # production settings
@@ -11,23 +14,51 @@ DEBUG: bool = False
 
 ALLOWED_HOSTS: list[str] = environ.get('ALLOWED_HOSTS', '').split(',')
 
-# db configuration
-DATABASES: dict[str, dict[str, str]] = {
-    'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
-        'NAME': environ.get('DB_NAME'),
-        'USER': environ.get('DB_USER'),
-        'PASSWORD': environ.get('DB_PASSWORD'),
-        'HOST': environ.get('DB_HOST', 'localhost'),
-        'PORT': environ.get('DB_PORT', '5432'),
-    }
+# db configuration: pooled connections by default, see config/database.py
+# for DB_POOL and the DB_POOL_* sizes and timeouts
+DATABASES: dict[str, dict] = {
+    'default': database_settings(environ),
 }
+# read replicas for config.routers.PrimaryReplicaRouter from DB_REPLICA_HOSTS
+DATABASES.update(replica_settings(DATABASES['default'], environ))
+DATABASE_REPLICAS: list[str] = [
+    alias for alias in DATABASES if alias != 'default']
 
 AUTH_USER_MODEL = 'users.User'
 
+# a cache shared by every worker and node: throttle buckets, page cache
+# tags and the conditional GET markers only hold when all processes see
+# the same cache, so a per-process fallback would silently break them
+if not environ.get('REDIS_URL'):
+    raise ImproperlyConfigured(
+        'REDIS_URL must point at the Redis cache shared by every worker')
+CACHES: dict[str, dict] = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': environ['REDIS_URL'],
+    },
+}
+
+# signed cookie sessions by default: no request reads or writes
+# django_session. SESSION_MODE=cached_db keeps them server side (so logout
+# revokes them everywhere).
+SESSION_MODE: str = environ.get('SESSION_MODE', 'signed_cookies')
+SESSION_ENGINE: str = f'django.contrib.sessions.backends.{SESSION_MODE}'
+
 # static files path
 STATIC_URL: str = '/static/'
 STATIC_ROOT: str = path.join(BASE_DIR, 'staticfiles')
+# hashed names plus .gz/.br siblings, written by collectstatic
+STORAGES: dict[str, dict[str, str]] = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'config.static.CompressedManifestStaticFilesStorage',
+    },
+}
+SERVE_STATIC_FILES: bool = environ.get(
+    'SERVE_STATIC_FILES', 'True') == 'True'
 
 # media files
 MEDIA_URL: str = '/media/'
@@ -43,8 +74,10 @@ SECURE_HSTS_SECONDS: int = 3600
 SECURE_HSTS_INCLUDE_SUBDOMAINS: bool = True
 SECURE_HSTS_PRELOAD: bool = True
 
-# Email settings
-EMAIL_BACKEND: str = environ.get(
+# Email settings: views queue into the outbox, the send_outbox worker
+# delivers through OUTBOX_DELIVERY_BACKEND
+EMAIL_BACKEND: str = 'blog.mail.OutboxBackend'
+OUTBOX_DELIVERY_BACKEND: str = environ.get(
     'EMAIL_BACKEND', 'django.core.mail.backends.smtp.EmailBackend')
 EMAIL_HOST: str = environ.get('EMAIL_HOST', 'smtp.gmail.com')
 EMAIL_PORT: int = int(environ.get('EMAIL_PORT', '587'))
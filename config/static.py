@@ -0,0 +1,263 @@
+"""
+Static file storage and serving for deployments without a front proxy.
+
+CompressedManifestStaticFilesStorage extends Django's manifest storage
+(content-hashed file names) by writing ``.gz`` and, when the optional
+``brotli`` package is installed, ``.br`` siblings of every compressible
+file at collectstatic time.
+
+StaticFilesHandler (WSGI) and ASGIStaticFilesHandler wrap the Django
+application and answer requests under STATIC_URL straight from
+STATIC_ROOT: the best precompressed variant is picked from
+Accept-Encoding, bodies go out through ``wsgi.file_wrapper`` (sendfile
+under gunicorn) or a memory map, and hashed names are cached for a year
+as immutable. Everything else reaches Django untouched.
+"""
+import gzip
+import json
+import mimetypes
+import mmap
+import os
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from pathlib import Path
+from typing import Iterable
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+COMPRESSIBLE_EXTENSIONS = (
+    '.css', '.js', '.mjs', '.json', '.map', '.svg', '.txt', '.xml', '.html',
+    '.ico', '.eot', '.ttf', '.otf',
+)
+# keep a compressed copy only when it saves at least this much
+MIN_SAVING = 0.05
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# unhashed names (original copies, admin assets referenced by path)
+DEFAULT_CACHE_CONTROL = 'public, max-age=3600'
+CHUNK_SIZE = 1 << 16
+
+# Accept-Encoding token -> file suffix, in order of preference
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Manifest storage that also writes .gz/.br siblings of text assets."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(self.hashed_files.values())
+        names.update(paths)
+        for name in sorted(names):
+            if name.lower().endswith(COMPRESSIBLE_EXTENSIONS):
+                self.compress(name)
+
+    def compress(self, name: str) -> None:
+        path = self.path(name)
+        try:
+            with open(path, 'rb') as fh:
+                data = fh.read()
+        except FileNotFoundError:
+            return
+        variants = {'.gz': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            variants['.br'] = brotli.compress(data)
+        for suffix, compressed in variants.items():
+            if len(compressed) <= len(data) * (1 - MIN_SAVING):
+                with open(path + suffix, 'wb') as fh:
+                    fh.write(compressed)
+
+
+@dataclass
+class StaticFile:
+    path: str
+    size: int
+    content_type: str
+    last_modified: str
+    etag: str
+    cache_control: str
+    # encoding -> (path, size)
+    encodings: dict[str, tuple[str, int]] = field(default_factory=dict)
+
+
+def _accepted_encodings(header: str) -> set[str]:
+    accepted = set()
+    for item in header.split(','):
+        token, _, params = item.strip().partition(';')
+        quality = 1.0
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                pass
+        if token and quality > 0:
+            accepted.add(token.lower())
+    return accepted
+
+
+class StaticFiles:
+    """An in-memory index of STATIC_ROOT, built once per process."""
+
+    def __init__(self, root: str | None = None, url: str | None = None):
+        root = root or settings.STATIC_ROOT
+        self.root = Path(root) if root else None
+        self.prefix = url or settings.STATIC_URL
+        self.files: dict[str, StaticFile] = {}
+        if self.root and self.root.is_dir():
+            self._index()
+
+    def _immutable_names(self) -> set[str]:
+        manifest = self.root / ManifestStaticFilesStorage.manifest_name
+        try:
+            with open(manifest, encoding='utf-8') as fh:
+                return set(json.load(fh).get('paths', {}).values())
+        except (FileNotFoundError, ValueError):
+            return set()
+
+    def _index(self) -> None:
+        immutable = self._immutable_names()
+        for dirpath, _dirnames, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(('.gz', '.br')):
+                    continue
+                path = os.path.join(dirpath, filename)
+                name = Path(path).relative_to(self.root).as_posix()
+                stat = os.stat(path)
+                content_type, _ = mimetypes.guess_type(filename)
+                static_file = StaticFile(
+                    path=path,
+                    size=stat.st_size,
+                    content_type=content_type or 'application/octet-stream',
+                    last_modified=formatdate(stat.st_mtime, usegmt=True),
+                    etag=f'"{int(stat.st_mtime):x}-{stat.st_size:x}"',
+                    cache_control=(
+                        IMMUTABLE_CACHE_CONTROL if name in immutable
+                        else DEFAULT_CACHE_CONTROL),
+                )
+                for encoding, suffix in ENCODINGS:
+                    if os.path.exists(path + suffix):
+                        static_file.encodings[encoding] = (
+                            path + suffix, os.path.getsize(path + suffix))
+                self.files[name] = static_file
+
+    def find(self, url_path: str) -> StaticFile | None:
+        if not self.files or not url_path.startswith(self.prefix):
+            return None
+        return self.files.get(url_path[len(self.prefix):])
+
+    def response(self, static_file: StaticFile, method: str,
+                 accept_encoding: str, if_none_match: str
+                 ) -> tuple[int, list[tuple[str, str]], str | None, int]:
+        """Status, headers, body path (None for no body) and body size."""
+        if method not in ('GET', 'HEAD'):
+            return 405, [('Allow', 'GET, HEAD')], None, 0
+
+        path, size, etag = static_file.path, static_file.size, static_file.etag
+        headers = [
+            ('Content-Type', static_file.content_type),
+            ('Cache-Control', static_file.cache_control),
+            ('Last-Modified', static_file.last_modified),
+        ]
+        if static_file.encodings:
+            headers.append(('Vary', 'Accept-Encoding'))
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding, _suffix in ENCODINGS:
+            if encoding in accepted and encoding in static_file.encodings:
+                path, size = static_file.encodings[encoding]
+                # each representation needs its own strong validator
+                etag = f'{etag[:-1]}-{encoding}"'
+                headers.append(('Content-Encoding', encoding))
+                break
+        headers.append(('ETag', etag))
+
+        if etag in (tag.strip() for tag in if_none_match.split(',')):
+            return 304, headers, None, 0
+        headers.append(('Content-Length', str(size)))
+        return 200, headers, (path if method == 'GET' else None), size
+
+
+_STATUS_LINES = {200: '200 OK', 304: '304 Not Modified',
+                 405: '405 Method Not Allowed'}
+
+
+class StaticFilesHandler:
+    """WSGI middleware serving STATIC_ROOT ahead of the Django app."""
+
+    def __init__(self, application, static_files: StaticFiles | None = None):
+        self.application = application
+        self.static_files = static_files or StaticFiles()
+
+    def __call__(self, environ, start_response) -> Iterable[bytes]:
+        static_file = self.static_files.find(environ.get('PATH_INFO', ''))
+        if static_file is None:
+            return self.application(environ, start_response)
+
+        status, headers, path, _size = self.static_files.response(
+            static_file, environ['REQUEST_METHOD'],
+            environ.get('HTTP_ACCEPT_ENCODING', ''),
+            environ.get('HTTP_IF_NONE_MATCH', ''))
+        start_response(_STATUS_LINES[status], headers)
+        if path is None:
+            return []
+        fh = open(path, 'rb')
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None:
+            # gunicorn turns this into sendfile()
+            return file_wrapper(fh, CHUNK_SIZE)
+        return _iter_file(fh)
+
+
+def _iter_file(fh) -> Iterable[bytes]:
+    with fh:
+        yield from iter(lambda: fh.read(CHUNK_SIZE), b'')
+
+
+class ASGIStaticFilesHandler:
+    """ASGI middleware serving STATIC_ROOT ahead of the Django app."""
+
+    def __init__(self, application, static_files: StaticFiles | None = None):
+        self.application = application
+        self.static_files = static_files or StaticFiles()
+
+    async def __call__(self, scope, receive, send):
+        static_file = None
+        if scope['type'] == 'http':
+            static_file = self.static_files.find(scope['path'])
+        if static_file is None:
+            return await self.application(scope, receive, send)
+
+        request_headers = {k.decode('latin-1').lower(): v.decode('latin-1')
+                           for k, v in scope.get('headers', [])}
+        status, headers, path, size = self.static_files.response(
+            static_file, scope['method'],
+            request_headers.get('accept-encoding', ''),
+            request_headers.get('if-none-match', ''))
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(k.lower().encode('latin-1'), v.encode('latin-1'))
+                        for k, v in headers],
+        })
+        if path is None or size == 0:
+            await send({'type': 'http.response.body', 'body': b''})
+            return
+        with open(path, 'rb') as fh, \
+                mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, size, CHUNK_SIZE):
+                    await send({
+                        'type': 'http.response.body',
+                        'body': bytes(view[offset:offset + CHUNK_SIZE]),
+                        'more_body': offset + CHUNK_SIZE < size,
+                    })
+            finally:
+                view.release()
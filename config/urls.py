@@ -1,6 +1,10 @@
 from django.contrib import admin
+from django.contrib.auth import views as auth_views
 from django.urls import include, path
 from django.views.generic import RedirectView
+from users.throttling import post_field, throttle
+
+from config.views import db_pool_metrics, site_backup
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -15,6 +19,20 @@ urlpatterns = [
     # blog routes (home and posts)
     path('', include('blog.urls')),
 
+    # the default login and password reset views take the same throttles
+    # as users.urls; these resolve ahead of the include below
+    path('accounts/login/',
+         throttle('login', account=post_field('username'))(
+             auth_views.LoginView.as_view())),
+    path('accounts/password_reset/',
+         throttle('password_reset', account=post_field('email'))(
+             auth_views.PasswordResetView.as_view())),
+
     # keep default auth views available
     path('accounts/', include('django.contrib.auth.urls')),
+
+    # database connection pool metrics of the answering worker (admins)
+    path('ops/db-pool/', db_pool_metrics, name='db_pool_metrics'),
+    # gzipped JSON lines backup of the site, streamed (admins)
+    path('ops/backup/', site_backup, name='site_backup'),
 ]
@@ -0,0 +1,41 @@
+import os
+
+from blog.backup import export_records, gzip_chunks, jsonl_lines
+from blog.exports import streaming_export
+from django.contrib.auth.decorators import login_required
+from django.http import (HttpRequest, HttpResponseBadRequest, JsonResponse,
+                         StreamingHttpResponse)
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from users.decorators import admins_only
+
+from config.database import pool_metrics
+
+
+@login_required
+@admins_only
+def db_pool_metrics(request: HttpRequest) -> JsonResponse:
+    """Connection pool metrics of the worker process answering."""
+    return JsonResponse({'pid': os.getpid(), 'databases': pool_metrics()})
+
+
+@login_required
+@admins_only
+def site_backup(request: HttpRequest) -> StreamingHttpResponse:
+    """
+    The export_site backup streamed as it is read; ?since=<ISO 8601> for
+    an incremental one. Password hashes are included for superusers only.
+    """
+    since = request.GET.get('since')
+    if since:
+        since = parse_datetime(since)
+        if since is None:
+            return HttpResponseBadRequest('Invalid since.')
+        if timezone.is_naive(since):
+            since = timezone.make_aware(since)
+    records = export_records(since or None,
+                             passwords=request.user.is_superuser)
+    # the chunks are already large; send each one as it is compressed
+    return streaming_export(
+        request, gzip_chunks(jsonl_lines(records)), 'application/gzip',
+        f'backup-{timezone.now():%Y%m%d-%H%M%S}.jsonl.gz', batch_size=1)
@@ -1,8 +1,12 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
-os.environ.setdefault('DJANGO_SETTINGS_MODULE',
-                      'blog_wenapp_django.config.settings.dev')
+from config.static import StaticFilesHandler
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.dev')
 
 application = get_wsgi_application()
+if settings.SERVE_STATIC_FILES:
+    application = StaticFilesHandler(application)
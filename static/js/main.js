@@ -27,3 +27,30 @@ window.addEventListener('DOMContentLoaded', () => {
         scrollPos = currentTop;
     });
 })
+
+
+// "Load more comments" on the post page
+window.addEventListener('DOMContentLoaded', () => {
+    const button = document.getElementById('load-more-comments');
+    if (!button) {
+        return;
+    }
+    const list = document.getElementById('comment-list');
+    button.addEventListener('click', async () => {
+        button.disabled = true;
+        const url = `${button.dataset.url}?cursor=${encodeURIComponent(button.dataset.cursor)}`;
+        try {
+            const response = await fetch(url, { headers: { 'Accept': 'application/json' } });
+            const data = await response.json();
+            list.insertAdjacentHTML('beforeend', data.html);
+            if (data.next_cursor) {
+                button.dataset.cursor = data.next_cursor;
+                button.disabled = false;
+            } else {
+                button.remove();
+            }
+        } catch (error) {
+            button.disabled = false;
+        }
+    });
+})
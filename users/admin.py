@@ -1,5 +1,8 @@
+from blog.exports import export_csv, export_jsonl
+from blog.pagination import EstimatedCountPaginator
 from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as g_l
 
 from .models import User
@@ -8,29 +11,22 @@ from .models import User
 @admin.action(description=g_l('Promote selected users to admin\
     (is_staff + role=\'admin\')'))
 def make_admin(modeladmin, request, queryset):
-    updated = 0
-    for user in queryset:
-        if not user.is_staff or user.role != 'admin':
-            user.is_staff = True
-            user.role = 'admin'
-            user.save(update_fields=['is_staff', 'role'])
-            updated += 1
+    # one UPDATE for the whole selection; save() and its signals are
+    # skipped, so updated_at is set here
+    updated = (queryset.exclude(is_staff=True, role='admin')
+               .update(is_staff=True, role='admin',
+                       updated_at=timezone.now()))
     messages.success(request, g_l('%d user(s) promoted to admin.') % updated)
 
 
 @admin.action(description=g_l('Revoke admin privileges from selected users\
     (is_staff=False, role=\'regular\')'))
 def revoke_admin(modeladmin, request, queryset):
-    updated = 0
-    for user in queryset:
-        if user.is_staff or user.role != 'regular':
-            # adjust regular staff/admin flags
-            if user.is_superuser:
-                continue
-            user.is_staff = False
-            user.role = 'regular'
-            user.save(update_fields=['is_staff', 'role'])
-            updated += 1
+    # superusers keep their flags
+    updated = (queryset.filter(is_superuser=False)
+               .exclude(is_staff=False, role='regular')
+               .update(is_staff=False, role='regular',
+                       updated_at=timezone.now()))
     messages.success(request, g_l('%d user(s) demoted from admin.') % updated)
 
 
@@ -55,11 +51,18 @@ class UserAdmin(BaseUserAdmin):
     # allow quick editing of active state and role from changelist
     list_editable = ('is_active', 'role')
 
-    actions = [make_admin, revoke_admin]
+    actions = [make_admin, revoke_admin, export_csv, export_jsonl]
+    export_fields = ('id', 'username', 'email', 'first_name', 'last_name',
+                     'role', 'is_staff', 'is_active', 'date_joined',
+                     'last_login')
 
     search_fields = ('username', 'email', 'first_name', 'last_name')
     ordering = ('username',)
 
+    # no COUNT(*) over the whole table on every changelist load
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+
     def get_actions(self, request):
         # only allow these actions for superusers
         actions = super().get_actions(request)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from users.models import Profile, User
+
+
+class Command(BaseCommand):
+    help = ('Create the missing profiles of existing users in batches of '
+            'bulk inserts.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Profiles inserted per statement.')
+
+    def handle(self, *args, **options):
+        created = 0
+        last_pk = 0
+        while True:
+            # walk the users by primary key so each batch is a range scan
+            pks = list(User.objects.filter(pk__gt=last_pk,
+                                           profile__isnull=True)
+                       .order_by('pk')
+                       .values_list('pk', flat=True)[:options['batch_size']])
+            if not pks:
+                break
+            # a profile created concurrently (e.g. by a sign up) is skipped
+            # by the insert, so count the rows it actually added
+            batch = Profile.objects.filter(user_id__in=pks)
+            with transaction.atomic():
+                before = batch.count()
+                Profile.objects.bulk_create(
+                    [Profile(user_id=pk) for pk in pks],
+                    ignore_conflicts=True)
+                created += batch.count() - before
+            last_pk = pks[-1]
+        self.stdout.write(f'Created {created} missing profiles.')
@@ -13,6 +13,9 @@ class User(AbstractUser):
     """Custom User model that extends the default Django User model."""
     role = models.CharField(
         max_length=20, choices=ROLE_CHOICES, default='regular')
+    # any save but a login's (update_fields=['last_login']); lets
+    # export_site --since pick up edited accounts
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def is_admin(self):
         return self.role == 'admin' or self.is_staff or self.is_superuser
@@ -24,21 +27,17 @@ class Profile(models.Model):
         User, on_delete=models.CASCADE, related_name='profile')
     bio = models.TextField(blank=True)
     location = models.CharField(max_length=100, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.user.username
 
 
 @receiver(post_save, sender=User)
-def create_or_update_user_profile(sender, instance, created, **kwargs):
-    """Create profile on new user and ensure profile exists on save."""
-    if created:
-        Profile.objects.create(user=instance)
-    else:
-        try:
-            instance.profile.save()
-        except Profile.DoesNotExist:
-            Profile.objects.create(user=instance)
-        except Exception as e:
-            print(e)
-            pass
+def create_user_profile(sender, instance, created, using, raw=False,
+                        **kwargs):
+    """Create the profile of a new user; later saves leave it alone."""
+    # logins (last_login) and admin edits save the user without touching
+    # the profile, so they must not cost profile queries
+    if created and not raw:
+        Profile.objects.using(using).create(user=instance)
@@ -0,0 +1,186 @@
+from io import StringIO
+from unittest import mock
+
+from blog.models import OutgoingEmail
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .models import Profile, User
+from .throttling import client_ip, take_token
+
+
+class AdminActionTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser(
+            username='root', email='root@example.com', password='pw')
+        self.client.force_login(self.admin)
+        self.users = User.objects.bulk_create([
+            User(username=f'member{i}', email=f'm{i}@example.com')
+            for i in range(20)])
+
+    def _act(self, model, action, pks):
+        return self.client.post(
+            reverse(f'admin:{model}_changelist'),
+            {'action': action, '_selected_action': [str(pk) for pk in pks]})
+
+    def test_make_and_revoke_admin_are_single_updates(self):
+        pks = [u.pk for u in self.users] + [self.admin.pk]
+        with CaptureQueriesContext(connection) as captured:
+            self._act('users_user', 'make_admin', pks)
+        updates = [q for q in captured.captured_queries
+                   if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(
+            User.objects.filter(is_staff=True, role='admin').count(), 21)
+
+        with CaptureQueriesContext(connection) as captured:
+            self._act('users_user', 'revoke_admin', pks)
+        updates = [q for q in captured.captured_queries
+                   if q['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        self.assertFalse(
+            User.objects.exclude(pk=self.admin.pk).filter(is_staff=True))
+        self.admin.refresh_from_db()
+        self.assertTrue(self.admin.is_staff)
+        self.assertEqual(self.admin.role, 'admin')
+
+    def test_csv_export_streams_selected_rows(self):
+        pks = [u.pk for u in self.users[:5]]
+        response = self._act('users_user', 'export_csv', pks)
+        self.assertTrue(response.streaming)
+        self.assertIn('user-', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['id', 'username', 'email'])
+        self.assertEqual(
+            sorted(line.split(',')[1] for line in lines[1:]),
+            [f'member{i}' for i in range(5)])
+
+
+class ProfileTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='member', email='member@example.com', password='pw')
+
+    def test_login_runs_no_profile_queries(self):
+        # the user, UPDATE last_login and the session: key check, then
+        # INSERT and UPDATE each inside a savepoint
+        with self.assertNumQueries(9), \
+                CaptureQueriesContext(connection) as captured:
+            response = self.client.post(
+                reverse('login'), {'username': 'member', 'password': 'pw'})
+        self.assertRedirects(response, reverse('home'),
+                             fetch_redirect_response=False)
+        self.assertFalse([q for q in captured.captured_queries
+                          if 'users_profile' in q['sql']])
+
+    def test_user_saves_leave_the_profile_alone(self):
+        self.user.first_name = 'Renamed'
+        with self.assertNumQueries(1):
+            self.user.save(update_fields=['first_name'])
+
+    def test_backfill_creates_the_missing_profiles(self):
+        users = User.objects.bulk_create(
+            [User(username=f'bulk{i}') for i in range(5)])
+        self.assertFalse(Profile.objects.filter(user__in=users))
+
+        out = StringIO()
+        call_command('backfill_profiles', batch_size=2, stdout=out)
+        self.assertIn('Created 5 missing', out.getvalue())
+        self.assertEqual(Profile.objects.count(), User.objects.count())
+
+    def test_backfill_does_not_count_profiles_created_meanwhile(self):
+        users = User.objects.bulk_create(
+            [User(username=f'bulk{i}') for i in range(3)])
+        real_filter = Profile.objects.filter
+        raced = []
+
+        def sign_up_then_filter(*args, **kwargs):
+            # the first user gets a profile after the command picked it
+            if not raced:
+                raced.append(Profile.objects.create(user=users[0]))
+            return real_filter(*args, **kwargs)
+
+        out = StringIO()
+        with mock.patch.object(Profile.objects, 'filter',
+                               side_effect=sign_up_then_filter):
+            call_command('backfill_profiles', stdout=out)
+        self.assertIn('Created 2 missing', out.getvalue())
+        self.assertEqual(Profile.objects.count(), User.objects.count())
+
+
+@override_settings(THROTTLE_RATES={
+    'login': {'ip': '5/m', 'account': '2/m'},
+    'contact': {'ip': '10/m', 'account': '2/m'},
+}, THROTTLE_PROXY_COUNT=0)
+class ThrottleTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='member', email='member@example.com', password='pw')
+
+    def _login(self, username, **extra):
+        return self.client.post(
+            reverse('login'), {'username': username, 'password': 'wrong'},
+            **extra)
+
+    def test_account_bucket_rejects_before_hashing(self):
+        for _ in range(2):
+            self.assertEqual(self._login('Member').status_code, 200)
+        # no user lookup, no password hash, no session
+        with self.assertNumQueries(0):
+            response = self._login('member ')
+        self.assertEqual(response.status_code, 429)
+        # the next token of a 2/m bucket is at most 30 seconds away
+        self.assertIn(int(response['Retry-After']), range(1, 31))
+        # another account from the same address still gets through
+        self.assertEqual(self._login('someone').status_code, 200)
+
+    def test_ip_bucket_limits_across_accounts(self):
+        statuses = [self._login(f'user{i}').status_code for i in range(6)]
+        self.assertEqual(statuses, [200] * 5 + [429])
+        # a different client address has its own bucket
+        response = self._login('user9', REMOTE_ADDR='10.0.0.2')
+        self.assertEqual(response.status_code, 200)
+
+    def test_buckets_refill_over_time(self):
+        start = 1_000_000_000
+        with mock.patch('users.throttling._now_ms', return_value=start):
+            self.assertFalse(take_token('bucket', '2/m'))
+            self.assertFalse(take_token('bucket', '2/m'))
+            self.assertEqual(take_token('bucket', '2/m'), 30)
+            # rejected requests do not push the refill further out
+            self.assertEqual(take_token('bucket', '2/m'), 30)
+        with mock.patch('users.throttling._now_ms',
+                        return_value=start + 30_000):
+            self.assertFalse(take_token('bucket', '2/m'))
+            self.assertTrue(take_token('bucket', '2/m'))
+        with mock.patch('users.throttling._now_ms',
+                        return_value=start + 600_000):
+            self.assertFalse(take_token('bucket', '2/m'))
+            self.assertFalse(take_token('bucket', '2/m'))
+            self.assertTrue(take_token('bucket', '2/m'))
+
+    @override_settings(THROTTLE_PROXY_COUNT=1)
+    def test_client_ip_behind_a_proxy(self):
+        request = RequestFactory().get(
+            '/', REMOTE_ADDR='127.0.0.1',
+            HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7')
+        self.assertEqual(client_ip(request), '203.0.113.7')
+
+    @override_settings(EMAIL_BACKEND='blog.mail.OutboxBackend')
+    def test_contact_form_is_limited_per_user(self):
+        self.client.force_login(self.user)
+        data = {'username': 'member', 'email': 'to@example.com',
+                'subject': 'Hi', 'message': 'Hello'}
+        for _ in range(2):
+            self.client.post(reverse('contact_page'), data)
+        response = self.client.post(reverse('contact_page'), data)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(OutgoingEmail.objects.count(), 2)
@@ -0,0 +1,144 @@
+"""
+Token bucket throttling for the views that do expensive work per POST:
+password hashing on login and sign up, and queuing email for password
+resets and the contact form.
+
+Each scope in THROTTLE_RATES has a bucket per client IP and, where the
+view names one, per account (the username or email being tried, or the
+signed-in user). A bucket holds up to ``capacity`` tokens and refills at
+``capacity / period``; a request takes one token from each of its
+buckets and is answered with 429 and Retry-After, before the view runs,
+when one is empty.
+
+The buckets live in the default cache so every worker and node shares
+them. A bucket is stored as one integer, the time in milliseconds at
+which it will be full again (the GCRA form of a token bucket), and each
+request advances it with a single atomic cache.incr().
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+from typing import Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpRequest, HttpResponse
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+# buckets left alone this long are dropped; they would be full by then
+BUCKET_TTL: int = 86400
+
+AccountFunc = Callable[[HttpRequest], object]
+
+
+def parse_rate(rate: str) -> tuple[int, int]:
+    """'5/m' -> (5 tokens, 60 seconds)."""
+    capacity, _, period = rate.partition('/')
+    return int(capacity), PERIODS[period]
+
+
+def post_field(name: str) -> AccountFunc:
+    """Account key taken from a submitted form field."""
+    def account(request: HttpRequest) -> str:
+        return request.POST.get(name, '').strip().lower()
+    return account
+
+
+def signed_in_user(request: HttpRequest):
+    return request.user.pk
+
+
+def client_ip(request: HttpRequest) -> str:
+    """The client address, looking past THROTTLE_PROXY_COUNT proxies."""
+    proxies = settings.THROTTLE_PROXY_COUNT
+    if proxies:
+        # each trusted proxy appends the address it received from, so the
+        # entries before those are client supplied and cannot be trusted
+        forwarded = [a.strip() for a in request.META.get(
+            'HTTP_X_FORWARDED_FOR', '').split(',') if a.strip()]
+        if len(forwarded) >= proxies:
+            return forwarded[-proxies]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+def _bucket_key(scope: str, kind: str, value) -> str:
+    digest = hashlib.sha256(str(value).encode()).hexdigest()[:32]
+    return f'throttle:{scope}:{kind}:{digest}'
+
+
+def take_token(key: str, rate: str) -> float:
+    """
+    Take a token from the bucket at key. Returns 0 when one was
+    available, otherwise the seconds until one will be.
+    """
+    capacity, period = parse_rate(rate)
+    interval = period * 1000 // capacity
+    burst = period * 1000
+    now = _now_ms()
+    try:
+        full_at = cache.incr(key, interval)
+    except ValueError:
+        # first request from this client: a full bucket minus one token
+        if cache.add(key, now + interval, BUCKET_TTL):
+            return 0
+        full_at = cache.incr(key, interval)
+
+    if full_at - interval < now:
+        # the bucket refilled completely while idle; restart it from now
+        cache.set(key, now + interval, BUCKET_TTL)
+        return 0
+    if full_at - now > burst:
+        # empty: give the token back so that hammering an empty bucket
+        # does not keep pushing the refill further out
+        cache.decr(key, interval)
+        return (full_at - burst - now) / 1000
+    return 0
+
+
+def check_throttle(request: HttpRequest, scope: str,
+                   account: AccountFunc | None = None) -> float:
+    """Seconds to wait before scope may be used again, 0 if allowed now."""
+    rates = settings.THROTTLE_RATES.get(scope, {})
+    buckets = []
+    if 'ip' in rates:
+        buckets.append(('ip', client_ip(request)))
+    if account is not None and 'account' in rates:
+        value = account(request)
+        if value:
+            buckets.append(('account', value))
+    for kind, value in buckets:
+        wait = take_token(_bucket_key(scope, kind, value), rates[kind])
+        if wait:
+            return wait
+    return 0
+
+
+def throttled_response(wait: float) -> HttpResponse:
+    response = HttpResponse(
+        'Too many attempts. Please wait a little and try again.',
+        content_type='text/plain; charset=utf-8', status=429)
+    response['Retry-After'] = str(max(1, math.ceil(wait)))
+    return response
+
+
+def throttle(scope: str, account: AccountFunc | None = None,
+             methods: tuple[str, ...] = ('POST',)):
+    """
+    Reject requests to the view over the THROTTLE_RATES of scope with 429
+    before it runs. account maps a request to the account it acts on.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def _wrapped_view(request: HttpRequest, *args, **kwargs):
+            if request.method in methods:
+                wait = check_throttle(request, scope, account)
+                if wait:
+                    return throttled_response(wait)
+            return view_func(request, *args, **kwargs)
+        return _wrapped_view
+    return decorator
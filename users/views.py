@@ -15,10 +15,12 @@ from django.db import IntegrityError, transaction
 from django.http import HttpRequest, HttpResponse
 from django.shortcuts import redirect, render
 from django.urls import reverse, reverse_lazy
+from django.utils.decorators import method_decorator
 from django.utils.translation import gettext
 from dotenv import load_dotenv
 
 from .forms import LoginUser, SignUpUser
+from .throttling import post_field, throttle
 
 load_dotenv('.env')
 
@@ -26,6 +28,7 @@ logger = logging.getLogger(__name__)
 User = get_user_model()
 
 
+@throttle('register')
 def register(request: HttpRequest) -> HttpResponse:
     """Register a new user. Redirects authenticated users to home."""
 
@@ -60,6 +63,7 @@ def register(request: HttpRequest) -> HttpResponse:
     return render(request, 'register.html', {'form': form})
 
 
+@throttle('login', account=post_field('username'))
 def login_view(request: HttpRequest) -> HttpResponse:
     """Authenticate and log in a user. Redirects authenticated users to home"""
 
@@ -103,8 +107,10 @@ def logout_view(request: HttpRequest) -> HttpResponse:
     return redirect("home")
 
 
+@method_decorator(throttle('password_reset', account=post_field('email')),
+                  name='dispatch')
 class PasswordResetView(DjangoPasswordResetView):
-    """Send password-reset email"""
+    """Queue password-reset email in the outbox (see blog.mail)."""
 
     template_name = 'registration/password_reset_form.html'
     email_template_name = 'registration/password_reset_email.html'